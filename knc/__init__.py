@@ -0,0 +1,3 @@
+# Shared helpers for the K&C pages. Only knc.plots imports plotly and nothing in
+# here imports streamlit, so the parsing code can also be used outside the app
+# (batch CLI, benchmarks) without either installed.
@@ -0,0 +1,67 @@
+# Running statistics of KPI vectors, updated one run at a time.
+#
+# A state is (n, mean, comoment): the run count, the mean of every KPI and the matrix
+# of summed cross deviations. Runs are added and removed without going back to the
+# stored values (Chan et al. pairwise update), and the states of several groups merge
+# into one. Means, standard deviations, correlations and the linear regression between
+# any two KPIs all follow from a state.
+import numpy as np
+import pandas as pd
+
+
+def aggregate_empty(n_parameters):
+    return 0, np.zeros(n_parameters), np.zeros((n_parameters, n_parameters))
+
+
+def aggregate_merge(state, other):
+    n_a, mean_a, comoment_a = state
+    n_b, mean_b, comoment_b = other
+    n = n_a + n_b
+    if not n:
+        return aggregate_empty(len(mean_a))
+    delta = mean_b - mean_a
+    mean = mean_a + delta * n_b / n
+    comoment = comoment_a + comoment_b + np.outer(delta, delta) * n_a * n_b / n
+    return n, mean, comoment
+
+
+def aggregate_add(state, values):
+    values = np.asarray(values, dtype=np.float64)
+    return aggregate_merge(state, (1, values, np.zeros((len(values), len(values)))))
+
+
+def aggregate_remove(state, values):
+    # Inverse of aggregate_add
+    n, mean, comoment = state
+    values = np.asarray(values, dtype=np.float64)
+    if n <= 1:
+        return aggregate_empty(len(mean))
+    mean_rest = (n * mean - values) / (n - 1)
+    delta = values - mean_rest
+    return n - 1, mean_rest, comoment - np.outer(delta, delta) * (n - 1) / n
+
+
+def aggregate_summary(state, parameters):
+    # count, mean and standard deviation of every KPI
+    n, mean, comoment = state
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.sqrt(np.clip(np.diag(comoment), 0, None) / (n - 1)) if n > 1 else np.full(len(mean), np.nan)
+    return pd.DataFrame({'n': n, 'mean': mean, 'std': std}, index=parameters)
+
+
+def aggregate_correlation(state, parameters):
+    _, _, comoment = state
+    scale = np.sqrt(np.clip(np.diag(comoment), 0, None))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = comoment / np.outer(scale, scale)
+    return pd.DataFrame(np.clip(correlation, -1, 1), index=parameters, columns=parameters)
+
+
+def aggregate_regression(state, parameters, x, y):
+    # Least-squares line y = slope*x + intercept over all runs of the state
+    n, mean, comoment = state
+    i, j = parameters.index(x), parameters.index(y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = comoment[i, j] / comoment[i, i]
+        r = comoment[i, j] / np.sqrt(comoment[i, i] * comoment[j, j])
+    return {'n': n, 'slope': slope, 'intercept': mean[j] - slope * mean[i], 'r': r, 'r2': r * r}
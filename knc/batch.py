@@ -0,0 +1,100 @@
+# Headless batch post-processing of a directory of .res files.
+#
+#   python -m knc.batch <directory> [--test auto|bump|bump_anti|lat_antiphase]
+#                                   [--output kpis.csv] [--workers N] [--recursive]
+#
+# Every file is parsed and fitted with the same code as the K&C pages, in a process
+# pool sized to the cores, and all KPIs end up in one table (one row per file and test:
+# a full K&C run with several analyses gives a row for each of its tests).
+# This module must not import streamlit or plotly.
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from knc import kpi
+from knc.extract import extract_analysis_tests, extract_file, extract_file_tests
+
+
+def batch_find_files(directory, recursive=False):
+    if not recursive:
+        return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.lower().endswith('.res'))
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory)
+        for name in names if name.lower().endswith('.res')
+    )
+
+
+def batch_process_file(res_path, test='auto'):
+    # The rows of the KPI table of one file, one per test it holds (the tests of its
+    # analyses, else the test in its file name or --test). A broken file gives an error
+    # row instead of stopping the batch.
+    row = {'file': res_path, 'test': None if test == 'auto' else test, 'steps': 0, 'error': ''}
+    try:
+        res_matrix = extract_file(res_path)
+        if not len(res_matrix):
+            row['error'] = 'no valid data blocks found'
+            return [row]
+        test_matrices = extract_file_tests(res_matrix, os.path.basename(res_path), None if test == 'auto' else test)
+        if not test_matrices:
+            if extract_analysis_tests(res_matrix) is None:
+                row['error'] = 'test type not recognised from file name'
+            else:
+                row['error'] = 'no analysis named as a K&C test'
+            return [row]
+        rows = []
+        for file_test, matrix in test_matrices.items():
+            test_row = dict(row, test=file_test, steps=len(matrix))
+            for parameter, (slope, _, _) in kpi.test_fit(file_test, matrix).items():
+                test_row[parameter] = slope
+            rows.append(test_row)
+        return rows
+    except Exception as error:
+        row['error'] = f'{type(error).__name__}: {error}'
+        return [row]
+
+
+def batch_run(directory, test='auto', workers=None, recursive=False, progress=None):
+    res_paths = batch_find_files(directory, recursive)
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(batch_process_file, res_path, test) for res_path in res_paths]
+        for done, future in enumerate(as_completed(futures), 1):
+            file_rows = future.result()
+            rows.extend(file_rows)
+            if progress:
+                for row in file_rows:
+                    progress(row, done, len(res_paths))
+
+    kpis = pd.DataFrame(rows, columns=['file', 'test', 'steps', 'error'])
+    if rows:
+        kpis = pd.DataFrame(rows).sort_values(['file', 'test']).reset_index(drop=True)
+    return kpis
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m knc.batch', description='Post-process a directory of Adams .res K&C results.')
+    parser.add_argument('directory')
+    parser.add_argument('--test', default='auto', choices=['auto'] + list(kpi.KPI_TESTS))
+    parser.add_argument('--output', default='kpis.csv', help='consolidated KPI table (.csv)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, default one per core')
+    parser.add_argument('--recursive', action='store_true')
+    args = parser.parse_args(argv)
+
+    def progress(row, done, total):
+        status = row['error'] or f"{row['steps']} steps"
+        print(f"[{done}/{total}] {row['file']}: {row['test']}, {status}", file=sys.stderr)
+
+    kpis = batch_run(args.directory, args.test, args.workers, args.recursive, progress)
+    kpis.to_csv(args.output, index=False)
+    print(f"{kpis['file'].nunique()} files, {len(kpis)} rows, {int((kpis['error'] == '').sum())} ok, "
+          f"KPI table written to {args.output}", file=sys.stderr)
+    return 0 if len(kpis) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
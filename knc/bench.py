@@ -0,0 +1,118 @@
+# Parse/fit/plot benchmarks on synthetic .res files (knc.synthetic).
+#
+#   python -m knc.bench [--sizes 100 1000 ...] [--test bump] [--layout compact|adams]
+#                       [--tokens N] [--repeat 3] [--output bench.csv]
+#
+# For every size a file is generated and run through the same code as the K&C pages:
+# block extraction (locate), tokenization, DataFrame build, offset, regression (fit)
+# and figure construction. Times are the best of --repeat runs, peak memory comes from
+# one extra run with tracemalloc on (knc.timing). Plotly is optional, without it the
+# figure stage is skipped.
+import argparse
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+from knc import kpi, timing
+from knc.lazy import LazyChannelFrame
+from knc.res_parser import res_read_file
+from knc.synthetic import synthetic_res
+
+BENCH_SIZES = [100, 1000, 10000, 100000, 1000000]
+
+# Stages that work on the file bytes get a MB/s column
+BENCH_FILE_STAGES = ['locate', 'tokenize']
+
+
+def bench_figures(df_offset, columns, offset_column):
+    # One figure with every column over the offset column, template and curve traces like the pages
+    try:
+        from knc.plots import curve_trace, page_figure
+    except ImportError:
+        return None
+    fig = page_figure()
+    for name, _, _ in columns:
+        if name != offset_column:
+            fig.add_trace(curve_trace(df_offset[offset_column], df_offset[name], mode='lines', name=name))
+    return fig
+
+
+def bench_pipeline(res_path, test):
+    columns, offset_column = kpi.KPI_TESTS[test]['columns'], kpi.KPI_TESTS[test]['offset_column']
+    matrix = res_read_file(res_path, kpi.column_channels(columns))
+    frame = LazyChannelFrame(matrix, columns)
+    frame_offset = frame.offset(offset_column)
+    df, df_offset = frame.to_frame(), frame_offset.to_frame()
+    kpi.test_fits(test, df_offset, df)
+    with timing.stage('figure build'):
+        bench_figures(df_offset, columns, offset_column)
+    return len(matrix)
+
+
+def bench_size(res_path, test, repeat=3):
+    # {stage: row} with the best time over `repeat` runs and the peak memory of a traced run
+    stages = {}
+    for _ in range(repeat):
+        timing.start_run('bench', trace_memory=False)
+        bench_pipeline(res_path, test)
+        for row in timing.finish_run(log_path=None):
+            best = stages.setdefault(row['stage'], dict(row))
+            best['seconds'] = min(best['seconds'], row['seconds'])
+
+    timing.start_run('bench', trace_memory=True)
+    bench_pipeline(res_path, test)
+    for row in timing.finish_run(log_path=None):
+        stages.setdefault(row['stage'], dict(row))['peak_mb'] = row['peak_mb']
+    return stages
+
+
+def bench_run(sizes=BENCH_SIZES, test='bump', layout='compact', n_tokens=None, repeat=3, directory=None, progress=None):
+    rows = []
+    with tempfile.TemporaryDirectory(dir=directory) as bench_directory:
+        for n_steps in sizes:
+            res_path = os.path.join(bench_directory, f'{test}_{n_steps}.res')
+            res_mb = synthetic_res(res_path, n_steps, n_tokens, layout) / 1024 / 1024
+            for stage in bench_size(res_path, test, repeat).values():
+                seconds = stage['seconds']
+                rows.append({
+                    'steps': n_steps,
+                    'file_mb': res_mb,
+                    'stage': stage['stage'],
+                    'seconds': seconds,
+                    'steps_per_s': n_steps / seconds if seconds else float('nan'),
+                    'mb_per_s': res_mb / seconds if seconds and stage['stage'] in BENCH_FILE_STAGES else float('nan'),
+                    'peak_mb': stage['peak_mb'],
+                })
+            os.remove(res_path)
+            if progress:
+                progress(n_steps, res_mb)
+    return pd.DataFrame(rows, columns=['steps', 'file_mb', 'stage', 'seconds', 'steps_per_s', 'mb_per_s', 'peak_mb'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m knc.bench', description='Benchmark the K&C parse/fit/plot pipeline on synthetic .res files.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=BENCH_SIZES, help='steps per file')
+    parser.add_argument('--test', default='bump', choices=list(kpi.KPI_TESTS))
+    parser.add_argument('--layout', default='compact', choices=['compact', 'adams'],
+                        help='adams writes the full testrig layout, ~14 kB per step')
+    parser.add_argument('--tokens', type=int, default=None, help='tokens per step, default just enough for the layout')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--dir', default=None, help='where the synthetic files are written')
+    parser.add_argument('--output', default=None, help='also write the results table (.csv)')
+    args = parser.parse_args(argv)
+
+    def progress(n_steps, res_mb):
+        print(f'{n_steps} steps ({res_mb:.1f} MB) done', file=sys.stderr)
+
+    results = bench_run(args.sizes, args.test, args.layout, args.tokens, args.repeat, args.dir, progress)
+    with pd.option_context('display.width', 200, 'display.max_rows', None):
+        print(results.round(4).to_string(index=False))
+    if args.output:
+        results.to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,267 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from knc import kpi
+
+# Memory ceiling of the parse cache, can be set with KNC_PARSE_CACHE_MB
+PARSE_CACHE_MB = int(os.environ.get('KNC_PARSE_CACHE_MB', '512'))
+
+# Directory and size limit of the on-disk cache, shared by every session and restart
+DISK_CACHE_DIR = os.environ.get('KNC_DISK_CACHE_DIR', '.knc_cache')
+DISK_CACHE_MB = int(os.environ.get('KNC_DISK_CACHE_MB', '2048'))
+
+# Uploads are hashed in chunks of this size
+HASH_CHUNK = 16 * 1024 * 1024
+
+# Worker processes parsing a multi-file upload (knc.worker), KNC_PARSE_WORKERS (default one per core)
+PARSE_WORKERS = int(os.environ.get('KNC_PARSE_WORKERS', '0')) or os.cpu_count() or 1
+
+# Sets of built page figures kept in memory, can be set with KNC_FIGURE_CACHE
+FIGURE_CACHE_ENTRIES = int(os.environ.get('KNC_FIGURE_CACHE', '32'))
+
+
+class ParseCache:
+    # Parsed step matrices keyed by content hash, evicted least recently used first
+    # once the stored arrays exceed max_bytes. One instance is shared by every page
+    # and every session of the process.
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if value.nbytes > self.max_bytes:
+            return
+        # cached arrays are shared between reruns and sessions, nobody may change them in place
+        value.flags.writeable = False
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key).nbytes
+            self.entries[key] = value
+            self.size += value.nbytes
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted.nbytes
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'size_mb': self.size / 1024 / 1024,
+                'max_mb': self.max_bytes / 1024 / 1024,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+class DiskCache:
+    # Parsed step matrices stored as column-major .npy files, one per content hash.
+    # The least recently used files are deleted once the directory exceeds max_bytes.
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.directory, key.replace(':', '_') + '.npy')
+
+    def files(self):
+        # (path, mtime, size) of the cached files. Other sessions and processes evict and
+        # clear the same directory, a file gone before it is looked at is left out.
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return []
+        files = []
+        for entry in entries:
+            if not entry.name.endswith('.npy'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((entry.path, stat.st_mtime, stat.st_size))
+        return files
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            value = np.load(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        # the modification time is the recency used for eviction, the file may just have
+        # been evicted or cleared by another session
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if value.nbytes > self.max_bytes:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # write to a temp file first, a concurrent reader never sees half a file
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix='.tmp', delete=False) as spool:
+            np.save(spool, np.asfortranarray(value))
+        os.replace(spool.name, self.path(key))
+        self.evict()
+
+    def evict(self):
+        with self.lock:
+            files = sorted(self.files(), key=lambda file: file[1])
+            size = sum(file_size for _, _, file_size in files)
+            while files and size > self.max_bytes:
+                path, _, file_size = files.pop(0)
+                size -= file_size
+                # another session or process may have deleted it first
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        for path, _, _ in self.files():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        files = self.files()
+        return {
+            'entries': len(files),
+            'size_mb': sum(file_size for _, _, file_size in files) / 1024 / 1024,
+            'max_mb': self.max_bytes / 1024 / 1024,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+class FigureCache:
+    # Built figures of the K&C pages keyed by figure_key, the least recently used set is
+    # dropped once there are more than max_entries. Shared by every session, the
+    # figures are only rendered and never changed after they are built.
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+parse_cache = ParseCache(PARSE_CACHE_MB * 1024 * 1024)
+disk_cache = DiskCache(DISK_CACHE_DIR, DISK_CACHE_MB * 1024 * 1024)
+figure_cache = FigureCache(FIGURE_CACHE_ENTRIES)
+
+
+def upload_hash(res_upload, progress=None):
+    # SHA-256 of the uploaded bytes, read in chunks. progress(bytes) after every chunk.
+    res_hash = hashlib.sha256()
+    res_upload.seek(0)
+    for res_chunk in iter(lambda: res_upload.read(HASH_CHUNK), b''):
+        res_hash.update(res_chunk)
+        if progress is not None:
+            progress(res_upload.tell())
+    res_upload.seek(0)
+    return res_hash.hexdigest()
+
+
+def cache_key(res_hash, res_channels=None):
+    # The same file is parsed into different matrices depending on the channels asked for
+    if res_channels is None:
+        return res_hash
+    return res_hash + ':' + hashlib.sha1(repr(list(res_channels)).encode()).hexdigest()
+
+
+def cache_lookup(key):
+    # The matrix of `key` from the in-process cache, then from the disk cache
+    res_matrix = parse_cache.get(key)
+    if res_matrix is None:
+        res_matrix = disk_cache.get(key)
+        if res_matrix is not None:
+            parse_cache.put(key, res_matrix)
+    return res_matrix
+
+
+def cache_store(key, res_matrix):
+    disk_cache.put(key, res_matrix)
+    parse_cache.put(key, res_matrix)
+
+
+def extract_key(res_hash):
+    # Cache key of the extract matrix of a file with content hash res_hash (upload_hash).
+    # The test column depends on the analysis name keywords as well.
+    return cache_key(res_hash, [('tests', kpi.TEST_KEYWORDS)] + kpi.all_channels())
+
+
+def figure_key(res_hash, *settings):
+    # The figures of a page depend on the file they plot, taken by the content hash the
+    # parse worker already has (upload_hash), on how it was extracted (extract_key) and
+    # on what they were built with: test, fit window and plot style
+    return hashlib.sha1(repr((extract_key(res_hash),) + settings).encode()).hexdigest()
+
+
+def cached_figures(key, build):
+    # The figures of `key`, build() only runs the first time
+    figures = figure_cache.get(key)
+    if figures is None:
+        figures = build()
+        figure_cache.put(key, figures)
+    return figures
+
+
+def cache_stats():
+    # one row per cache level, for the landing page
+    return {'Memory': parse_cache.stats(), 'Disk': disk_cache.stats()}
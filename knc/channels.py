@@ -0,0 +1,30 @@
+# Adams/Car testrig result channels used by the K&C pages.
+# Every channel is (header name, token position). The name is looked up in the
+# .res header; the position is only used for files whose header does not define it.
+
+# Angles are stored in rad
+RAD_TO_DEG = 180/3.1415926
+
+WHEEL_TRAVEL_LI = ('testrig.wheel_travel.left', 918)
+WHEEL_TRAVEL_RE = ('testrig.wheel_travel.right', 919)
+
+WHEEL_BASE_LI = ('testrig.wheel_travel_base.left', 922)
+WHEEL_BASE_RE = ('testrig.wheel_travel_base.right', 923)
+
+WC_TRACK_LI = ('testrig.wheel_travel_track.left', 924)
+WC_TRACK_RE = ('testrig.wheel_travel_track.right', 925)
+
+VERTICAL_FORCE_LI = ('testrig.wheel_load_vertical.left', 934)
+VERTICAL_FORCE_RE = ('testrig.wheel_load_vertical.right', 935)
+
+TOE_LI = ('testrig.toe_angle.left', 1025)
+TOE_RE = ('testrig.toe_angle.right', 1026)
+
+CAMBER_LI = ('testrig.camber_angle.left', 1027)
+CAMBER_RE = ('testrig.camber_angle.right', 1028)
+
+TIRE_CP_Y_LI = ('testrig.contact_patch_left.y', 1057)
+TIRE_CP_Y_RE = ('testrig.contact_patch_right.y', 1062)
+
+TIRE_FORCE_Y_LI = ('testrig.tire_forces_left.fy', 1097)
+TIRE_FORCE_Y_RE = ('testrig.tire_forces_right.fy', 1109)
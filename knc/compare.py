@@ -0,0 +1,138 @@
+# Variant comparison: N runs of the same test resampled onto a common x grid.
+#
+# Every KPI curve of every run is interpolated (np.interp) onto one grid per x column,
+# spanning the x range all runs cover. A sweep goes up and down in x (load and unload,
+# hysteresis), so a run is cut into its monotonic branches and the rising and the
+# falling branches are resampled separately: the curve of a run follows the grid up
+# and back down again (compare_path). The curves of a KPI are then an (n_runs x
+# path points) array, so the delta to the baseline run, and the KPI slope deltas, are
+# plain array operations. Only the resampled curves are kept, memory grows with
+# n_runs * COMPARE_POINTS and not with the size of the files.
+import numpy as np
+import pandas as pd
+
+from knc import kpi
+from knc.lazy import LazyChannelFrame
+
+# Points of the common grid
+COMPARE_POINTS = 200
+
+
+def compare_grid(x_ranges, n_points=COMPARE_POINTS):
+    # Grid over the x range covered by every run, x_ranges is a list of (min, max)
+    lo = max(x_min for x_min, _ in x_ranges)
+    hi = min(x_max for _, x_max in x_ranges)
+    if not lo < hi:
+        # no common range, fall back to the union
+        lo, hi = min(x_min for x_min, _ in x_ranges), max(x_max for _, x_max in x_ranges)
+    return np.linspace(lo, hi, n_points)
+
+
+def compare_path(grid):
+    # x of a resampled curve: the grid up (rising branches), then down (falling ones)
+    return np.concatenate([grid, grid[::-1]])
+
+
+def compare_branches(x):
+    # (start, stop, direction) of the monotonic branches of x, x[start:stop + 1] rises
+    # (direction 1) or falls (-1). A turning point ends one branch and starts the next,
+    # steps without change in x belong to the branch they are in.
+    step = np.sign(np.diff(x))
+    moving = np.flatnonzero(step)
+    if not len(moving):
+        return []
+    step = step[np.maximum.accumulate(np.where(step != 0, np.arange(len(step)), moving[0]))]
+    bounds = np.concatenate([[0], np.flatnonzero(step[1:] != step[:-1]) + 1, [len(step)]])
+    return [(start, stop, int(step[start])) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def compare_resample(x, responses, grid):
+    # Interpolate every column of responses (n_points x n_channels) over x onto the
+    # path of grid (compare_path). Each branch is interpolated over its own x range,
+    # branches going the same way are averaged where they overlap, path points no
+    # branch reaches are NaN. Returns (n_channels x 2 * len(grid)).
+    x = np.asarray(x, dtype=np.float64)
+    valid = ~np.isnan(x)
+    x = x[valid]
+    responses = np.asarray(responses, dtype=np.float64)[valid]
+    # sums and counts of the rising (0) and falling (1) branches on the grid
+    sums = np.zeros((2, responses.shape[1], len(grid)))
+    counts = np.zeros((2, 1, len(grid)))
+    for start, stop, direction in compare_branches(x):
+        branch = slice(start, stop + 1) if direction > 0 else slice(stop, start - 1 if start else None, -1)
+        values = np.vstack([np.interp(grid, x[branch], responses[branch, i], left=np.nan, right=np.nan)
+                            for i in range(responses.shape[1])])
+        reached = ~np.isnan(values[:1])
+        half = 0 if direction > 0 else 1
+        sums[half] += np.where(reached, values, 0.0)
+        counts[half] += reached
+    with np.errstate(invalid='ignore'):
+        resampled = sums / counts
+    return np.hstack([resampled[0], resampled[1][:, ::-1]])
+
+
+def compare_runs(test, matrices, names, baseline=0, n_points=COMPARE_POINTS):
+    # Compare the step matrices of a test (columns of kpi.KPI_TESTS[test]).
+    # Runs with fewer than two steps are left out, see 'skipped'.
+    # Returns {'names', 'baseline', 'skipped', 'kpis' (runs x parameters slopes), 'kpi_deltas',
+    #          'curves': {parameter: {'x', 'grid' (x along the path), 'curves', 'deltas'}}}
+    test_columns, offset_column = kpi.KPI_TESTS[test]['columns'], kpi.KPI_TESTS[test]['offset_column']
+    test_kpis = kpi.test_kpis(test)
+    kept = [i for i, matrix in enumerate(matrices) if len(matrix) > 1]
+    runs = [(names[i], matrices[i]) for i in kept]
+    skipped = [names[i] for i in range(len(matrices)) if i not in kept]
+    run_names = [name for name, _ in runs]
+    if not runs:
+        return {'names': [], 'baseline': 0, 'skipped': skipped, 'kpis': pd.DataFrame(), 'kpi_deltas': pd.DataFrame(), 'curves': {}}
+    # baseline is an index into matrices, the first kept run if it was left out
+    baseline = kept.index(baseline) if baseline in kept else 0
+
+    def run_frames(matrix):
+        frame = LazyChannelFrame(matrix, test_columns)
+        return {'raw': frame, 'offset': frame.offset(offset_column)}
+
+    # One grid per (frame, x column), KPIs sharing it are resampled together
+    groups = {}
+    for test_kpi in test_kpis:
+        groups.setdefault((test_kpi['frame'], test_kpi['x']), []).append(test_kpi)
+
+    # The runs are visited one at a time and dropped again, first for the x ranges,
+    # then for the curves and slopes
+    x_ranges = {group: [] for group in groups}
+    for _, matrix in runs:
+        frames = run_frames(matrix)
+        for frame_name, x in groups:
+            x_ranges[frame_name, x].append((np.nanmin(frames[frame_name][x]), np.nanmax(frames[frame_name][x])))
+    grids = {group: compare_grid(x_ranges[group], n_points) for group in groups}
+
+    slopes = np.empty((len(runs), len(test_kpis)))
+    group_curves = {group: np.empty((len(groups[group]), len(runs), 2 * n_points)) for group in groups}
+    for run, (_, matrix) in enumerate(runs):
+        frames = run_frames(matrix)
+        for (frame_name, x), group in groups.items():
+            responses = np.column_stack([test_kpi['sign'] * frames[frame_name][test_kpi['y']] for test_kpi in group])
+            group_curves[frame_name, x][:, run] = compare_resample(frames[frame_name][x], responses, grids[frame_name, x])
+        slopes[run] = [fit[0] for fit in kpi.test_fits(test, frames['offset'], frames['raw']).values()]
+
+    # Path points no run reaches are dropped, e.g. the way down when no run has one
+    curves = {}
+    for (frame_name, x), group in groups.items():
+        reached = ~np.isnan(group_curves[frame_name, x]).all(axis=(0, 1))
+        for i, test_kpi in enumerate(group):
+            kpi_curves = group_curves[frame_name, x][i][:, reached]
+            curves[test_kpi['parameter']] = {
+                'x': x,
+                'grid': compare_path(grids[frame_name, x])[reached],
+                'curves': kpi_curves,
+                'deltas': kpi_curves - kpi_curves[baseline],
+            }
+
+    kpis = pd.DataFrame(slopes, index=run_names, columns=[test_kpi['parameter'] for test_kpi in test_kpis])
+    return {
+        'names': run_names,
+        'baseline': baseline,
+        'skipped': skipped,
+        'kpis': kpis,
+        'kpi_deltas': kpis - kpis.iloc[baseline],
+        'curves': {test_kpi['parameter']: curves[test_kpi['parameter']] for test_kpi in test_kpis},
+    }
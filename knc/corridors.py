@@ -0,0 +1,72 @@
+# Target corridors: the min / max a KPI slope has to stay in, per vehicle class.
+#
+# A corridor is set on the KPI without its side (bump_Toe_Change holds for
+# bump_Toe_Change_li and _re) and in the units targets are written in (deg/m rather
+# than deg/mm, mm/m rather than mm/mm, mm/kN rather than mm/N, see CORRIDOR_UNITS).
+# corridor_check takes the runs of a database query and the corridors of every vehicle
+# class, and lines up the slopes, the lower and the upper bounds as (runs x KPIs)
+# arrays. Pass / fail of all runs is then one comparison over these arrays, whatever
+# the number of runs.
+import numpy as np
+import pandas as pd
+
+from knc import kpi
+
+# Columns of a corridor table; a missing min or max is an open bound
+CORRIDOR_COLUMNS = ['vehicle_class', 'parameter', 'min', 'max']
+
+# Registry unit: (corridor unit, factor from the registry unit)
+CORRIDOR_UNITS = {
+    'deg/mm': ('deg/m', 1000.0),
+    'mm/mm': ('mm/m', 1000.0),
+    'mm/N': ('mm/kN', 1000.0),
+    'deg/N': ('deg/kN', 1000.0),
+}
+
+
+def corridor_parameter(parameter):
+    # KPI name without the side
+    for side in kpi.SIDES:
+        if parameter.endswith('_' + side):
+            return parameter[:-len(side) - 1]
+    return parameter
+
+
+def corridor_units():
+    # {KPI: (corridor unit, factor)} of every registered KPI (with side)
+    return {
+        test_kpi['parameter']: CORRIDOR_UNITS.get(test_kpi['unit'], (test_kpi['unit'], 1.0))
+        for test in kpi.KPI_TESTS for test_kpi in kpi.test_kpis(test)
+    }
+
+
+def corridor_parameters():
+    # {corridor parameter: corridor unit}, the parameters a corridor can be set on
+    parameters = {}
+    for parameter, (unit, _) in corridor_units().items():
+        parameters.setdefault(corridor_parameter(parameter), unit)
+    return parameters
+
+
+def corridor_check(runs, corridors, vehicle_classes):
+    # runs: a database_query table (vehicle column and one column per KPI),
+    # corridors: a CORRIDOR_COLUMNS table, vehicle_classes: {vehicle: vehicle class}.
+    # Returns a (runs x KPIs) table indexed like runs: 1 pass, 0 fail, NaN when the run
+    # has no value or its vehicle class no corridor for the KPI.
+    units = corridor_units()
+    columns = [column for column in runs.columns if column in units]
+    values = runs[columns].to_numpy(dtype=np.float64) * np.array([units[column][1] for column in columns])
+
+    corridors = corridors.dropna(subset=['vehicle_class', 'parameter']).drop_duplicates(['vehicle_class', 'parameter'], keep='last')
+    run_classes = runs['vehicle'].map(vehicle_classes)
+    corridor_columns = [corridor_parameter(column) for column in columns]
+    bounds = {}
+    for bound in ('min', 'max'):
+        table = corridors.assign(**{bound: pd.to_numeric(corridors[bound], errors='coerce')}).pivot(index='vehicle_class', columns='parameter', values=bound)
+        bounds[bound] = table.reindex(index=run_classes, columns=corridor_columns).to_numpy(dtype=np.float64)
+    lower, upper = bounds['min'], bounds['max']
+
+    with np.errstate(invalid='ignore'):
+        passed = (np.isnan(lower) | (values >= lower)) & (np.isnan(upper) | (values <= upper))
+    checked = ~np.isnan(values) & ~(np.isnan(lower) & np.isnan(upper))
+    return pd.DataFrame(np.where(checked, passed, np.nan), index=runs.index, columns=columns)
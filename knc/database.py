@@ -0,0 +1,380 @@
+# Local K&C results database (SQLite, one file).
+#
+# Every stored run keeps its metadata (file, vehicle, axle, test, date), the KPIs of its
+# test (slope, intercept, r2, unit) and each KPI curve downsampled onto
+# DATABASE_CURVE_POINTS points. runs is indexed on vehicle, axle, test and date, so
+# filtered queries stay fast with tens of thousands of runs. A run is identified by the
+# file content hash and the test: storing the same file again replaces it.
+#
+# The aggregates table holds running statistics (knc.aggregates) of the KPI slopes per
+# test, vehicle and axle. It is updated with every stored or deleted run, in the write
+# transaction of the run (database_write), so fleet statistics never have to go over
+# the whole kpis table. A run is marked aggregated once it has been counted, or left
+# out for KPIs that are not finite.
+#
+# The target corridors (knc.corridors) and the vehicle class of every vehicle are kept
+# in the database as well, next to the runs they are checked against.
+import datetime
+import os
+import sqlite3
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from knc import aggregates, kpi
+from knc.compare import compare_grid, compare_path, compare_resample
+from knc.corridors import CORRIDOR_COLUMNS
+from knc.lazy import LazyChannelFrame
+
+# Database file, can be set with KNC_DATABASE
+DATABASE_PATH = os.environ.get('KNC_DATABASE', 'knc_results.sqlite')
+
+# Points of a stored KPI curve
+DATABASE_CURVE_POINTS = 100
+
+DATABASE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL,
+    file_hash TEXT NOT NULL,
+    vehicle TEXT NOT NULL DEFAULT '',
+    axle TEXT NOT NULL DEFAULT '',
+    test TEXT NOT NULL,
+    date TEXT NOT NULL,
+    steps INTEGER NOT NULL,
+    stored TEXT NOT NULL,
+    aggregated INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (file_hash, test)
+);
+CREATE INDEX IF NOT EXISTS runs_vehicle ON runs (vehicle);
+CREATE INDEX IF NOT EXISTS runs_axle ON runs (axle);
+CREATE INDEX IF NOT EXISTS runs_test ON runs (test);
+CREATE INDEX IF NOT EXISTS runs_date ON runs (date);
+CREATE INDEX IF NOT EXISTS runs_test_vehicle_axle_date ON runs (test, vehicle, axle, date);
+
+CREATE TABLE IF NOT EXISTS kpis (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    parameter TEXT NOT NULL,
+    slope REAL,
+    intercept REAL,
+    r2 REAL,
+    unit TEXT NOT NULL,
+    PRIMARY KEY (run_id, parameter)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS kpis_parameter ON kpis (parameter);
+
+CREATE TABLE IF NOT EXISTS aggregates (
+    test TEXT NOT NULL,
+    vehicle TEXT NOT NULL,
+    axle TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    mean BLOB NOT NULL,
+    comoment BLOB NOT NULL,
+    PRIMARY KEY (test, vehicle, axle)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS curves (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    parameter TEXT NOT NULL,
+    x BLOB NOT NULL,
+    y BLOB NOT NULL,
+    PRIMARY KEY (run_id, parameter)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS vehicle_classes (
+    vehicle TEXT PRIMARY KEY,
+    vehicle_class TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS corridors (
+    vehicle_class TEXT NOT NULL,
+    parameter TEXT NOT NULL,
+    min REAL,
+    max REAL,
+    PRIMARY KEY (vehicle_class, parameter)
+) WITHOUT ROWID;
+'''
+
+# Columns of the run table returned by database_query, the KPI columns follow
+DATABASE_RUN_COLUMNS = ['id', 'file', 'vehicle', 'axle', 'test', 'date', 'steps', 'stored']
+
+
+def database_connect(path=DATABASE_PATH):
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA foreign_keys=ON')
+    connection.executescript(DATABASE_SCHEMA)
+    # databases from before the aggregated flag count every run again
+    if 'aggregated' not in [row[1] for row in connection.execute('PRAGMA table_info(runs)')]:
+        connection.execute('ALTER TABLE runs ADD COLUMN aggregated INTEGER NOT NULL DEFAULT 0')
+    connection.execute('CREATE INDEX IF NOT EXISTS runs_not_aggregated ON runs (id) WHERE aggregated = 0')
+    # runs not in the aggregates yet, or a change of the KPI registry
+    stale = connection.execute('SELECT EXISTS (SELECT 1 FROM runs WHERE aggregated = 0)').fetchone()[0] == 1
+    for test, mean in connection.execute('SELECT test, mean FROM aggregates').fetchall():
+        stale = stale or test not in kpi.KPI_TESTS or len(mean) != 8 * len(kpi.test_kpis(test))
+    if stale:
+        database_rebuild_aggregates(connection)
+    return connection
+
+
+@contextmanager
+def database_write(connection):
+    # A write transaction that takes the database lock at once (BEGIN IMMEDIATE), so the
+    # reads of a read-modify-write, like an aggregates update, cannot interleave with
+    # the store of another connection. Committed on exit, rolled back on an error.
+    with connection:
+        connection.execute('BEGIN IMMEDIATE')
+        yield connection
+
+
+def test_parameters(test):
+    return [test_kpi['parameter'] for test_kpi in kpi.test_kpis(test)]
+
+
+def run_values(connection, run_id, test):
+    # KPI slopes of a stored run in registry order, None if any is missing or not finite
+    slopes = dict(connection.execute('SELECT parameter, slope FROM kpis WHERE run_id = ?', (run_id,)).fetchall())
+    values = [slopes.get(parameter) for parameter in test_parameters(test)]
+    if any(value is None for value in values) or not np.isfinite(values).all():
+        return None
+    return values
+
+
+def aggregate_row_state(row):
+    # State of an aggregates row (n, mean, comoment)
+    n, mean, comoment = row
+    mean = np.frombuffer(mean, dtype=np.float64)
+    return n, mean, np.frombuffer(comoment, dtype=np.float64).reshape(len(mean), len(mean))
+
+
+def aggregate_state(connection, test, vehicle, axle):
+    row = connection.execute('SELECT n, mean, comoment FROM aggregates WHERE test = ? AND vehicle = ? AND axle = ?', (test, vehicle, axle)).fetchone()
+    if row is None:
+        return aggregates.aggregate_empty(len(test_parameters(test)))
+    return aggregate_row_state(row)
+
+
+def aggregate_update(connection, test, vehicle, axle, values, remove=False):
+    # Add (or remove) the KPI slopes of one run to the running statistics of its group
+    state = aggregate_state(connection, test, vehicle, axle)
+    n, mean, comoment = aggregates.aggregate_remove(state, values) if remove else aggregates.aggregate_add(state, values)
+    connection.execute(
+        'INSERT OR REPLACE INTO aggregates (test, vehicle, axle, n, mean, comoment) VALUES (?, ?, ?, ?, ?, ?)',
+        (test, vehicle, axle, n, mean.tobytes(), comoment.tobytes()),
+    )
+
+
+def run_delete(connection, run_id):
+    # Delete a run and take it out of the aggregates, call inside database_write
+    run = connection.execute('SELECT test, vehicle, axle, aggregated FROM runs WHERE id = ?', (run_id,)).fetchone()
+    if run is None:
+        return
+    values = run_values(connection, run_id, run[0]) if run[0] in kpi.KPI_TESTS and run[3] else None
+    if values is not None:
+        aggregate_update(connection, *run[:3], values, remove=True)
+    connection.execute('DELETE FROM runs WHERE id = ?', (run_id,))
+
+
+def database_rebuild_aggregates(connection):
+    # Recompute the aggregates table from the stored KPIs, every run is counted then
+    with database_write(connection):
+        connection.execute('DELETE FROM aggregates')
+        groups = {}
+        for run_id, test, vehicle, axle in connection.execute('SELECT id, test, vehicle, axle FROM runs').fetchall():
+            values = run_values(connection, run_id, test) if test in kpi.KPI_TESTS else None
+            if values is not None:
+                state = groups.get((test, vehicle, axle), aggregates.aggregate_empty(len(values)))
+                groups[test, vehicle, axle] = aggregates.aggregate_add(state, values)
+        connection.executemany(
+            'INSERT INTO aggregates (test, vehicle, axle, n, mean, comoment) VALUES (?, ?, ?, ?, ?, ?)',
+            [(*group, n, mean.tobytes(), comoment.tobytes()) for group, (n, mean, comoment) in groups.items()],
+        )
+        connection.execute('UPDATE runs SET aggregated = 1 WHERE aggregated = 0')
+
+
+def run_curves(test, df_offset, df, n_points=DATABASE_CURVE_POINTS):
+    # {parameter: (x, y)} of every KPI curve resampled onto n_points over its own x range,
+    # up and down again for a sweep with load and unload (knc.compare)
+    frames = {'offset': df_offset, 'raw': df}
+    curves = {}
+    for test_kpi in kpi.test_kpis(test):
+        x = frames[test_kpi['frame']][test_kpi['x']]
+        grid = compare_grid([(np.nanmin(x), np.nanmax(x))], n_points)
+        y = test_kpi['sign'] * frames[test_kpi['frame']][test_kpi['y']]
+        resampled = compare_resample(x, y[:, None], grid)[0]
+        reached = ~np.isnan(resampled)
+        curves[test_kpi['parameter']] = (compare_path(grid)[reached], resampled[reached])
+    return curves
+
+
+def database_store_run(connection, test, matrix, file, file_hash, vehicle='', axle='', date=None):
+    # Fit and store the step matrix of one test (columns of kpi.KPI_TESTS[test]), returns the run id
+    frame = LazyChannelFrame(matrix, kpi.KPI_TESTS[test]['columns'])
+    frame_offset = frame.offset(kpi.KPI_TESTS[test]['offset_column'])
+    fits = kpi.test_fits(test, frame_offset, frame)
+    curves = run_curves(test, frame_offset, frame)
+    units = {test_kpi['parameter']: test_kpi['unit'] for test_kpi in kpi.test_kpis(test)}
+    date = date or datetime.date.today().isoformat()
+    stored = datetime.datetime.now().isoformat(timespec='seconds')
+
+    with database_write(connection):
+        for previous_id, in connection.execute('SELECT id FROM runs WHERE file_hash = ? AND test = ?', (file_hash, test)).fetchall():
+            run_delete(connection, previous_id)
+        # counted in the aggregates below, or left out for KPIs that are not finite
+        run_id = connection.execute(
+            'INSERT INTO runs (file, file_hash, vehicle, axle, test, date, steps, stored, aggregated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)',
+            (file, file_hash, vehicle, axle, test, date, len(matrix), stored),
+        ).lastrowid
+        connection.executemany(
+            'INSERT INTO kpis (run_id, parameter, slope, intercept, r2, unit) VALUES (?, ?, ?, ?, ?, ?)',
+            [(run_id, parameter, float(slope), float(intercept), float(r2), units[parameter])
+             for parameter, (slope, intercept, r2) in fits.items()],
+        )
+        connection.executemany(
+            'INSERT INTO curves (run_id, parameter, x, y) VALUES (?, ?, ?, ?)',
+            [(run_id, parameter, x.astype(np.float32).tobytes(), y.astype(np.float32).tobytes())
+             for parameter, (x, y) in curves.items()],
+        )
+        values = run_values(connection, run_id, test)
+        if values is not None:
+            aggregate_update(connection, test, vehicle, axle, values)
+    return run_id
+
+
+def filter_in(table, column, value):
+    # 'table.column IN (?, ...)' and its parameters, value is one value or a list
+    values = [value] if isinstance(value, str) else list(value)
+    return f"{table}.{column} IN ({', '.join('?' * len(values))})", values
+
+
+def database_filter(vehicle=None, axle=None, test=None, date_from=None, date_to=None):
+    # WHERE clause and parameters on runs; None (or an empty list) means no filter
+    clauses, parameters = [], []
+    for column, value in (('vehicle', vehicle), ('axle', axle), ('test', test)):
+        if value:
+            clause, values = filter_in('runs', column, value)
+            clauses.append(clause)
+            parameters.extend(values)
+    if date_from:
+        clauses.append('runs.date >= ?')
+        parameters.append(str(date_from))
+    if date_to:
+        clauses.append('runs.date <= ?')
+        parameters.append(str(date_to))
+    return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', parameters
+
+
+def aggregates_filter(test, vehicle=None, axle=None):
+    # WHERE clause and parameters on the aggregates of a test, as database_filter
+    clauses, parameters = ['aggregates.test = ?'], [test]
+    for column, value in (('vehicle', vehicle), ('axle', axle)):
+        if value:
+            clause, values = filter_in('aggregates', column, value)
+            clauses.append(clause)
+            parameters.extend(values)
+    return ' WHERE ' + ' AND '.join(clauses), parameters
+
+
+def database_query(connection, **filters):
+    # One row per run matching the filters (see database_filter), the run columns and
+    # the slope of every KPI found, newest test date first
+    where, parameters = database_filter(**filters)
+    runs = pd.read_sql_query(
+        f"SELECT {', '.join('runs.' + column for column in DATABASE_RUN_COLUMNS)} FROM runs{where} ORDER BY runs.date DESC, runs.id DESC",
+        connection, params=parameters,
+    )
+    slopes = pd.read_sql_query(
+        f'SELECT kpis.run_id, kpis.parameter, kpis.slope FROM kpis JOIN runs ON runs.id = kpis.run_id{where}',
+        connection, params=parameters,
+    )
+    if not len(slopes):
+        return runs
+    slopes = slopes.pivot(index='run_id', columns='parameter', values='slope')
+    # keep the registry order of the parameters
+    order = [test_kpi['parameter'] for test in kpi.KPI_TESTS for test_kpi in kpi.test_kpis(test)]
+    slopes = slopes[[parameter for parameter in order if parameter in slopes.columns]]
+    return runs.join(slopes, on='id')
+
+
+def database_values(connection, column):
+    # Distinct values of a run column, for the filter widgets
+    if column not in DATABASE_RUN_COLUMNS:
+        raise ValueError(f'unknown run column: {column}')
+    return [row[0] for row in connection.execute(f'SELECT DISTINCT {column} FROM runs ORDER BY {column}')]
+
+
+def database_curves(connection, run_ids, parameter):
+    # {run id: (x, y)} of one stored KPI curve
+    run_ids = list(run_ids)
+    if not run_ids:
+        return {}
+    rows = connection.execute(
+        f"SELECT run_id, x, y FROM curves WHERE parameter = ? AND run_id IN ({', '.join('?' * len(run_ids))})",
+        [parameter] + run_ids,
+    )
+    return {run_id: (np.frombuffer(x, dtype=np.float32), np.frombuffer(y, dtype=np.float32)) for run_id, x, y in rows}
+
+
+def database_delete(connection, run_ids):
+    with database_write(connection):
+        for run_id in run_ids:
+            run_delete(connection, run_id)
+
+
+def database_aggregate(connection, test, vehicle=None, axle=None):
+    # Running statistics of a test over the matching vehicle/axle groups (None or an
+    # empty list: all), merged into one state. Returns (parameters, state).
+    parameters = test_parameters(test)
+    where, values = aggregates_filter(test, vehicle, axle)
+    state = aggregates.aggregate_empty(len(parameters))
+    for row in connection.execute(f'SELECT n, mean, comoment FROM aggregates{where}', values).fetchall():
+        state = aggregates.aggregate_merge(state, aggregate_row_state(row))
+    return parameters, state
+
+
+def database_kpi_values(connection, parameters, **filters):
+    # Slopes of the given KPIs, one row per matching run (for distributions and scatter plots)
+    where, values = database_filter(**filters)
+    slopes = pd.read_sql_query(
+        f"SELECT kpis.run_id, kpis.parameter, kpis.slope FROM kpis JOIN runs ON runs.id = kpis.run_id{where}"
+        f"{' AND' if where else ' WHERE'} kpis.parameter IN ({', '.join('?' * len(parameters))})",
+        connection, params=values + list(parameters),
+    )
+    return slopes.pivot(index='run_id', columns='parameter', values='slope').reindex(columns=list(parameters))
+
+
+def database_vehicle_classes(connection):
+    # {vehicle: vehicle class}
+    return dict(connection.execute('SELECT vehicle, vehicle_class FROM vehicle_classes').fetchall())
+
+
+def database_store_vehicle_classes(connection, vehicle_classes):
+    # Replace the vehicle classes, vehicles without a class are left out
+    with connection:
+        connection.execute('DELETE FROM vehicle_classes')
+        connection.executemany(
+            'INSERT INTO vehicle_classes (vehicle, vehicle_class) VALUES (?, ?)',
+            [(vehicle, vehicle_class) for vehicle, vehicle_class in vehicle_classes.items() if vehicle_class],
+        )
+
+
+def database_corridors(connection):
+    # The target corridors as a CORRIDOR_COLUMNS table
+    return pd.read_sql_query(
+        f"SELECT {', '.join(CORRIDOR_COLUMNS)} FROM corridors ORDER BY vehicle_class, parameter", connection,
+    )
+
+
+def database_store_corridors(connection, corridors):
+    # Replace the target corridors, rows without class or parameter are left out
+    corridors = corridors[CORRIDOR_COLUMNS].dropna(subset=['vehicle_class', 'parameter'])
+    corridors = corridors[(corridors['vehicle_class'] != '') & (corridors['parameter'] != '')]
+    corridors = corridors.drop_duplicates(['vehicle_class', 'parameter'], keep='last')
+    with connection:
+        connection.execute('DELETE FROM corridors')
+        connection.executemany(
+            'INSERT INTO corridors (vehicle_class, parameter, min, max) VALUES (?, ?, ?, ?)',
+            [(vehicle_class, parameter, None if pd.isna(lower) else float(lower), None if pd.isna(upper) else float(upper))
+             for vehicle_class, parameter, lower, upper in corridors.itertuples(index=False)],
+        )
@@ -0,0 +1,50 @@
+# Downsampling of curve traces to a fixed point budget.
+#
+# Largest-Triangle-Three-Buckets: the first and last step are kept, the steps in
+# between are split into n_points - 2 buckets in step order, and each bucket keeps
+# the step spanning the largest triangle with the step kept before it and the mean of
+# the next bucket. Peaks and the turning points of a load / unload sweep are kept,
+# where taking every n-th step drops them. Buckets follow the step order and not x,
+# so hysteresis loops come out as loops.
+import os
+
+import numpy as np
+
+# Point budget of a curve trace, can be set with KNC_PLOT_POINTS
+DOWNSAMPLE_POINTS = int(os.environ.get('KNC_PLOT_POINTS', '2000'))
+
+
+def lttb(x, y, n_points=DOWNSAMPLE_POINTS):
+    # Indices of the n_points steps kept out of x, y (all of them when they fit)
+    n = len(x)
+    if n <= n_points or n_points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_points - 1).astype(np.int64)
+    # mean of every bucket, the last point stands for the bucket after the last one
+    x_means = np.append(np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / np.diff(edges), x[-1])
+    y_means = np.append(np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / np.diff(edges), y[-1])
+
+    kept = np.empty(n_points, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for bucket in range(n_points - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        x_next, y_next = x_means[bucket + 1], y_means[bucket + 1]
+        # twice the triangle area, the constant factor does not change the argmax
+        area = np.abs((x[a] - x_next) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (y_next - y[a]))
+        a = lo + int(np.argmax(area))
+        kept[bucket + 1] = a
+    return kept
+
+
+def downsample_xy(x, y, n_points=DOWNSAMPLE_POINTS):
+    # x and y of a curve trace within the point budget, as trace keyword arguments
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    finite = np.isfinite(x) & np.isfinite(y)
+    if not finite.all():
+        x, y = x[finite], y[finite]
+    kept = lttb(x, y, n_points)
+    return {'x': x[kept], 'y': y[kept]}
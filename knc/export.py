@@ -0,0 +1,64 @@
+# Downloads of the results of a K&C page, built in memory when they are requested.
+#
+# The page hands st.download_button a callable (export_data) instead of the file, so
+# the bytes are only written out of the cached arrays when the button is clicked, in
+# a BytesIO and never on the server disk. Parquet and Excel need a writer engine
+# (pyarrow, openpyxl), formats without one are left out of export_formats, and so is
+# Excel for frames longer than a worksheet (EXCEL_MAX_ROWS).
+import importlib.util
+import io
+
+import pandas as pd
+
+from knc import kpi
+
+# format: (file extension, MIME type, writer modules, any one of them is enough)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv', []),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet', ['pyarrow', 'fastparquet']),
+    'Excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', ['openpyxl', 'xlsxwriter']),
+}
+
+# Rows of an Excel worksheet, the header takes one of them
+EXCEL_MAX_ROWS = 1048576
+
+
+def export_formats(rows=0):
+    # Formats whose writer is installed and that can hold a frame of `rows` rows
+    return [
+        export_format for export_format, (_, _, modules) in EXPORT_FORMATS.items()
+        if (not modules or any(importlib.util.find_spec(module) for module in modules))
+        and not (export_format == 'Excel' and rows >= EXCEL_MAX_ROWS)
+    ]
+
+
+def export_raw_frame(matrix, columns):
+    # The parsed step matrix as cached: unscaled values, one column per channel
+    return pd.DataFrame(matrix, columns=[f'{name}:{number}' for name, number in kpi.column_channels(columns)])
+
+
+def export_bytes(df, export_format):
+    buffer = io.BytesIO()
+    if export_format == 'CSV':
+        df.to_csv(buffer, index=False)
+    elif export_format == 'Parquet':
+        df.to_parquet(buffer, index=False)
+    elif export_format == 'Excel':
+        if len(df) >= EXCEL_MAX_ROWS:
+            raise ValueError(f'{len(df):,} rows do not fit in an Excel worksheet '
+                             f'({EXCEL_MAX_ROWS - 1:,} rows at most), use CSV or Parquet')
+        df.to_excel(buffer, index=False)
+    else:
+        raise ValueError(f'Unknown export format: {export_format}')
+    return buffer.getvalue()
+
+
+def export_data(build_frame, export_format):
+    # Callable for st.download_button: builds the DataFrame and the file on click
+    return lambda: export_bytes(build_frame(), export_format)
+
+
+def export_file(name, export_format):
+    # (file name, MIME type) of a download
+    extension, mime, _ = EXPORT_FORMATS[export_format]
+    return f'{name}.{extension}', mime
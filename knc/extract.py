@@ -0,0 +1,136 @@
+# One-pass extraction of every registered K&C test from a .res file.
+#
+# A full K&C run often holds bounce, roll and lateral load cases in one file, one
+# <Analysis> each. The file is scanned once: the steps are located, the channels of
+# all tests (kpi.all_channels) are tokenized together, and every step is labelled
+# with the test of its analysis (kpi.detect_test on the analysis name). The result is
+# one matrix, the channels followed by a test column, which is what the cache stores.
+# extract_test cuts the matrix of a single test out of it. Steps of an analysis named
+# as no test are left out of every test, a file none of whose analyses is named as a
+# test holds no test at all (extract_analysis_tests tells the pages so).
+#
+# Given a progress callback (knc.worker), progress(stage, steps, offset) is called while
+# an upload is spooled ('read') and its steps are located ('locate'), and after every
+# chunk of tokenized steps ('tokenize'), with the steps found or tokenized so far and
+# the byte offset reached. An exception it raises stops the parse.
+import numpy as np
+
+from knc import kpi, timing
+from knc.res_parser import (
+    res_channel_columns,
+    res_channel_map,
+    res_header,
+    res_locate_analyses,
+    res_locate_steps,
+    res_mapped_file,
+    res_mapped_upload,
+    res_tokenize_steps,
+)
+
+# Test column value of the steps of a file with a single analysis: every test sees the
+# whole file.
+EXTRACT_NO_TEST = -1
+
+# Test column value of the steps of an analysis whose name is no registered test
+# (kpi.detect_test), or in front of the first analysis. No test sees them.
+EXTRACT_UNKNOWN_TEST = -2
+
+# Steps are tokenized in chunks of about this many bytes when progress is reported
+EXTRACT_CHUNK_BYTES = 16 * 1024 * 1024
+
+
+def extract_step_tests(res_content, res_offsets):
+    # Index in kpi.KPI_TESTS of the test of every step, from the analysis it is in
+    res_analyses = res_locate_analyses(res_content)
+    res_step_tests = np.full(len(res_offsets), EXTRACT_NO_TEST, dtype=np.float64)
+    if len(res_analyses) < 2 or not len(res_offsets):
+        return res_step_tests
+
+    tests = list(kpi.KPI_TESTS)
+    analysis_tests = np.array([
+        tests.index(test) if test is not None else EXTRACT_UNKNOWN_TEST
+        for test in (kpi.detect_test(name) for _, name in res_analyses)
+    ], dtype=np.float64)
+    analysis_starts = np.array([offset for offset, _ in res_analyses])
+    step_starts = np.array([start for start, _ in res_offsets])
+    step_analyses = np.searchsorted(analysis_starts, step_starts, side='right') - 1
+    res_step_tests[:] = EXTRACT_UNKNOWN_TEST
+    res_step_tests[step_analyses >= 0] = analysis_tests[step_analyses[step_analyses >= 0]]
+    return res_step_tests
+
+
+def extract_tokenize(res_content, res_offsets, res_columns, progress=None):
+    # res_tokenize_steps, in chunks of EXTRACT_CHUNK_BYTES when progress is given
+    if progress is None or not res_offsets:
+        return res_tokenize_steps(res_content, res_offsets, res_columns)
+
+    res_ends = np.array([end for _, end in res_offsets])
+    res_chunks = []
+    res_start = 0
+    while res_start < len(res_offsets):
+        res_stop = max(int(np.searchsorted(res_ends, res_ends[res_start] + EXTRACT_CHUNK_BYTES, side='right')), res_start + 1)
+        res_chunks.append(res_tokenize_steps(res_content, res_offsets[res_start:res_stop], res_columns))
+        progress('tokenize', res_stop, int(res_ends[res_stop - 1]))
+        res_start = res_stop
+    return np.vstack(res_chunks)
+
+
+def extract_content(res_content, progress=None):
+    # (n_steps x (len(kpi.all_channels()) + 1)) matrix: all channels, then the test column
+    res_channels = kpi.all_channels()
+    with timing.stage('locate'):
+        res_offsets = res_locate_steps(res_content, progress and (lambda steps, offset: progress('locate', steps, offset)))
+        res_columns = res_channel_columns(res_channels, res_channel_map(res_header(res_content)))
+        res_step_tests = extract_step_tests(res_content, res_offsets)
+        if progress is not None:
+            progress('locate', len(res_offsets), len(res_content))
+
+    with timing.stage('tokenize'):
+        res_matrix = extract_tokenize(res_content, res_offsets, res_columns, progress)
+    return np.column_stack([res_matrix, res_step_tests])
+
+
+def extract_upload(res_upload, progress=None):
+    with res_mapped_upload(res_upload, progress and (lambda offset: progress('read', 0, offset))) as res_content:
+        return extract_content(res_content, progress)
+
+
+def extract_file(res_path, progress=None):
+    # extract_content of a .res on disk, mapped as it is
+    with res_mapped_file(res_path) as res_content:
+        return extract_content(res_content, progress)
+
+
+def extract_test(res_matrix, test):
+    # Step matrix of one test (columns of KPI_TESTS[test]) out of an extract_content matrix
+    res_channels = kpi.all_channels()
+    test_columns = [res_channels.index(channel) for channel in kpi.column_channels(kpi.KPI_TESTS[test]['columns'])]
+    res_step_tests = res_matrix[:, -1]
+    if (res_step_tests == EXTRACT_NO_TEST).all():
+        return res_matrix[:, test_columns]
+    return res_matrix[res_step_tests == list(kpi.KPI_TESTS).index(test)][:, test_columns]
+
+
+def extract_analysis_tests(res_matrix):
+    # Tests of the analyses of a file with several analyses, in KPI_TESTS order. None for
+    # a single analysis file, an empty list when no analysis is named as a test.
+    res_step_tests = res_matrix[:, -1]
+    if (res_step_tests == EXTRACT_NO_TEST).all():
+        return None
+    return [test for i, test in enumerate(kpi.KPI_TESTS) if (res_step_tests == i).any()]
+
+
+def extract_tests(res_matrix):
+    # {test: step matrix} of every test that has steps in the file
+    test_matrices = {test: extract_test(res_matrix, test) for test in kpi.KPI_TESTS}
+    return {test: test_matrix for test, test_matrix in test_matrices.items() if len(test_matrix)}
+
+
+def extract_file_tests(res_matrix, name, default_test=None):
+    # {test: step matrix} of the tests a file really holds: the tests of its analyses
+    # (none if no analysis is named as a test), or for a single analysis file the test
+    # in its file name (default_test otherwise)
+    if not (res_matrix[:, -1] == EXTRACT_NO_TEST).all():
+        return extract_tests(res_matrix)
+    test = kpi.detect_test(name) or default_test
+    return {test: extract_test(res_matrix, test)} if test else {}
@@ -0,0 +1,225 @@
+# Registry of the K&C tests and the one engine that fits them. A test is data only:
+# the channels it reads with their unit transform, the column whose zero crossing is
+# the offset row, the fit window and its KPIs. Used by the Streamlit pages and by
+# the batch CLI (knc.batch), so nothing in here may import streamlit or plotly.
+import re
+
+import numpy as np
+
+from knc import channels, timing
+from knc.lazy import LazyChannelFrame
+from knc.regression import linear_fit, window_mask
+
+# DataFrame columns: (name, .res channel, scale)
+BUMP_COLUMNS = [
+    ('bump_wheel_travel_li', channels.WHEEL_TRAVEL_LI, 1),
+    ('bump_wheel_travel_re', channels.WHEEL_TRAVEL_RE, 1),
+    ('bump_toe_li', channels.TOE_LI, channels.RAD_TO_DEG),
+    ('bump_toe_re', channels.TOE_RE, channels.RAD_TO_DEG),
+    ('bump_camber_li', channels.CAMBER_LI, channels.RAD_TO_DEG),
+    ('bump_camber_re', channels.CAMBER_RE, channels.RAD_TO_DEG),
+    ('bump_vertical_force_li', channels.VERTICAL_FORCE_LI, 1),
+    ('bump_vertical_force_re', channels.VERTICAL_FORCE_RE, 1),
+    ('bump_wheel_base_li', channels.WHEEL_BASE_LI, 1),
+    ('bump_wheel_base_re', channels.WHEEL_BASE_RE, 1),
+    ('bump_tire_cp_y_li', channels.TIRE_CP_Y_LI, 1),
+    ('bump_tire_cp_y_re', channels.TIRE_CP_Y_RE, 1),
+]
+
+BUMP_ANTI_COLUMNS = [
+    ('bump_anti_wheel_travel_li', channels.WHEEL_TRAVEL_LI, 1),
+    ('bump_anti_wheel_travel_re', channels.WHEEL_TRAVEL_RE, 1),
+    ('bump_anti_toe_li', channels.TOE_LI, channels.RAD_TO_DEG),
+    ('bump_anti_toe_re', channels.TOE_RE, channels.RAD_TO_DEG),
+    ('bump_anti_camber_li', channels.CAMBER_LI, channels.RAD_TO_DEG),
+    ('bump_anti_camber_re', channels.CAMBER_RE, channels.RAD_TO_DEG),
+    ('bump_anti_vertical_force_li', channels.VERTICAL_FORCE_LI, 1),
+    ('bump_anti_vertical_force_re', channels.VERTICAL_FORCE_RE, 1),
+]
+
+LAT_ANTIPHASE_COLUMNS = [
+    ('lat_antiphase_tire_force_y_li', channels.TIRE_FORCE_Y_LI, -1),
+    ('lat_antiphase_tire_force_y_re', channels.TIRE_FORCE_Y_RE, 1),
+    ('lat_antiphase_toe_li', channels.TOE_LI, channels.RAD_TO_DEG),
+    ('lat_antiphase_toe_re', channels.TOE_RE, channels.RAD_TO_DEG),
+    ('lat_antiphase_camber_li', channels.CAMBER_LI, channels.RAD_TO_DEG),
+    ('lat_antiphase_camber_re', channels.CAMBER_RE, channels.RAD_TO_DEG),
+    ('lat_antiphase_wc_track_li', channels.WC_TRACK_LI, 1),
+    ('lat_antiphase_wc_track_re', channels.WC_TRACK_RE, -1),
+]
+
+# Column whose zero crossing is the offset row of each test
+BUMP_OFFSET_COLUMN = 'bump_wheel_travel_li'
+BUMP_ANTI_OFFSET_COLUMN = 'bump_anti_wheel_travel_li'
+LAT_ANTIPHASE_OFFSET_COLUMN = 'lat_antiphase_tire_force_y_li'
+
+SIDES = ['li', 're']
+# Side names in the figures: trace / subplot name and corner of the axis labels
+SIDE_NAMES = {'li': 'Left', 're': 'Right'}
+SIDE_CORNERS = {'li': 'RL', 're': 'RR'}
+
+# Test of a file or analysis name, the first keyword that is a word of the name wins.
+# Words are split at everything but letters: 'K&C_lat_antiphase_01' holds 'lat', but
+# 'lateral_compliance' or 'platform' do not.
+TEST_KEYWORDS = [
+    ('lat', 'lat_antiphase'),
+    ('roll', 'bump_anti'),
+    ('anti', 'bump_anti'),
+    ('bump', 'bump'),
+    ('bounce', 'bump'),
+]
+
+# A test is fitted inside -window <= x <= window, x_unit is the unit of its x columns
+# and x_label the x axis label of its figures. KPIs are fitted for both sides, '{side}'
+# in a name is replaced by li/re, '{corner}' in a label by RL/RR.
+#   parameter: name in the results tables
+#   x, y: columns of the test, y is multiplied by sign[side] (default 1)
+#   frame: 'offset' (default) fits the offset frame, 'raw' the frame as parsed
+#   unit: unit of the slope
+#   name: figure title, subplot: subplot title (default name), y_label: y axis label
+KPI_TESTS = {
+    'bump': {
+        'title': 'Body Bounce',
+        'columns': BUMP_COLUMNS,
+        'offset_column': BUMP_OFFSET_COLUMN,
+        'window': 10,
+        'x_unit': 'mm',
+        'x_label': 'Rebound <<        {corner} wheel center vertical travel [mm]        >> Jounce',
+        'kpis': [
+            {'parameter': 'bump_Wheel_Rate_{side}', 'x': 'bump_wheel_travel_{side}', 'y': 'bump_vertical_force_{side}', 'frame': 'raw', 'unit': 'N/mm',
+             'name': 'Bump Wheel Rate', 'y_label': 'extension <<        {corner} vertical load [N]        >> compression'},
+            {'parameter': 'bump_Toe_Change_{side}', 'x': 'bump_wheel_travel_{side}', 'y': 'bump_toe_{side}', 'unit': 'deg/mm',
+             'name': 'Bump Steer', 'y_label': 'toe out <<        {corner} toe angle variation [deg]        >> toe in'},
+            {'parameter': 'bump_Camber_Change_{side}', 'x': 'bump_wheel_travel_{side}', 'y': 'bump_camber_{side}', 'unit': 'deg/mm',
+             'name': 'Bump Camber', 'y_label': 'top in <<        {corner} camber angle variation [deg]        >> top out'},
+            {'parameter': 'bump_Wheel_Base_Change_{side}', 'x': 'bump_wheel_travel_{side}', 'y': 'bump_wheel_base_{side}', 'unit': 'mm/mm',
+             'name': 'Wheel Recession', 'subplot': 'Wheel Center X Displacement', 'y_label': '{corner} wheel center x displacement [mm]'},
+            # the left contact patch y points outboard
+            {'parameter': 'bump_Track_Change_{side}', 'x': 'bump_wheel_travel_{side}', 'y': 'bump_tire_cp_y_{side}', 'sign': {'li': -1}, 'unit': 'mm/mm',
+             'name': 'Track Change', 'subplot': 'Contact Patch Y Displacement', 'y_label': '{corner} contact patch y displacement [mm]'},
+        ],
+    },
+    'bump_anti': {
+        'title': 'Body Roll (PE: Bump Anti-Phase)',
+        'columns': BUMP_ANTI_COLUMNS,
+        'offset_column': BUMP_ANTI_OFFSET_COLUMN,
+        'window': 25,
+        'x_unit': 'mm',
+        'x_label': 'Rebound <<        {corner} wheel center vertical travel [mm]        >> Jounce',
+        'kpis': [
+            {'parameter': 'bump_anti_Wheel_Rate_{side}', 'x': 'bump_anti_wheel_travel_{side}', 'y': 'bump_anti_vertical_force_{side}', 'frame': 'raw', 'unit': 'N/mm',
+             'name': 'Bump_Anti-Phase Wheel Rate', 'y_label': 'extension <<        {corner} vertical load [N]        >> compression'},
+            {'parameter': 'bump_anti_Toe_Change_{side}', 'x': 'bump_anti_wheel_travel_{side}', 'y': 'bump_anti_toe_{side}', 'unit': 'deg/mm',
+             'name': 'Bump_Anti-Phase Steer', 'y_label': 'toe out <<        {corner} toe angle variation [deg]        >> toe in'},
+            {'parameter': 'bump_anti_Camber_Change_{side}', 'x': 'bump_anti_wheel_travel_{side}', 'y': 'bump_anti_camber_{side}', 'unit': 'deg/mm',
+             'name': 'Bump_Anti-Phase Camber', 'y_label': 'top in <<        {corner} camber angle variation [deg]        >> top out'},
+        ],
+    },
+    'lat_antiphase': {
+        'title': 'Lateral Force (Anti-Phase)',
+        'columns': LAT_ANTIPHASE_COLUMNS,
+        'offset_column': LAT_ANTIPHASE_OFFSET_COLUMN,
+        'window': 500,
+        'x_unit': 'N',
+        'x_label': 'Load outward <<        {corner} lateral force [N]        >> Load inward',
+        'kpis': [
+            {'parameter': 'lat_antiphase_compliance_{side}', 'x': 'lat_antiphase_tire_force_y_{side}', 'y': 'lat_antiphase_wc_track_{side}', 'unit': 'mm/N',
+             'name': 'Lateral_Anti-Phase Wheel Center Compliance', 'y_label': 'Outward <<        {corner} lateral displacement @WC [mm]        >> Inward'},
+            {'parameter': 'lat_antiphase_Toe_Change_{side}', 'x': 'lat_antiphase_tire_force_y_{side}', 'y': 'lat_antiphase_toe_{side}', 'unit': 'deg/N',
+             'name': 'Lateral_Anti-Phase Steer', 'y_label': 'toe out <<        {corner} toe angle variation [deg]        >> toe in'},
+            {'parameter': 'lat_antiphase_Camber_Change_{side}', 'x': 'lat_antiphase_tire_force_y_{side}', 'y': 'lat_antiphase_camber_{side}', 'unit': 'deg/N',
+             'name': 'Lateral_Anti-Phase Camber', 'y_label': 'top in <<        {corner} camber angle variation [deg]        >> top out'},
+        ],
+    },
+}
+
+
+def column_channels(columns):
+    return [channel for _, channel, _ in columns]
+
+
+def all_channels():
+    # Every channel read by a registered test, in first-use order
+    return list(dict.fromkeys(channel for test in KPI_TESTS.values() for channel in column_channels(test['columns'])))
+
+
+def detect_test(name):
+    words = set(re.split('[^a-z]+', name.lower()))
+    for keyword, test in TEST_KEYWORDS:
+        if keyword in words:
+            return test
+    return None
+
+
+def test_kpis(test):
+    # The KPIs of a test for both sides, left and right of each parameter next to
+    # each other as in the results tables
+    return [
+        {
+            'parameter': kpi['parameter'].format(side=side),
+            'side': side,
+            'x': kpi['x'].format(side=side),
+            'y': kpi['y'].format(side=side),
+            'sign': kpi.get('sign', {}).get(side, 1),
+            'frame': kpi.get('frame', 'offset'),
+            'unit': kpi['unit'],
+            'name': kpi['name'],
+            'subplot': kpi.get('subplot', kpi['name']),
+            'x_label': KPI_TESTS[test]['x_label'].format(corner=SIDE_CORNERS[side]),
+            'y_label': kpi['y_label'].format(corner=SIDE_CORNERS[side]),
+        }
+        for kpi in KPI_TESTS[test]['kpis'] for side in SIDES
+    ]
+
+
+def kpi_curve(test, parameter, df_offset, df=None):
+    # x and y of a KPI as it is fitted: its frame, its x column and the signed y column
+    test_kpi = next(test_kpi for test_kpi in test_kpis(test) if test_kpi['parameter'] == parameter)
+    frame = {'offset': df_offset, 'raw': df}[test_kpi['frame']]
+    return frame[test_kpi['x']], test_kpi['sign']*frame[test_kpi['y']]
+
+
+def window_label(test):
+    # The fitting window as shown on the pages, e.g. '-10 mm <-> +10 mm'
+    window, x_unit = KPI_TESTS[test]['window'], KPI_TESTS[test]['x_unit']
+    return f'-{window} {x_unit} <-> +{window} {x_unit}'
+
+
+def window_fits(x, responses, window):
+    # Fit every response {parameter: y} over x inside -window <= x <= window,
+    # all of them in one pass. Returns {parameter: (slope, intercept, r2)}.
+    with timing.stage('fit'):
+        slopes, intercepts, r2 = linear_fit(x, np.column_stack(list(responses.values())), window_mask(x, window))
+    return {parameter: (slopes[i], intercepts[i], r2[i]) for i, parameter in enumerate(responses)}
+
+
+def test_fits(test, df_offset, df=None, window=None):
+    # Fit all KPIs of a test: {parameter: (slope, intercept, r2)} in test_kpis order.
+    # KPIs sharing a frame and x column are solved together, one pass per x vector.
+    # df (the raw frame) is only needed by KPIs with frame 'raw'.
+    window = KPI_TESTS[test]['window'] if window is None else window
+    frames = {'offset': df_offset, 'raw': df}
+    groups = {}
+    for kpi in test_kpis(test):
+        frame = frames[kpi['frame']]
+        groups.setdefault((kpi['frame'], kpi['x']), {})[kpi['parameter']] = kpi['sign']*frame[kpi['y']]
+
+    fits = {}
+    for (frame, x), responses in groups.items():
+        fits.update(window_fits(frames[frame][x], responses, window))
+    return {kpi['parameter']: fits[kpi['parameter']] for kpi in test_kpis(test)}
+
+
+def test_fit(test, matrix):
+    # Fit a parsed step matrix (columns of KPI_TESTS[test]) the same way the page does
+    frame = LazyChannelFrame(matrix, KPI_TESTS[test]['columns'])
+    return test_fits(test, frame.offset(KPI_TESTS[test]['offset_column']), frame)
+
+
+def test_results(test, fits):
+    # Results table rows of a fit: parameter, slope and unit
+    return {
+        'Parameter': list(fits),
+        'Slope': [fits[parameter][0] for parameter in fits],
+        'Unit': [kpi['unit'] for kpi in test_kpis(test)],
+    }
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from knc import timing
+
+
+class LazyChannelFrame:
+    # DataFrame-like view over a parsed step matrix. Column i of the matrix is the
+    # channel of columns[i] = (name, channel, scale). A column is only computed
+    # (unit conversion, sign flip, offset) when it is looked up and kept afterwards,
+    # so deselected columns never cost anything.
+
+    def __init__(self, matrix, columns, offset_row=None):
+        self.matrix = matrix
+        self.positions = {name: (i, scale) for i, (name, _, scale) in enumerate(columns)}
+        self.columns = [name for name, _, _ in columns]
+        self.offset_row = offset_row
+        self.cache = {}
+        self.layout = columns
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def __getitem__(self, name):
+        if isinstance(name, list):
+            return self.to_frame(name)
+        if name not in self.cache:
+            with timing.stage('DataFrame build'):
+                i, scale = self.positions[name]
+                values = self.matrix[:, i] * scale
+                if self.offset_row is not None:
+                    values = values - values[self.offset_row]
+                self.cache[name] = values
+        return self.cache[name]
+
+    def offset(self, name):
+        # Same columns with the row where `name` is closest to 0 subtracted
+        with timing.stage('offset'):
+            offset_row = int(np.nanargmin(np.abs(self.matrix[:, self.positions[name][0]])))
+        return LazyChannelFrame(self.matrix, self.layout, offset_row)
+
+    def to_frame(self, names=None):
+        # Materialize the given columns (all by default) as a pandas DataFrame
+        names = self.columns if names is None else names
+        with timing.stage('DataFrame build'):
+            return pd.DataFrame({name: self[name] for name in names})
@@ -0,0 +1,121 @@
+# Plotly figures shared by the K&C pages. The only knc module that imports plotly.
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.subplots import make_subplots
+
+from knc import kpi
+from knc.downsample import DOWNSAMPLE_POINTS, downsample_xy
+
+# Curve traces with more points than this are drawn with WebGL (go.Scattergl) instead
+# of SVG, can be set with KNC_WEBGL_POINTS
+WEBGL_POINTS = int(os.environ.get('KNC_WEBGL_POINTS', '1000'))
+
+# Points of the regression lines drawn over the fitting window
+FIT_POINTS = 400
+
+# Layout template of the K&C figures: Arial Bold 18 axis, tick and legend fonts, Arial
+# Bold 24 titles, white background, light gray grid, 1600 x 800. Registered once per
+# process and given to a figure when it is created, instead of update_layout calls on
+# every figure. Charts using it are rendered with theme=None, the Streamlit theme
+# replaces the fonts and colors of the template. The size is also set on the figure
+# itself (PAGE_LAYOUT), st.plotly_chart takes the chart height from the figure only.
+PAGE_TEMPLATE = 'knc'
+PAGE_FONT = dict(size=18, family='Arial Bold')
+PAGE_AXIS = dict(title_font=PAGE_FONT, tickfont=PAGE_FONT, gridcolor='lightgray', zerolinecolor='lightgray')
+pio.templates[PAGE_TEMPLATE] = go.layout.Template(layout=dict(
+    title_font=dict(size=24, family='Arial Bold'), legend_font=PAGE_FONT,
+    plot_bgcolor='white', paper_bgcolor='white', width=1600, height=800,
+    xaxis=PAGE_AXIS, yaxis=PAGE_AXIS,
+))
+PAGE_LAYOUT = dict(template=PAGE_TEMPLATE, width=1600, height=800)
+
+
+def figure_style():
+    # Settings the page figures are built with, part of their cache key (knc.cache.figure_key)
+    return (PAGE_TEMPLATE, DOWNSAMPLE_POINTS, WEBGL_POINTS)
+
+
+def page_figure(*data):
+    # go.Figure created with the page template and size
+    return go.Figure(list(data), layout=PAGE_LAYOUT)
+
+
+def page_subplots(**kwargs):
+    # make_subplots on a figure created with the page template and size
+    return make_subplots(figure=page_figure(), **kwargs)
+
+
+def curve_trace(x, y, webgl_points=WEBGL_POINTS, **trace):
+    # Trace of a measured curve: downsampled to the point budget (knc.downsample), and
+    # a WebGL trace when it still has more than webgl_points points
+    xy = downsample_xy(x, y)
+    scatter = go.Scattergl if len(xy['x']) > webgl_points else go.Scatter
+    return scatter(**xy, **trace)
+
+
+def kpi_figures(test, df_offset, df, fits, **trace):
+    # One figure per KPI of a test (kpi.test_kpis), left and right side next to each
+    # other: the curve as it is fitted, the regression line over the fitting window and
+    # its equation. Titles and axis labels come from the registry, trace is the style
+    # of the curve traces. df (the raw frame) is only needed by KPIs with frame 'raw'.
+    test_kpis = kpi.test_kpis(test)
+    window = kpi.KPI_TESTS[test]['window']
+    fit_x = np.linspace(-window, window, FIT_POINTS)
+    figures = []
+    for kpi_sides in zip(test_kpis[::2], test_kpis[1::2]):
+        fig = page_subplots(rows=1, cols=2, subplot_titles=[
+            f"{test_kpi['subplot']} [{test_kpi['unit']}]. Rear {kpi.SIDE_NAMES[test_kpi['side']]}" for test_kpi in kpi_sides])
+        for col, test_kpi in enumerate(kpi_sides, 1):
+            slope, intercept, _ = fits[test_kpi['parameter']]
+            equation = f"y = {slope:.4f}x + {intercept:.4f}"
+            fig.add_trace(curve_trace(*kpi.kpi_curve(test, test_kpi['parameter'], df_offset, df), mode='lines+markers',
+                                      name=f"{test_kpi['name']} {kpi.SIDE_NAMES[test_kpi['side']]}", **trace),
+                          row=1, col=col)
+            fig.add_trace(go.Scatter(x=fit_x, y=slope * fit_x + intercept, mode='lines', name=equation,
+                                     line=dict(color='red', width=3)),
+                          row=1, col=col)
+            # the equation at the top of the subplot, clear of the curve whatever its range
+            fig.add_annotation(text=equation, xref='x domain', yref='y domain', x=0.5, y=0.95, showarrow=False,
+                               font=dict(size=20, color='red'), row=1, col=col)
+            fig.update_xaxes(title_text=test_kpi['x_label'], row=1, col=col)
+            fig.update_yaxes(title_text=test_kpi['y_label'], row=1, col=col)
+        fig.update_layout(title_text=f"{kpi_sides[0]['name']}: [{kpi_sides[0]['unit']}]", showlegend=True)
+        figures.append(fig)
+    return figures
+
+
+def joined_curves(grid, curves, names):
+    # All runs as one line: the grid and curve of every run followed by a NaN gap,
+    # the run name as hover text. One trace however many runs are compared.
+    n_runs, n_points = curves.shape
+    x = np.tile(np.append(grid, np.nan), n_runs)
+    y = np.column_stack([curves, np.full(n_runs, np.nan)]).ravel()
+    text = np.repeat(np.asarray(names, dtype=object), n_points + 1)
+    return x, y, text
+
+
+def compare_figure(comparison, parameters, title):
+    # Curves (top) and delta to the baseline (bottom) of all runs of a knc.compare
+    # comparison, one column per parameter (left / right side)
+    baseline = comparison['baseline']
+    baseline_name = comparison['names'][baseline]
+    fig = page_subplots(rows=2, cols=len(parameters), shared_xaxes=True, vertical_spacing=0.08,
+                        subplot_titles=parameters + [f'{parameter} - Delta to {baseline_name}' for parameter in parameters])
+    for col, parameter in enumerate(parameters, 1):
+        kpi_curves = comparison['curves'][parameter]
+        for row, key in ((1, 'curves'), (2, 'deltas')):
+            x, y, text = joined_curves(kpi_curves['grid'], kpi_curves[key], comparison['names'])
+            fig.add_trace(go.Scatter(x=x, y=y, text=text, mode='lines', line=dict(color='royalblue', width=1),
+                                     name='Variants', legendgroup='variants', showlegend=row == 1 and col == 1,
+                                     hovertemplate='%{text}<br>%{x:.3f}, %{y:.4f}<extra></extra>'),
+                          row=row, col=col)
+            fig.add_trace(go.Scatter(x=kpi_curves['grid'], y=kpi_curves[key][baseline], mode='lines', line=dict(color='black', width=3),
+                                     name=f'Baseline: {baseline_name}', legendgroup='baseline', showlegend=row == 1 and col == 1),
+                          row=row, col=col)
+        fig.update_xaxes(title_text=kpi_curves['x'], row=2, col=col)
+
+    fig.update_layout(title_text=title)
+    return fig
@@ -0,0 +1,35 @@
+import numpy as np
+
+
+def linear_fit(x, responses, mask=None):
+    # Least-squares lines y = slope*x + intercept for every column of `responses`
+    # (n_points x n_channels) against one x vector, in a single closed-form pass.
+    # Only the points where `mask` is True are used.
+    # Returns (slopes, intercepts, r2), one entry per response column.
+    x = np.asarray(x, dtype=np.float64)
+    responses = np.asarray(responses, dtype=np.float64)
+    if responses.ndim == 1:
+        responses = responses[:, None]
+    if mask is not None:
+        x = x[mask]
+        responses = responses[mask]
+
+    x_mean = x.mean()
+    responses_mean = responses.mean(axis=0)
+    dx = x - x_mean
+    dy = responses - responses_mean
+
+    sxx = dx @ dx
+    sxy = dx @ dy
+    syy = np.einsum('ij,ij->j', dy, dy)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slopes = sxy / sxx
+        r2 = np.where(syy > 0, sxy * sxy / (sxx * syy), 1.0)
+    intercepts = responses_mean - slopes * x_mean
+    return slopes, intercepts, r2
+
+
+def window_mask(x, window):
+    x = np.asarray(x)
+    return (x >= -window) & (x <= window)
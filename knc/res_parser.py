@@ -0,0 +1,194 @@
+import hashlib
+import mmap
+import re
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+
+from knc import timing
+
+RES_STEP_START = '<Step type="quasiStatic">'
+RES_STEP_END = '</Step>'
+
+# Start of one load case (analysis) when a .res holds several
+RES_ANALYSIS_START = '<Analysis'
+
+RES_ENTITY_PATTERN = r'<Entity\b([^>]*?)(?<!/)>(.*?)</Entity>'
+RES_COMPONENT_PATTERN = r'<Component\b([^>]*?)/?>'
+RES_ATTRIBUTE_PATTERN = r'(\w+)="([^"]*)"'
+
+# Channel maps already built, keyed by the hash of the .res header
+res_channel_map_cache = {}
+
+# Uploads are copied to the spool file in chunks of this size
+RES_SPOOL_CHUNK = 16 * 1024 * 1024
+
+# res_locate_steps reports progress every this many steps
+RES_PROGRESS_STEPS = 1000
+
+
+def res_locate_steps(res_content, progress=None):
+    # Scan for the step tags with find() and return the (start, end) offsets of every
+    # step body, so no copy of the blocks is made before the numbers are parsed.
+    # Works on the decoded str as well as on raw bytes. progress(steps, offset) is
+    # called every RES_PROGRESS_STEPS steps.
+    res_start_tag, res_end_tag = RES_STEP_START, RES_STEP_END
+    if not isinstance(res_content, str):
+        res_start_tag, res_end_tag = res_start_tag.encode(), res_end_tag.encode()
+
+    res_offsets = []
+    res_pos = res_content.find(res_start_tag)
+    while res_pos != -1:
+        res_body_start = res_pos + len(res_start_tag)
+        res_body_end = res_content.find(res_end_tag, res_body_start)
+        if res_body_end == -1:
+            break
+        res_offsets.append((res_body_start, res_body_end))
+        if progress is not None and not len(res_offsets) % RES_PROGRESS_STEPS:
+            progress(len(res_offsets), res_body_end)
+        res_pos = res_content.find(res_start_tag, res_body_end + len(res_end_tag))
+    return res_offsets
+
+
+def res_locate_analyses(res_content):
+    # (offset, name) of every <Analysis> tag, in file order
+    res_start_tag = RES_ANALYSIS_START if isinstance(res_content, str) else RES_ANALYSIS_START.encode()
+    res_tag_end = '>' if isinstance(res_content, str) else b'>'
+
+    res_analyses = []
+    res_pos = res_content.find(res_start_tag)
+    while res_pos != -1:
+        res_end = res_content.find(res_tag_end, res_pos)
+        if res_end == -1:
+            break
+        res_tag = res_content[res_pos:res_end]
+        if not isinstance(res_tag, str):
+            res_tag = res_tag.decode('utf-8', errors='replace')
+        res_analyses.append((res_pos, dict(re.findall(RES_ATTRIBUTE_PATTERN, res_tag)).get('name', '')))
+        res_pos = res_content.find(res_start_tag, res_end)
+    return res_analyses
+
+
+def res_tokenize_steps(res_content, res_offsets, res_columns=None):
+    # Every step is tokenized exactly once into an (n_steps x n_tokens) matrix.
+    # With res_columns only those tokens are converted to float, in the given order.
+    if res_columns is not None:
+        return res_select_columns(res_content, res_offsets, res_columns)
+
+    res_rows = [np.fromstring(res_content[start:end], dtype=np.float64, sep=' ') for start, end in res_offsets]
+    if not res_rows:
+        return np.empty((0, 0), dtype=np.float64)
+
+    res_width = max(len(res_row) for res_row in res_rows)
+    if all(len(res_row) == res_width for res_row in res_rows):
+        return np.vstack(res_rows)
+
+    # Steps of different length are padded with NaN so the column positions stay aligned
+    res_matrix = np.full((len(res_rows), res_width), np.nan)
+    for i, res_row in enumerate(res_rows):
+        res_matrix[i, :len(res_row)] = res_row
+    return res_matrix
+
+
+def res_select_columns(res_content, res_offsets, res_columns):
+    res_rows = []
+    for start, end in res_offsets:
+        res_tokens = res_content[start:end].split()
+        # tokens missing from a short step become NaN
+        res_rows.append([res_tokens[i] if i < len(res_tokens) else 'nan' for i in res_columns])
+    return np.array(res_rows, dtype=np.float64).reshape(len(res_rows), len(res_columns))
+
+
+def res_header(res_content):
+    # Everything in front of the first step: the entity/component definitions
+    res_start_tag = RES_STEP_START if isinstance(res_content, str) else RES_STEP_START.encode()
+    res_header_end = res_content.find(res_start_tag)
+    return res_content[:res_header_end if res_header_end != -1 else len(res_content)]
+
+
+def res_channel_map(res_header_content):
+    # Map "entity.component" to the token position of that component in every step.
+    # The map is cached by header hash, repeated uploads of the same model skip the parse.
+    if isinstance(res_header_content, str):
+        res_header_content = res_header_content.encode('utf-8')
+    res_header_hash = hashlib.sha1(res_header_content).hexdigest()
+    if res_header_hash in res_channel_map_cache:
+        return res_channel_map_cache[res_header_hash]
+
+    res_header_text = res_header_content.decode('utf-8', errors='replace')
+    res_channels = {}
+    for res_entity in re.finditer(RES_ENTITY_PATTERN, res_header_text, re.S):
+        res_entity_name = dict(re.findall(RES_ATTRIBUTE_PATTERN, res_entity.group(1))).get('name')
+        for res_component in re.finditer(RES_COMPONENT_PATTERN, res_entity.group(2)):
+            res_attributes = dict(re.findall(RES_ATTRIBUTE_PATTERN, res_component.group(1)))
+            if res_entity_name and 'name' in res_attributes and res_attributes.get('id', '').isdigit():
+                # ids in the header count from 1
+                res_channels[f"{res_entity_name}.{res_attributes['name']}"] = int(res_attributes['id']) - 1
+
+    res_channel_map_cache[res_header_hash] = res_channels
+    return res_channels
+
+
+def res_channel_columns(res_channels, res_channel_map):
+    # res_channels is a list of (name, position) pairs, see knc.channels
+    return [res_channel_map.get(name, position) for name, position in res_channels]
+
+
+def res_spool_upload(res_upload, res_spool, progress=None):
+    # Copy the upload to an open spool file in chunks, progress(bytes) after every chunk
+    with timing.stage('read'):
+        res_upload.seek(0)
+        if progress is None:
+            shutil.copyfileobj(res_upload, res_spool, RES_SPOOL_CHUNK)
+        else:
+            for res_chunk in iter(lambda: res_upload.read(RES_SPOOL_CHUNK), b''):
+                res_spool.write(res_chunk)
+                progress(res_spool.tell())
+        res_spool.flush()
+
+
+@contextmanager
+def res_mapped_upload(res_upload, progress=None):
+    # Spool the upload to a temp file once and memory-map it. The steps are then
+    # located and parsed from the bytes view, the file is never decoded to a str.
+    # progress(bytes) is called after every chunk copied to the spool file.
+    with tempfile.TemporaryFile(suffix='.res') as res_spool:
+        res_spool_upload(res_upload, res_spool, progress)
+        if res_spool.tell() == 0:
+            # an empty file cannot be mapped
+            yield b''
+            return
+        with mmap.mmap(res_spool.fileno(), 0, access=mmap.ACCESS_READ) as res_map:
+            yield res_map
+
+
+@contextmanager
+def res_mapped_file(res_path):
+    # Memory-map a .res on disk, no spool file needed
+    with open(res_path, 'rb') as res_file:
+        if not res_file.seek(0, 2):
+            # an empty file cannot be mapped
+            yield b''
+            return
+        with mmap.mmap(res_file.fileno(), 0, access=mmap.ACCESS_READ) as res_map:
+            yield res_map
+
+
+def res_read_file(res_path, res_channels=None):
+    # Read a .res on disk into a step matrix. With res_channels the matrix holds
+    # just those channels (resolved through the header), otherwise every token.
+    with res_mapped_file(res_path) as res_content:
+        return res_read_content(res_content, res_channels)
+
+
+def res_read_content(res_content, res_channels=None):
+    with timing.stage('locate'):
+        res_offsets = res_locate_steps(res_content)
+        res_columns = None
+        if res_channels is not None:
+            res_columns = res_channel_columns(res_channels, res_channel_map(res_header(res_content)))
+
+    with timing.stage('tokenize'):
+        return res_tokenize_steps(res_content, res_offsets, res_columns)
@@ -0,0 +1,20 @@
+# Results of the run a K&C page plotted, kept for the session.
+#
+# The page stores the fits, the KPI table and the built figures under the key of the
+# plotted data (knc.cache.figure_key) in the session state of the user. Reruns from
+# other widgets, exports and downloads read them back instead of fitting and plotting
+# again. There is one entry per page, plotting other data replaces it. The session
+# state is passed in (st.session_state), knc does not import streamlit.
+
+
+def results_store(session, name, key, results):
+    session[name] = dict(results, key=key)
+    return session[name]
+
+
+def results_lookup(session, name, key):
+    # The stored results of `name` if they belong to `key`, None otherwise
+    results = session.get(name)
+    if results is None or results.get('key') != key:
+        return None
+    return results
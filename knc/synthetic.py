@@ -0,0 +1,112 @@
+# Synthetic Adams-style .res files for benchmarks and parser checks.
+#
+#   python -m knc.synthetic out.res --steps 10000 [--tokens N] [--layout adams|compact]
+#                                   [--analyses bump roll lat]
+#
+# The file has the same structure the pages parse: an <Entity>/<Component> header
+# followed by one <Step type="quasiStatic"> block of whitespace separated floats per
+# step. With several analyses every one of them gets --steps steps, as in a full
+# K&C run with bounce, roll and lateral load cases in one file. Every K&C channel
+# is a linear function of one sweep plus noise, so the fits of all tests have
+# something to find.
+import argparse
+import sys
+from collections import OrderedDict
+
+import numpy as np
+
+from knc import channels, kpi
+from knc.res_parser import RES_STEP_END, RES_STEP_START
+
+# Amplitude of each channel over the sweep; channels not listed get 1.0
+SYNTHETIC_AMPLITUDES = {
+    channels.WHEEL_TRAVEL_LI[0]: 80.0,
+    channels.WHEEL_TRAVEL_RE[0]: 80.0,
+    channels.VERTICAL_FORCE_LI[0]: 2400.0,
+    channels.VERTICAL_FORCE_RE[0]: 2400.0,
+    channels.TIRE_FORCE_Y_LI[0]: 4000.0,
+    channels.TIRE_FORCE_Y_RE[0]: -4000.0,
+    channels.TOE_LI[0]: 0.02,
+    channels.TOE_RE[0]: 0.02,
+    channels.CAMBER_LI[0]: -0.03,
+    channels.CAMBER_RE[0]: -0.03,
+}
+
+# Steps formatted per write
+SYNTHETIC_CHUNK = 10000
+
+
+def synthetic_layout(layout='adams', res_channels=None):
+    # {channel name: token position}. 'adams' keeps the positions of a real Adams/Car
+    # testrig file (over 1100 tokens per step), 'compact' numbers the channels from 0.
+    res_channels = kpi.all_channels() if res_channels is None else res_channels
+    if layout == 'adams':
+        return {name: position for name, position in res_channels}
+    if layout == 'compact':
+        return {name: i for i, (name, _) in enumerate(res_channels)}
+    raise ValueError(f'unknown channel layout: {layout}')
+
+
+def synthetic_header(positions):
+    # Entity/Component definitions; the component ids count from 1
+    entities = OrderedDict()
+    for name, position in positions.items():
+        entity, component = name.rsplit('.', 1)
+        entities.setdefault(entity, []).append((component, position + 1))
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<Results>']
+    for entity, components in entities.items():
+        lines.append(f'<Entity name="{entity}">')
+        lines.extend(f'  <Component name="{component}" id="{res_id}"/>' for component, res_id in components)
+        lines.append('</Entity>')
+    return '\n'.join(lines) + '\n'
+
+
+def synthetic_steps(n_steps, n_tokens, positions, seed=0, start=0, stop=None):
+    # (steps x tokens) matrix of the steps start..stop of an n_steps sweep
+    stop = n_steps if stop is None else stop
+    rng = np.random.default_rng([seed, start])
+    sweep = np.linspace(-1.0, 1.0, n_steps)[start:stop] if n_steps > 1 else np.zeros(stop - start)
+    steps = rng.normal(scale=1e-3, size=(stop - start, n_tokens))
+    for name, position in positions.items():
+        steps[:, position] += SYNTHETIC_AMPLITUDES.get(name, 1.0) * sweep
+    return steps
+
+
+def synthetic_res(path, n_steps, n_tokens=None, layout='adams', seed=0, analyses=None):
+    # Write the file and return its size in bytes
+    analyses = ['knc_synthetic'] if not analyses else analyses
+    positions = synthetic_layout(layout)
+    n_tokens = max(positions.values()) + 1 if n_tokens is None else n_tokens
+    if n_tokens <= max(positions.values()):
+        raise ValueError(f'{n_tokens} tokens per step do not hold the {layout} channel layout')
+
+    step_format = RES_STEP_START + '\n' + ' '.join(['%.6e'] * n_tokens) + '\n' + RES_STEP_END
+    with open(path, 'w', encoding='utf-8', newline='\n') as res_file:
+        res_file.write(synthetic_header(positions))
+        for i, analysis in enumerate(analyses):
+            res_file.write(f'<Analysis name="{analysis}">\n')
+            for start in range(0, n_steps, SYNTHETIC_CHUNK):
+                stop = min(start + SYNTHETIC_CHUNK, n_steps)
+                np.savetxt(res_file, synthetic_steps(n_steps, n_tokens, positions, seed + i, start, stop), fmt=step_format)
+            res_file.write('</Analysis>\n')
+        res_file.write('</Results>\n')
+        return res_file.tell()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m knc.synthetic', description='Write a synthetic Adams .res K&C result file.')
+    parser.add_argument('output')
+    parser.add_argument('--steps', type=int, default=1000)
+    parser.add_argument('--tokens', type=int, default=None, help='tokens per step, default just enough for the layout')
+    parser.add_argument('--layout', default='adams', choices=['adams', 'compact'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--analyses', nargs='+', default=None, help='load case names, one analysis each')
+    args = parser.parse_args(argv)
+
+    size = synthetic_res(args.output, args.steps, args.tokens, args.layout, args.seed, args.analyses)
+    print(f'{args.steps * len(args.analyses or [None])} steps, {size / 1024 / 1024:.1f} MB written to {args.output}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
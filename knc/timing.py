@@ -0,0 +1,151 @@
+import datetime
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Stage timings of one page run: read, locate, tokenize, DataFrame build, offset,
+# fit, figure build, render. A page starts a run, the stages are wrapped with
+# stage(name) or begin(name)/end(). Without a run (batch CLI, profiling off)
+# a stage costs nothing.
+
+# Finished runs are appended here as one JSON object per line
+TIMING_LOG = os.environ.get('KNC_TIMING_LOG', 'knc_timing.jsonl')
+
+MB = 1024 * 1024
+
+# Streamlit runs every session in its own script thread
+timing_state = threading.local()
+
+# tracemalloc is process wide, it runs while at least one run traces memory
+tracing_runs = [0]
+tracing_lock = threading.Lock()
+
+
+class StageTimer:
+    # Stages with the same name are added up. Time is exclusive (a nested stage
+    # is not counted again in its parent), peak memory is the highest traced
+    # allocation above the level at stage start, nested stages included.
+
+    def __init__(self, label, trace_memory=True):
+        self.label = label
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.stack = []
+        self.started = time.perf_counter()
+
+    def begin(self, name):
+        memory = tracemalloc.get_traced_memory()[0] if self.trace_memory else 0
+        if self.trace_memory:
+            self.update_peaks()
+        # [name, start, time in nested stages, memory at start, peak so far]
+        self.stack.append([name, time.perf_counter(), 0.0, memory, memory])
+
+    def end(self):
+        if self.trace_memory:
+            self.update_peaks()
+        name, start, nested, memory, peak = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        if self.stack:
+            self.stack[-1][2] += elapsed
+        stage = self.stages.setdefault(name, {'stage': name, 'calls': 0, 'seconds': 0.0, 'peak_mb': 0.0})
+        stage['calls'] += 1
+        stage['seconds'] += elapsed - nested
+        stage['peak_mb'] = max(stage['peak_mb'], (peak - memory) / MB)
+
+    def update_peaks(self):
+        # Hand the peak since the last begin/end to every open stage
+        peak = tracemalloc.get_traced_memory()[1]
+        for open_stage in self.stack:
+            open_stage[4] = max(open_stage[4], peak)
+        tracemalloc.reset_peak()
+
+    def rows(self):
+        return list(self.stages.values())
+
+    def record(self, **details):
+        return {
+            'time': datetime.datetime.now().isoformat(timespec='seconds'),
+            'page': self.label,
+            **details,
+            'total_seconds': time.perf_counter() - self.started,
+            'stages': self.rows(),
+        }
+
+
+def active_timer():
+    return getattr(timing_state, 'timer', None)
+
+
+def start_run(label, trace_memory=True):
+    # A run still open on this thread is dropped, see page_run for closing every run
+    finish_run(log_path=None)
+    if trace_memory:
+        with tracing_lock:
+            tracing_runs[0] += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+    timing_state.timer = StageTimer(label, trace_memory)
+    return timing_state.timer
+
+
+def finish_run(log_path=TIMING_LOG, **details):
+    # Close the run, append it to the JSON log and return the stage rows
+    timer = active_timer()
+    if timer is None:
+        return []
+    timing_state.timer = None
+    while timer.stack:
+        timer.end()
+    if log_path:
+        with open(log_path, 'a', encoding='utf-8') as log_file:
+            log_file.write(json.dumps(timer.record(**details)) + '\n')
+    if timer.trace_memory:
+        with tracing_lock:
+            tracing_runs[0] -= 1
+            if not tracing_runs[0]:
+                tracemalloc.stop()
+    return timer.rows()
+
+
+@contextmanager
+def page_run(label, enabled=True, trace_memory=True):
+    # A run around a page script. The page calls finish_run itself to log the run and
+    # show its rows. A script that does not get there (st.stop, a rerun, an error) drops
+    # the run here: its thread is gone after the script, and memory tracing would stay
+    # on for the whole process.
+    if not enabled:
+        yield None
+        return
+    timer = start_run(label, trace_memory)
+    try:
+        yield timer
+    finally:
+        finish_run(log_path=None)
+
+
+def begin(name):
+    timer = active_timer()
+    if timer is not None:
+        timer.begin(name)
+
+
+def end():
+    timer = active_timer()
+    if timer is not None and timer.stack:
+        timer.end()
+
+
+@contextmanager
+def stage(name):
+    timer = active_timer()
+    if timer is None:
+        yield
+        return
+    timer.begin(name)
+    try:
+        yield
+    finally:
+        timer.end()
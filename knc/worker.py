@@ -0,0 +1,256 @@
+# Background parsing of uploads, with progress and cancellation.
+#
+# A ParseWorker extracts every registered test of a set of uploads (knc.extract) on a
+# thread of its own and stores the matrices in the parse cache (knc.cache), so the page
+# script stays free to draw a progress bar and a cancel button while a large file is
+# parsed. Cache hits are done at once. A single miss is parsed on the worker thread,
+# several misses in a process pool (PARSE_WORKERS): each is spooled to a temp file
+# that its process maps, the bytes are never copied into the pool, and the processes
+# send their progress back on a queue. Every file is passed over four times
+# (PARSE_STAGES), the bar fills with the bytes done in all of them. A cancelled parse
+# stops at its next report.
+# Stage timings (knc.timing) are thread local: a worker started by a timed page run
+# times the parse as a run of its own, written to the timing log, and hands its stage
+# rows to the page run that sees it finish (take_timings).
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from knc import timing
+from knc.cache import PARSE_WORKERS, cache_lookup, cache_store, extract_key, upload_hash
+from knc.extract import extract_file, extract_test, extract_upload
+from knc.res_parser import res_spool_upload
+
+# Seconds between two progress updates of a page, can be set with KNC_PARSE_POLL
+PARSE_POLL_SECONDS = float(os.environ.get('KNC_PARSE_POLL', '0.2'))
+
+# Start method of the pool processes, KNC_PARSE_START_METHOD. They are not forked from
+# the server: a fork copies its threads and memory, the uploads of every session too.
+PARSE_START_METHOD = os.environ.get(
+    'KNC_PARSE_START_METHOD',
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn',
+)
+
+# Passes over the bytes of an upload: content hash, spool file, step search, tokenizing
+PARSE_STAGES = ['hash', 'read', 'locate', 'tokenize']
+
+MB = 1024 * 1024
+
+
+class ParseCancelled(Exception):
+    pass
+
+
+# Progress queue and cancel event of a pool process, set by pool_init
+pool_channel = {}
+
+
+def pool_init(progress_queue, cancel_event):
+    pool_channel.update(queue=progress_queue, cancel=cancel_event)
+
+
+def pool_extract(index, res_path):
+    # extract_file of a spool file in a pool process, the progress goes back on the queue
+    def progress(stage, steps, offset):
+        if pool_channel['cancel'].is_set():
+            raise ParseCancelled()
+        pool_channel['queue'].put((index, stage, steps, offset))
+    return extract_file(res_path, progress)
+
+
+def upload_size(res_upload):
+    res_size = res_upload.seek(0, 2)
+    res_upload.seek(0)
+    return res_size
+
+
+def upload_id(res_upload):
+    # Streamlit gives every upload a file_id, other file objects are told apart by identity
+    return getattr(res_upload, 'file_id', None) or id(res_upload)
+
+
+class ParseWorker:
+    # Parses res_uploads on a background thread started on creation. The page polls
+    # running() and progress(), waits for it between two polls and may cancel(). Once
+    # stopped, matrices holds the extract matrix of every upload, unless the parse was
+    # cancelled or failed (error).
+
+    def __init__(self, res_uploads, workers=None, timed=False):
+        self.res_uploads = res_uploads
+        self.workers = workers or PARSE_WORKERS
+        self.timed = timed
+        self.ids = [upload_id(res_upload) for res_upload in res_uploads]
+        self.sizes = [upload_size(res_upload) for res_upload in res_uploads]
+        self.matrices = [None] * len(res_uploads)
+        # content hash of every upload (knc.cache.upload_hash), kept for the pages
+        self.hashes = [None] * len(res_uploads)
+        # step matrices of single tests cut out of the matrices, see test_matrix
+        self.test_matrices = {}
+        # per upload: offset reached in every stage, steps located and tokenized
+        self.offsets = [dict.fromkeys(PARSE_STAGES, 0) for _ in res_uploads]
+        self.steps = [{'locate': 0, 'tokenize': 0} for _ in res_uploads]
+        self.error = None
+        # stage rows of a timed parse (knc.timing), until a page run takes them
+        self.timings = []
+        # a process-shared event, the pool processes check it too
+        self.pool_context = multiprocessing.get_context(PARSE_START_METHOD)
+        self.cancel_event = self.pool_context.Event()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def running(self):
+        return self.thread.is_alive()
+
+    def wait(self, timeout=PARSE_POLL_SECONDS):
+        # Returns once the parse has stopped or after timeout seconds
+        self.thread.join(timeout)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def parsed(self, index):
+        # Upload `index` is parsed, the others may not be yet
+        return self.matrices[index] is not None
+
+    def test_matrix(self, index, test):
+        # Step matrix of `test` in upload `index` (knc.extract.extract_test), cut once and
+        # kept for the reruns of the page
+        if (index, test) not in self.test_matrices:
+            self.test_matrices[index, test] = extract_test(self.matrices[index], test)
+        return self.test_matrices[index, test]
+
+    def take_timings(self):
+        # The stage rows of the parse, once: later reruns did not parse anything
+        timings, self.timings = self.timings, []
+        return timings
+
+    def report(self, index, stage, steps, offset):
+        with self.lock:
+            self.offsets[index][stage] = offset
+            if stage in self.steps[index]:
+                self.steps[index][stage] = steps
+
+    def upload_progress(self, index):
+        # Progress callback of knc.extract for upload `index` on the worker thread
+        def progress(stage, steps, offset):
+            if self.cancel_event.is_set():
+                raise ParseCancelled()
+            self.report(index, stage, steps, offset)
+        return progress
+
+    def finish(self, index, res_matrix):
+        self.matrices[index] = res_matrix
+        with self.lock:
+            self.offsets[index] = dict.fromkeys(PARSE_STAGES, self.sizes[index])
+            self.steps[index] = {'locate': len(res_matrix), 'tokenize': len(res_matrix)}
+
+    def progress(self):
+        # (fraction, text) for st.progress: the stage the slowest upload is in, its bytes
+        # over all uploads, and the steps tokenized of the steps located so far
+        with self.lock:
+            stage = min(
+                (PARSE_STAGES.index(stage) for offsets, size in zip(self.offsets, self.sizes)
+                 for stage in PARSE_STAGES if offsets[stage] < size),
+                default=len(PARSE_STAGES) - 1,
+            )
+            stage_bytes = sum(offsets[PARSE_STAGES[stage]] for offsets in self.offsets)
+            done_bytes = sum(sum(offsets.values()) for offsets in self.offsets)
+            located = sum(steps['locate'] for steps in self.steps)
+            tokenized = sum(steps['tokenize'] for steps in self.steps)
+        total_bytes = sum(self.sizes)
+        files_done = sum(res_matrix is not None for res_matrix in self.matrices)
+        fraction = min(done_bytes / (len(PARSE_STAGES) * total_bytes), 1.0) if total_bytes else 1.0
+        text = (f"{files_done}/{len(self.sizes)} files parsed - {PARSE_STAGES[stage]}: "
+                f"{stage_bytes / MB:,.0f} / {total_bytes / MB:,.0f} MB, {tokenized:,} / {located:,} steps")
+        return fraction, text
+
+    def run(self):
+        if self.timed:
+            timing.start_run('parse')
+        try:
+            misses = {}
+            for i, res_upload in enumerate(self.res_uploads):
+                hash_progress = self.upload_progress(i)
+                self.hashes[i] = upload_hash(res_upload, lambda offset: hash_progress('hash', 0, offset))
+                key = extract_key(self.hashes[i])
+                res_matrix = cache_lookup(key)
+                if res_matrix is None:
+                    misses[i] = key
+                else:
+                    self.finish(i, res_matrix)
+
+            if min(self.workers, len(misses)) <= 1:
+                for i, key in misses.items():
+                    res_matrix = extract_upload(self.res_uploads[i], self.upload_progress(i))
+                    cache_store(key, res_matrix)
+                    self.finish(i, res_matrix)
+            else:
+                self.run_pool(misses)
+        except ParseCancelled:
+            pass
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self.timings = timing.finish_run(files=[res_upload.name for res_upload in self.res_uploads], cancelled=self.cancelled())
+            # the uploaded bytes are not needed any more, the worker stays in the session
+            self.res_uploads = None
+
+    def run_pool(self, misses):
+        progress_queue = self.pool_context.Queue()
+        res_paths = []
+        try:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(misses)), mp_context=self.pool_context,
+                                     initializer=pool_init, initargs=(progress_queue, self.cancel_event)) as pool:
+                try:
+                    # a file is submitted once spooled, the pool parses while the next is copied
+                    futures = {}
+                    for i in misses:
+                        with tempfile.NamedTemporaryFile(suffix='.res', delete=False) as res_spool:
+                            res_paths.append(res_spool.name)
+                            read_progress = self.upload_progress(i)
+                            res_spool_upload(self.res_uploads[i], res_spool, lambda offset: read_progress('read', 0, offset))
+                        futures[pool.submit(pool_extract, i, res_spool.name)] = i
+                    pending = set(futures)
+                    while pending:
+                        finished, pending = wait(pending, timeout=PARSE_POLL_SECONDS, return_when=FIRST_COMPLETED)
+                        self.drain(progress_queue)
+                        for future in finished:
+                            i = futures[future]
+                            res_matrix = future.result()
+                            cache_store(misses[i], res_matrix)
+                            self.finish(i, res_matrix)
+                        if self.cancel_event.is_set():
+                            raise ParseCancelled()
+                except BaseException:
+                    # files not started yet are dropped, running ones stop at their next
+                    # report and are waited for: no process maps a spool file after this
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    raise
+        finally:
+            for res_path in res_paths:
+                os.remove(res_path)
+
+    def drain(self, progress_queue):
+        while True:
+            try:
+                self.report(*progress_queue.get_nowait())
+            except queue.Empty:
+                return
+
+
+def session_worker(session, name, res_uploads, restart=False):
+    # The ParseWorker of `name` in the session state. A new one is started when other
+    # files are uploaded (the old one is cancelled) or on restart, timed if the page run is.
+    worker = session.get(name)
+    if worker is None or restart or worker.ids != [upload_id(res_upload) for res_upload in res_uploads]:
+        if worker is not None:
+            worker.cancel()
+        worker = session[name] = ParseWorker(res_uploads, timed=timing.active_timer() is not None)
+    return worker
@@ -1,6 +1,9 @@
 import streamlit as st
+import pandas as pd
 from PIL import Image
 
+from knc.cache import cache_stats, disk_cache, parse_cache
+
 
 st.set_page_config(
     page_title="Hello",
@@ -30,6 +33,7 @@ st.markdown('''---''')
 
 def main():
     cs_body()
+    cache_body()
     
 def cs_body():
 
@@ -56,6 +60,25 @@ def cs_body():
 
     return None
 
+def cache_body():
+
+    st.markdown('''---''')
+    st.write('''### Parse Cache''')
+
+    # Parsed .res results shared by all K&C pages: in-process and on disk
+    cache_table_slot = st.empty()
+
+    if st.button('Clear Cache'):
+        parse_cache.clear()
+        disk_cache.clear()
+        st.write('Parse cache cleared.')
+
+    cache_table = pd.DataFrame(cache_stats()).T
+    cache_table = cache_table[['entries', 'size_mb', 'max_mb', 'hits', 'misses']]
+    cache_table_slot.table(cache_table.round(2).astype(str))
+
+    return None
+
 # Run main()
 
 if __name__ == '__main__':
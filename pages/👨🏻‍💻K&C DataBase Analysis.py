@@ -1,12 +1,18 @@
 import streamlit as st
 import pandas as pd
-import re
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from scipy.stats import linregress
 import numpy as np
+import statistics
 from PIL import Image
 
+from knc import aggregates, compare, corridors, database, kpi, plots, timing
+from knc.cache import cached_figures, figure_key
+from knc.export import export_data, export_file, export_formats, export_raw_frame
+from knc.extract import extract_analysis_tests, extract_file_tests
+from knc.lazy import LazyChannelFrame
+from knc.results import results_lookup, results_store
+from knc.worker import session_worker
+
 st.set_page_config(page_title="bump_anti", page_icon="📈", layout="wide")
 
 bump_anti_image=Image.open('logo_bump_anti_01.JPG')
@@ -14,8 +20,52 @@ st.image(bump_anti_image, caption='Version: Beta V0.2', use_column_width='always
 
 #程序中，所有的变量都以bump_anti_开头用以区分
 
+# Test definition (channels, transforms, fit window, KPIs) from the knc.kpi registry
+bump_anti_test = kpi.KPI_TESTS['bump_anti']
+bump_anti_columns = bump_anti_test['columns']
+
+# Description above each KPI figure, in kpi.test_kpis order
+bump_anti_kpi_descriptions = [
+    [
+        "* Wheel rate in roll defines the suspension stiffness for single wheel inputs and hence the ride behaviour over rougher road surfaces.",
+        "* Toral roll stiffness defines the body roll behaviour during cornering.",
+        "* Front to rear roll stiffness distribution affects the handling balance. This is most significant in the non-linear handling regime (higher levels of lateral acceleration.)",
+    ],
+    [
+        "* Roll steer influences lateral dynamics in term of response gain and response timing. Roll understeer at the front (toe-out during bump) reduces steering sensitivity, but reduces response delay.",
+        "* Roll understeer at the rear (toe-in during bump) reduces side-slip gain.",
+        "* Roll understeer is used to improve the linearity of response - the consistency of gain between inputs of different magnitudes.",
+        "* The amount of roll steer that occurs in a corner is controlled by the body roll stiffness.",
+    ],
+    [
+        "* Roll camber influences lateral dynamics by affecting tyre slip behaviour and generating camber thrust.",
+        "* The degree to which a suspension camber the wheel in opposition to the body roll is referred to as camber compensation.",
+        "* Full camber compensation means the wheel remains at its static level whilst the body rolls. Camber compensation is used to optimise tyre grip.",
+        "* Front to rear camber compensation ratio influences the handling balance.",
+    ],
+]
+
+# Style of the measured curves in the KPI figures (plots.kpi_figures)
+bump_anti_curve_style = dict(
+    line=dict(width=2, color='rgba(0, 0, 255, 1)'),
+    marker=dict(size=5, color='white', line=dict(width=1, color='rgba(0, 0, 0, 1)')),
+)
+
 def main():
-    st.title("K&C Test - Body Roll (PE: Bump Anti-Phase)")
+    # Optional stage timings, shown in the sidebar and appended to the JSON log. The run
+    # is also closed when the page stops early (st.stop, a rerun, an error).
+    bump_anti_timing = st.sidebar.checkbox('Pipeline Timing', key='bump_anti_timing')
+    with timing.page_run('bump_anti', bump_anti_timing):
+        bump_anti_uploaded_file, bump_anti_worker = bump_anti_page()
+        if bump_anti_timing:
+            # the parse is timed on the worker (knc.worker), its stages come first
+            bump_anti_timings = (bump_anti_worker.take_timings() if bump_anti_worker else []) + timing.finish_run(file=bump_anti_uploaded_file.name if bump_anti_uploaded_file else None)
+            st.sidebar.markdown('---')
+            st.sidebar.title('Pipeline Timing:')
+            st.sidebar.table(pd.DataFrame(bump_anti_timings, columns=['stage', 'calls', 'seconds', 'peak_mb']).round(4).astype(str))
+
+def bump_anti_page():
+    st.title(f"K&C Test - {bump_anti_test['title']}")
     # Erklärung
     bump_anti_description_col1, bump_anti_description_col2 = st.columns([3, 1])
         
@@ -31,59 +81,266 @@ def main():
         st.image(bump_anti_image, caption='Adams/Car')
         
 
-    bump_anti_uploaded_file = st.file_uploader("Choose a .res file", type=[".res"])
-    
+    bump_anti_uploaded_files = st.file_uploader("Choose .res files", type=[".res"], accept_multiple_files=True)
+    bump_anti_uploaded_file = None
+    bump_anti_worker = None
+    bump_anti_all_matrices = []
+    bump_anti_hashes = []
 
-    if bump_anti_uploaded_file:
-        bump_anti_content = bump_anti_uploaded_file.read().decode('utf-8')
-        bump_anti_blocks = bump_anti_extract_blocks(bump_anti_content)
-        
-        if bump_anti_blocks:
-            bump_anti_process_blocks(bump_anti_blocks, bump_anti_uploaded_file)
-        else:
-            st.write("No valid data blocks found in the file.")
-
-def bump_anti_extract_blocks(bump_anti_content):
-    bump_anti_pattern = r'<Step type="quasiStatic">([\s\S]*?)</Step>'
-    bump_anti_blocks = re.findall(bump_anti_pattern, bump_anti_content)
-    return bump_anti_blocks
-
-def bump_anti_process_blocks(bump_anti_blocks, bump_anti_uploaded_file):
-    # Extract values using the provided method
-    bump_anti_wheel_travel_li = [float(bump_anti_block.split()[918]) for bump_anti_block in bump_anti_blocks]
-    bump_anti_wheel_travel_re = [float(bump_anti_block.split()[919]) for bump_anti_block in bump_anti_blocks]
-    #
-    bump_anti_toe_li = [float(bump_anti_block.split()[1025])*180/3.1415926 for bump_anti_block in bump_anti_blocks]
-    bump_anti_toe_re = [float(bump_anti_block.split()[1026])*180/3.1415926 for bump_anti_block in bump_anti_blocks]
-    #
-    bump_anti_camber_li = [float(bump_anti_block.split()[1027])*180/3.1415926 for bump_anti_block in bump_anti_blocks]
-    bump_anti_camber_re = [float(bump_anti_block.split()[1028])*180/3.1415926 for bump_anti_block in bump_anti_blocks]
-    #
-    bump_anti_vertical_force_li = [float(bump_anti_block.split()[934]) for bump_anti_block in bump_anti_blocks]
-    bump_anti_vertical_force_re = [float(bump_anti_block.split()[935]) for bump_anti_block in bump_anti_blocks]
-
-    # Create DataFrame
-    df_bump_anti = pd.DataFrame({
-        'bump_anti_wheel_travel_li': bump_anti_wheel_travel_li,
-        'bump_anti_wheel_travel_re': bump_anti_wheel_travel_re,
-        'bump_anti_toe_li': bump_anti_toe_li,
-        'bump_anti_toe_re': bump_anti_toe_re,
-        'bump_anti_camber_li': bump_anti_camber_li,
-        'bump_anti_camber_re': bump_anti_camber_re,
-        'bump_anti_vertical_force_li': bump_anti_vertical_force_li,
-        'bump_anti_vertical_force_re': bump_anti_vertical_force_re,
-    })
-
-    # Find the row where bump_anti_wheel_travel_li is closest to 0
-    offset_row = df_bump_anti.iloc[(df_bump_anti['bump_anti_wheel_travel_li']).abs().idxmin()]
-    
-    # Subtract the values of this row from the entire DataFrame to create df_bump_anti_offset
-    df_bump_anti_offset = df_bump_anti.subtract(offset_row)
+    if bump_anti_uploaded_files:
+        # Every registered test is extracted in one pass per file and cached. Files not in the
+        # cache are parsed by a background worker (knc.worker), several in parallel, while the
+        # bar shows the bytes and steps done. A parse can be cancelled and started again.
+        bump_anti_worker = session_worker(st.session_state, 'bump_anti_parse_worker', bump_anti_uploaded_files)
+        bump_anti_progress = st.progress(0.0)
+        bump_anti_cancel = st.empty()
+        if bump_anti_worker.running() and bump_anti_cancel.button("Cancel Parsing", key='bump_anti_cancel_parsing'):
+            bump_anti_worker.cancel()
+        # Errors and the variant comparison need every file, they are shown up here once
+        # all files are parsed
+        bump_anti_status = st.container()
+
+        bump_anti_index = st.selectbox("Select file:", range(len(bump_anti_uploaded_files)), format_func=lambda i: bump_anti_uploaded_files[i].name)
+        bump_anti_uploaded_file = bump_anti_uploaded_files[bump_anti_index]
+
+        # The selected file is shown as soon as it is parsed, the others are parsed meanwhile
+        while bump_anti_worker.running() and not bump_anti_worker.parsed(bump_anti_index):
+            bump_anti_progress.progress(*bump_anti_worker.progress())
+            bump_anti_worker.wait()
+        if bump_anti_worker.parsed(bump_anti_index):
+            bump_anti_matrix = bump_anti_worker.test_matrix(bump_anti_index, 'bump_anti')
+
+            # Tests of the analyses of a full K&C run, a file without a bump_anti analysis gets a warning
+            bump_anti_found = extract_analysis_tests(bump_anti_worker.matrices[bump_anti_index])
+            if len(bump_anti_matrix):
+                bump_anti_process_blocks(bump_anti_matrix, bump_anti_worker.hashes[bump_anti_index], bump_anti_uploaded_file)
+            elif bump_anti_found is not None:
+                st.warning(f"No analysis in this file is named as a {bump_anti_test['title']} test "
+                           f"(analyses found: {', '.join(kpi.KPI_TESTS[bump_anti_found_test]['title'] for bump_anti_found_test in bump_anti_found) or 'none named as a K&C test'}).")
+            else:
+                st.write("No valid data blocks found in the file.")
+
+        while bump_anti_worker.running():
+            bump_anti_progress.progress(*bump_anti_worker.progress())
+            bump_anti_worker.wait()
+        bump_anti_progress.progress(*bump_anti_worker.progress())
+        bump_anti_cancel.empty()
+        with bump_anti_status:
+            # A failed or cancelled parse is reported and can be started again
+            if bump_anti_worker.error is not None or bump_anti_worker.cancelled():
+                if bump_anti_worker.error is not None:
+                    st.error(f"Parsing failed: {type(bump_anti_worker.error).__name__}: {bump_anti_worker.error}")
+                else:
+                    st.write("Parsing cancelled.")
+                if st.button("Parse Again", key='bump_anti_parse_again'):
+                    session_worker(st.session_state, 'bump_anti_parse_worker', bump_anti_uploaded_files, restart=True)
+                    st.rerun()
+                st.stop()
+            # the test's steps of every file are cut out once and kept by the worker
+            bump_anti_matrices = [bump_anti_worker.test_matrix(bump_anti_index, 'bump_anti') for bump_anti_index in range(len(bump_anti_uploaded_files))]
+
+            # Overlay all uploaded variants, deltas against a chosen baseline
+            if len(bump_anti_uploaded_files) > 1 and st.checkbox("Compare Variants", key='bump_anti_compare'):
+                bump_anti_compare_variants(bump_anti_uploaded_files, bump_anti_matrices)
+
+        bump_anti_all_matrices = bump_anti_worker.matrices
+        # content hashes the worker took for the cache keys, stored with the runs
+        bump_anti_hashes = bump_anti_worker.hashes
+
+    # Store the uploads and query the stored runs
+    bump_anti_database(bump_anti_uploaded_files or [], bump_anti_all_matrices, bump_anti_hashes)
+
+    return bump_anti_uploaded_file, bump_anti_worker
+
+def bump_anti_database(bump_anti_uploaded_files, bump_anti_all_matrices, bump_anti_hashes):
+    st.markdown('---')
+    st.write('### K&C Database')
+    bump_anti_connection = database.database_connect()
+
+    if bump_anti_uploaded_files:
+        bump_anti_database_col1, bump_anti_database_col2, bump_anti_database_col3 = st.columns([1, 1, 1])
+        with bump_anti_database_col1:
+            bump_anti_vehicle = st.text_input("Vehicle:", key='bump_anti_vehicle')
+        with bump_anti_database_col2:
+            bump_anti_axle = st.selectbox("Axle:", ['Rear', 'Front'], key='bump_anti_axle')
+        with bump_anti_database_col3:
+            bump_anti_date = st.date_input("Test date:", key='bump_anti_date')
+
+        # Every test a file holds is stored, a file without analyses by the test in its name.
+        # Analyses not named as a test are not stored.
+        if st.button("Store in Database"):
+            bump_anti_stored = 0
+            for bump_anti_file, bump_anti_all_tests, bump_anti_hash in zip(bump_anti_uploaded_files, bump_anti_all_matrices, bump_anti_hashes):
+                bump_anti_file_tests = extract_file_tests(bump_anti_all_tests, bump_anti_file.name, 'bump_anti')
+                if not bump_anti_file_tests:
+                    st.warning(f"{bump_anti_file.name}: no analysis is named as a K&C test, nothing stored.")
+                for bump_anti_file_test, bump_anti_file_matrix in bump_anti_file_tests.items():
+                    if len(bump_anti_file_matrix) > 1:
+                        database.database_store_run(bump_anti_connection, bump_anti_file_test, bump_anti_file_matrix, bump_anti_file.name, bump_anti_hash, bump_anti_vehicle, bump_anti_axle, bump_anti_date.isoformat())
+                        bump_anti_stored += 1
+            st.write(f"{bump_anti_stored} runs stored in {database.DATABASE_PATH}")
+
+    # Filters, every run when nothing is selected
+    bump_anti_filter_col1, bump_anti_filter_col2, bump_anti_filter_col3, bump_anti_filter_col4 = st.columns([1, 1, 1, 1])
+    with bump_anti_filter_col1:
+        bump_anti_filter_vehicle = st.multiselect("Vehicle:", database.database_values(bump_anti_connection, 'vehicle'), key='bump_anti_filter_vehicle')
+    with bump_anti_filter_col2:
+        bump_anti_filter_axle = st.multiselect("Axle:", database.database_values(bump_anti_connection, 'axle'), key='bump_anti_filter_axle')
+    with bump_anti_filter_col3:
+        bump_anti_filter_test = st.multiselect("Test:", database.database_values(bump_anti_connection, 'test'), key='bump_anti_filter_test')
+    with bump_anti_filter_col4:
+        bump_anti_filter_dates = st.date_input("Test date from / to:", value=[], key='bump_anti_filter_dates')
+
+    bump_anti_runs = database.database_query(
+        bump_anti_connection, vehicle=bump_anti_filter_vehicle, axle=bump_anti_filter_axle, test=bump_anti_filter_test,
+        date_from=bump_anti_filter_dates[0] if len(bump_anti_filter_dates) > 0 else None,
+        date_to=bump_anti_filter_dates[1] if len(bump_anti_filter_dates) > 1 else None,
+    )
+    st.write(f"Number of stored runs = {len(bump_anti_runs)}")
+    st.dataframe(bump_anti_runs, width=2400, height=300)
+
+    bump_anti_corridors(bump_anti_connection, bump_anti_runs)
+    bump_anti_statistics(bump_anti_connection, bump_anti_filter_vehicle, bump_anti_filter_axle)
+    bump_anti_connection.close()
+
+    return None
+
+def bump_anti_corridors(bump_anti_connection, bump_anti_runs):
+    st.markdown('---')
+    st.write('### Target Corridors')
+
+    # Vehicle classes and corridors are edited here and kept in the database
+    with st.expander("Vehicle classes and corridors"):
+        bump_anti_vehicle_classes = database.database_vehicle_classes(bump_anti_connection)
+        bump_anti_vehicles = [bump_anti_vehicle for bump_anti_vehicle in database.database_values(bump_anti_connection, 'vehicle') if bump_anti_vehicle]
+        bump_anti_classes_edit = st.data_editor(
+            pd.DataFrame({'vehicle': bump_anti_vehicles, 'vehicle_class': [bump_anti_vehicle_classes.get(bump_anti_vehicle, '') for bump_anti_vehicle in bump_anti_vehicles]}),
+            disabled=['vehicle'], hide_index=True, key='bump_anti_classes_edit',
+        )
+        bump_anti_corridor_parameters = corridors.corridor_parameters()
+        bump_anti_corridors_edit = st.data_editor(
+            database.database_corridors(bump_anti_connection), num_rows='dynamic', hide_index=True, key='bump_anti_corridors_edit',
+            column_config={
+                'vehicle_class': st.column_config.TextColumn("Vehicle class", required=True),
+                'parameter': st.column_config.SelectboxColumn("Parameter", options=list(bump_anti_corridor_parameters), required=True),
+                'min': st.column_config.NumberColumn("Min", format="%.4f"),
+                'max': st.column_config.NumberColumn("Max", format="%.4f"),
+            },
+        )
+        st.write("Corridors hold for the left and right side, in the units " + ", ".join(f"{bump_anti_parameter} [{bump_anti_unit}]" for bump_anti_parameter, bump_anti_unit in bump_anti_corridor_parameters.items()))
+        if st.button("Save Corridors"):
+            database.database_store_vehicle_classes(bump_anti_connection, dict(zip(bump_anti_classes_edit['vehicle'], bump_anti_classes_edit['vehicle_class'].fillna(''))))
+            database.database_store_corridors(bump_anti_connection, bump_anti_corridors_edit)
+            st.write("Vehicle classes and corridors saved")
+
+    # Every listed run against the corridors of its vehicle class, in one pass
+    bump_anti_check = corridors.corridor_check(bump_anti_runs, database.database_corridors(bump_anti_connection), database.database_vehicle_classes(bump_anti_connection))
+    bump_anti_check = bump_anti_check.loc[:, bump_anti_check.notna().any()]
+    if bump_anti_check.empty:
+        st.write("No corridor applies to the listed runs.")
+        return None
+
+    bump_anti_failed = (bump_anti_check == 0).sum(axis=1)
+    bump_anti_checked = bump_anti_check.notna().sum(axis=1)
+    st.write(f"Runs within all corridors = {int(((bump_anti_failed == 0) & (bump_anti_checked > 0)).sum())} of {int((bump_anti_checked > 0).sum())} checked")
+    bump_anti_matrix = bump_anti_check.replace({1.0: 'pass', 0.0: 'FAIL'}).fillna('')
+    bump_anti_matrix.insert(0, 'failed', bump_anti_failed)
+    st.dataframe(pd.concat([bump_anti_runs[['id', 'file', 'vehicle', 'axle', 'test', 'date']], bump_anti_matrix], axis=1)[bump_anti_checked > 0], width=2400, height=300)
+    st.table(pd.DataFrame({'checked': bump_anti_check.notna().sum(), 'failed': (bump_anti_check == 0).sum()}))
+
+    return None
+
+def bump_anti_statistics(bump_anti_connection, bump_anti_filter_vehicle, bump_anti_filter_axle):
+    bump_anti_stats_tests = [bump_anti_stats_test for bump_anti_stats_test in database.database_values(bump_anti_connection, 'test') if bump_anti_stats_test in kpi.KPI_TESTS]
+    if not bump_anti_stats_tests:
+        return None
 
-    st.write(f"Number of available data blocks = {len(bump_anti_blocks)}")
+    st.markdown('---')
+    st.write('### Fleet Statistics')
+    st.write("Over every stored run of the selected vehicles and axles (the date filter is not applied).")
+    bump_anti_stats_test = st.selectbox("Test:", bump_anti_stats_tests, key='bump_anti_stats_test')
+
+    # Mean, spread, correlation and regressions come from the running aggregates kept by
+    # the database, they are updated when runs are stored and never recomputed here
+    bump_anti_parameters, bump_anti_state = database.database_aggregate(bump_anti_connection, bump_anti_stats_test, vehicle=bump_anti_filter_vehicle, axle=bump_anti_filter_axle)
+    if bump_anti_state[0] < 2:
+        st.write("At least two stored runs are needed.")
+        return None
+    st.table(aggregates.aggregate_summary(bump_anti_state, bump_anti_parameters).round(4).astype(str))
+
+    bump_anti_correlation = aggregates.aggregate_correlation(bump_anti_state, bump_anti_parameters)
+    bump_anti_fig_correlation = plots.page_figure(go.Heatmap(z=bump_anti_correlation.to_numpy(), x=bump_anti_parameters, y=bump_anti_parameters, zmin=-1, zmax=1, colorscale='RdBu'))
+    bump_anti_fig_correlation.update_layout(title_text="KPI Correlation", width=1000)
+    st.plotly_chart(bump_anti_fig_correlation, theme=None)
+
+    # Distribution of one KPI
+    bump_anti_distribution_parameter = st.selectbox("Distribution of:", bump_anti_parameters, key='bump_anti_distribution_parameter')
+    bump_anti_distribution = database.database_kpi_values(
+        bump_anti_connection, [bump_anti_distribution_parameter], vehicle=bump_anti_filter_vehicle, axle=bump_anti_filter_axle, test=bump_anti_stats_test,
+    )[bump_anti_distribution_parameter].dropna().tolist()
+    if len(bump_anti_distribution) > 1:
+        bump_anti_quartiles = statistics.quantiles(bump_anti_distribution, n=4)
+        st.write(f"Median = {bump_anti_quartiles[1]:.4f}, interquartile range = {bump_anti_quartiles[0]:.4f} ... {bump_anti_quartiles[2]:.4f}")
+        bump_anti_fig_distribution = plots.page_figure(go.Histogram(x=bump_anti_distribution, nbinsx=50))
+        bump_anti_fig_distribution.update_layout(title_text=f"{bump_anti_distribution_parameter}: Distribution", height=600)
+        st.plotly_chart(bump_anti_fig_distribution, theme=None)
+
+    # Linear regression between two KPIs over the runs
+    bump_anti_regression_col1, bump_anti_regression_col2 = st.columns([1, 1])
+    with bump_anti_regression_col1:
+        bump_anti_regression_x = st.selectbox("Regression x:", bump_anti_parameters, key='bump_anti_regression_x')
+    with bump_anti_regression_col2:
+        bump_anti_regression_y = st.selectbox("Regression y:", bump_anti_parameters, index=1, key='bump_anti_regression_y')
+    bump_anti_regression = aggregates.aggregate_regression(bump_anti_state, bump_anti_parameters, bump_anti_regression_x, bump_anti_regression_y)
+    st.write(f"{bump_anti_regression_y} = {bump_anti_regression['slope']:.4f} * {bump_anti_regression_x} + {bump_anti_regression['intercept']:.4f}, r² = {bump_anti_regression['r2']:.4f} ({bump_anti_regression['n']} runs)")
+    bump_anti_scatter = database.database_kpi_values(
+        bump_anti_connection, [bump_anti_regression_x, bump_anti_regression_y], vehicle=bump_anti_filter_vehicle, axle=bump_anti_filter_axle, test=bump_anti_stats_test,
+    ).dropna()
+    bump_anti_fig_regression = plots.page_figure()
+    bump_anti_fig_regression.add_trace(go.Scattergl(x=bump_anti_scatter[bump_anti_regression_x], y=bump_anti_scatter[bump_anti_regression_y], mode='markers', name='Runs'))
+    bump_anti_regression_line = np.array([bump_anti_scatter[bump_anti_regression_x].min(), bump_anti_scatter[bump_anti_regression_x].max()])
+    bump_anti_fig_regression.add_trace(go.Scatter(x=bump_anti_regression_line, y=bump_anti_regression['slope'] * bump_anti_regression_line + bump_anti_regression['intercept'], mode='lines', name='Regression'))
+    bump_anti_fig_regression.update_layout(xaxis_title=bump_anti_regression_x, yaxis_title=bump_anti_regression_y)
+    st.plotly_chart(bump_anti_fig_regression, theme=None)
+
+    return None
+
+def bump_anti_compare_variants(bump_anti_uploaded_files, bump_anti_matrices):
+    bump_anti_names = [bump_anti_file.name for bump_anti_file in bump_anti_uploaded_files]
+    bump_anti_baseline = st.selectbox("Baseline:", range(len(bump_anti_names)), format_func=lambda i: bump_anti_names[i], key='bump_anti_baseline')
+
+    # Every run resampled onto a common grid, KPI and curve deltas as array operations (knc.compare)
+    bump_anti_comparison = compare.compare_runs('bump_anti', bump_anti_matrices, bump_anti_names, bump_anti_baseline)
+    if bump_anti_comparison['skipped']:
+        st.write(f"No valid data blocks found in: {', '.join(bump_anti_comparison['skipped'])}")
+    if len(bump_anti_comparison['names']) < 2:
+        return None
+
+    st.write('### KPI Comparison')
+    st.table(bump_anti_comparison['kpis'].round(4).astype(str))
+    st.write('### KPI Delta to Baseline')
+    st.table(bump_anti_comparison['kpi_deltas'].round(4).astype(str))
+
+    # One figure per KPI, left and right side, all runs in one trace per plot
+    bump_anti_kpis = kpi.test_kpis('bump_anti')
+    for bump_anti_kpi_li, bump_anti_kpi_re in zip(bump_anti_kpis[::2], bump_anti_kpis[1::2]):
+        bump_anti_fig_compare = plots.compare_figure(bump_anti_comparison, [bump_anti_kpi_li['parameter'], bump_anti_kpi_re['parameter']], f"{bump_anti_kpi_li['parameter'][:-3]}: [{bump_anti_kpi_li['unit']}]")
+        st.plotly_chart(bump_anti_fig_compare, theme=None)
+    st.markdown('---')
+
+    return None
+
+def bump_anti_process_blocks(bump_anti_matrix, bump_anti_hash, bump_anti_uploaded_file):
+    # Columns are only computed when they are displayed or plotted
+    df_bump_anti = LazyChannelFrame(bump_anti_matrix, bump_anti_columns)
+
+    # Subtract the row where bump_anti_wheel_travel_li is closest to 0 to create df_bump_anti_offset
+    df_bump_anti_offset = df_bump_anti.offset(bump_anti_test['offset_column'])
+
+    st.write(f"Number of available data blocks = {len(bump_anti_matrix)}")
     
     # Display columns in multiselect
-    selected_columns = st.multiselect("Select columns:", df_bump_anti_offset.columns.tolist(), default=df_bump_anti_offset.columns.tolist())
+    selected_columns = st.multiselect("Select columns:", df_bump_anti_offset.columns, default=df_bump_anti_offset.columns)
 
     # Display selected columns from df_bump_anti_offset
     if selected_columns:
@@ -91,35 +348,27 @@ def bump_anti_process_blocks(bump_anti_blocks, bump_anti_uploaded_file):
         st.dataframe(df_bump_anti[selected_columns], width= 2400, height= 300)
     
     # Plotting
+    # Fits, KPI table and figures of the plotted data are kept in the session (knc.results),
+    # reruns from other widgets and the exports reuse them until other data is selected
+    bump_anti_figure_key = figure_key(bump_anti_hash, 'bump_anti', bump_anti_test['window'], plots.figure_style())
     if st.button("Plot Graphs (bump_Anti-Phase Test)"):
+        # All KPIs of the test in one pass of the shared engine
+        bump_anti_fits = kpi.test_fits('bump_anti', df_bump_anti_offset, df_bump_anti)
+        timing.begin('figure build')
+        # Figures are memoized on the file, the test, the fit window and the plot style (knc.cache)
+        bump_anti_figure_list = cached_figures(bump_anti_figure_key, lambda: plots.kpi_figures('bump_anti', df_bump_anti_offset, df_bump_anti, bump_anti_fits, **bump_anti_curve_style))
+        timing.end()
+        results_store(st.session_state, 'bump_anti_session_results', bump_anti_figure_key, {
+            'fits': bump_anti_fits,
+            'results': pd.DataFrame(kpi.test_results('bump_anti', bump_anti_fits)),
+            'figures': bump_anti_figure_list,
+        })
+    bump_anti_session_results = results_lookup(st.session_state, 'bump_anti_session_results', bump_anti_figure_key)
+    if bump_anti_session_results is not None:
         
         #定义要在按下后输出的内容
-        (
-            fig_bump_anti_wheel_rate, fig_bump_anti_steer, fig_bump_anti_camber,  
-            slope_bump_anti_wheel_rate_li, slope_bump_anti_wheel_rate_re, 
-            slope_bump_anti_steer_li, slope_bump_anti_steer_re, 
-            slope_bump_anti_camber_li, slope_bump_anti_camber_re
-        ) = plot_graphs(df_bump_anti_offset, df_bump_anti)
-        
-        # fig_steer, fig_camber, slope_li, slope_re, slope_camber_li, slope_camber_re = plot_graphs(df_bump_anti_offset)
-        
-        fig_bump_anti_wheel_rate.update_layout(title_text="Bump_Anti-Phase Wheel Rate: [N/mm]", title_font=dict(size=24, family="Arial Bold"), width=1600, height=800)
-        fig_bump_anti_steer.update_layout(title_text="Bump_Anti-Phase Steer: [deg/mm]", title_font=dict(size=24, family="Arial Bold"), width=1600, height=800)
-        fig_bump_anti_camber.update_layout(title_text="Bump_Anti-Phase Camber: [deg/mm]", title_font=dict(size=24, family="Arial Bold"), width=1600, height=800)
-        
-        # Create DataFrame for results
-        bump_anti_results = pd.DataFrame({
-            'Parameter': [
-                'bump_anti_Wheel_Rate_li', 'bump_anti_Wheel_Rate_re',
-                'bump_anti_Toe_Change_li', 'bump_anti_Toe_Change_re', 
-                'bump_anti_Camber_Change_li', 'bump_anti_Camber_Change_re'
-                ],
-            'Slope': [
-                slope_bump_anti_wheel_rate_li, slope_bump_anti_wheel_rate_re,
-                slope_bump_anti_steer_li, slope_bump_anti_steer_re, 
-                slope_bump_anti_camber_li, slope_bump_anti_camber_re
-                ]
-        })
+        # KPI table of the session results
+        bump_anti_results = bump_anti_session_results['results']
 
         # Display the DataFrame in Streamlit
         #st.table(bump_anti_results.T.astype(str))
@@ -129,442 +378,41 @@ def bump_anti_process_blocks(bump_anti_blocks, bump_anti_uploaded_file):
         st.sidebar.title('Key Results Overview:')
         st.sidebar.markdown('---')
         st.sidebar.table(bump_anti_results.iloc[::2].round(4).astype(str))
-        if st.sidebar.button('Save CSV'):
-            bump_anti_results.iloc[::2].to_csv('bump_anti_results_odd_rows.csv', index=False)
-            st.sidebar.write('File saved as bump_anti_results_odd_rows.csv')
-        
-        # Update layout for fig_bump_anti_wheel_rate
-        fig_bump_anti_wheel_rate.update_layout(
-            xaxis_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis_title_font=dict(size=18, family='Arial Bold'),
-            xaxis_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis_tickfont=dict(size=18, family='Arial Bold'),
-            legend_font=dict(size=18, family='Arial Bold')
-        )
-        # Do the same for the second xaxis and yaxis (for the right subplot)
-        fig_bump_anti_wheel_rate.update_layout(
-            xaxis2_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis2_title_font=dict(size=18, family='Arial Bold'),
-            xaxis2_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis2_tickfont=dict(size=18, family='Arial Bold')
-        )
-        
-        # Update layout for fig_bump_anti_steer
-        fig_bump_anti_steer.update_layout(
-            xaxis_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis_title_font=dict(size=18, family='Arial Bold'),
-            xaxis_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis_tickfont=dict(size=18, family='Arial Bold'),
-            legend_font=dict(size=18, family='Arial Bold')
-        )
-        # Do the same for the second xaxis and yaxis (for the right subplot)
-        fig_bump_anti_steer.update_layout(
-            xaxis2_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis2_title_font=dict(size=18, family='Arial Bold'),
-            xaxis2_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis2_tickfont=dict(size=18, family='Arial Bold')
-        )
-
-        # Update layout for fig_bump_anti_camber
-        fig_bump_anti_camber.update_layout(
-            xaxis_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis_title_font=dict(size=18, family='Arial Bold'),
-            xaxis_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis_tickfont=dict(size=18, family='Arial Bold'),
-            legend_font=dict(size=18, family='Arial Bold')
-        )
-        # Do the same for the second xaxis and yaxis (for the right subplot)
-        fig_bump_anti_camber.update_layout(
-            xaxis2_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis2_title_font=dict(size=18, family='Arial Bold'),
-            xaxis2_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis2_tickfont=dict(size=18, family='Arial Bold')
-        )
-        
-        
-        # Update background color for fig_bump_anti_wheel_rate
-        fig_bump_anti_wheel_rate.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            xaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            xaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray')
-        )
-
-        # Update background color for fig_bump_anti_steer
-        fig_bump_anti_steer.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            xaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            xaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray')
-        )
-
-        # Update background color for fig_bump_anti_camber
-        fig_bump_anti_camber.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            xaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            xaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray')
-        )
-        
-        st.markdown('---')
-        
-        if bump_anti_uploaded_file:
-            st.write(f"You uploaded: {bump_anti_uploaded_file.name}")
-            
-        st.markdown("* Wheel rate in roll defines the suspension stiffness for single wheel inputs and hence the ride behaviour over rougher road surfaces.")
-        st.markdown("* Toral roll stiffness defines the body roll behaviour during cornering.") 
-        st.markdown("* Front to rear roll stiffness distribution affects the handling balance. This is most significant in the non-linear handling regime (higher levels of lateral acceleration.)")     
-        
-        st.plotly_chart(fig_bump_anti_wheel_rate)
-        
-        # Display the regression line equations
-        bump_anti_wheel_rate_col1, bump_anti_wheel_rate_col2, bump_anti_wheel_rate_col3 = st.columns([1, 1, 1])
-        
-        with bump_anti_wheel_rate_col1:
-            st.markdown("**Curve Fitting Left  (-25mm <-> +25mm ) [N/mm]:**")
-            st.text_input(label="", value=f"{slope_bump_anti_wheel_rate_li:.4f}", key="result_display_bump_anti_wheel_rate_li") 
-                   
-        with bump_anti_wheel_rate_col2:
-            st.markdown("**Curve Fitting Right  (-25mm <-> +25mm ) [N/mm]:**")
-            st.text_input(label="", value=f"{slope_bump_anti_wheel_rate_re:.4f}", key="result_display_bump_anti_wheel_rate_re")
-            
-        
-        
-        st.markdown('---')
-        if bump_anti_uploaded_file:
-            st.write(f"You uploaded: {bump_anti_uploaded_file.name}")
-            
-        st.markdown("* Roll steer influences lateral dynamics in term of response gain and response timing. Roll understeer at the front (toe-out during bump) reduces steering sensitivity, but reduces response delay.")
-        st.markdown("* Roll understeer at the rear (toe-in during bump) reduces side-slip gain.")
-        st.markdown("* Roll understeer is used to improve the linearity of response - the consistency of gain between inputs of different magnitudes.")  
-        st.markdown("* The amount of roll steer that occurs in a corner is controlled by the body roll stiffness.")
-        
-        st.plotly_chart(fig_bump_anti_steer)
-        
-        # Display the regression line equations
-        bump_anti_steer_col1, bump_anti_steer_col2, bump_anti_steer_col3 = st.columns([1, 1, 1])
-        
-        with bump_anti_steer_col1:
-            st.markdown("**Curve Fitting Left  (-25mm <-> +25mm ) [deg/m]:**")
-            st.text_input(label="", value=f"{slope_bump_anti_steer_li * 1000:.4f}", key="result_display_bump_anti_steer_li") 
-                   
-        with bump_anti_steer_col2:
-            st.markdown("**Curve Fitting Right  (-25mm <-> +25mm ) [deg/m]:**")
-            st.text_input(label="", value=f"{slope_bump_anti_steer_re * 1000:.4f}", key="result_display_bump_anti_steer_re")
-            
-        
-        
-        st.markdown('---')
-        if bump_anti_uploaded_file:
-            st.write(f"You uploaded: {bump_anti_uploaded_file.name}")
-            
-        st.markdown("* Roll camber influences lateral dynamics by affecting tyre slip behaviour and generating camber thrust.")
-        st.markdown("* The degree to which a suspension camber the wheel in opposition to the body roll is referred to as camber compensation.")
-        st.markdown("* Full camber compensation means the wheel remains at its static level whilst the body rolls. Camber compensation is used to optimise tyre grip.")
-        st.markdown("* Front to rear camber compensation ratio influences the handling balance.")
+        # Downloads are built from the cached arrays when clicked, nothing is written on the server (knc.export)
+        # Excel is not offered for channel frames longer than a worksheet
+        bump_anti_export_format = st.sidebar.selectbox('Download format:', export_formats(len(bump_anti_matrix)), key='bump_anti_export_format')
+        bump_anti_downloads = {
+            'KPI Results': ('bump_anti_results', lambda: bump_anti_results),
+            'Offset Channels': ('bump_anti_channels_offset', df_bump_anti_offset.to_frame),
+            'Raw Channel Matrix': ('bump_anti_channels_raw', lambda: export_raw_frame(bump_anti_matrix, bump_anti_columns)),
+        }
+        for bump_anti_download, (bump_anti_download_name, bump_anti_download_frame) in bump_anti_downloads.items():
+            bump_anti_file_name, bump_anti_mime = export_file(bump_anti_download_name, bump_anti_export_format)
+            st.sidebar.download_button(f'Download {bump_anti_download}', export_data(bump_anti_download_frame, bump_anti_export_format),
+                                       file_name=bump_anti_file_name, mime=bump_anti_mime, on_click='ignore', key=f'bump_anti_download_{bump_anti_download_name}')
         
-        st.plotly_chart(fig_bump_anti_camber)
-        # Display the regression line equations
-        bump_anti_camber_col1, bump_anti_camber_col2, bump_anti_camber_col3 = st.columns([1, 1, 1])
-        
-        with bump_anti_camber_col1:
-            st.markdown("**Curve Fitting Left  (-25mm <-> +25mm ) [deg/m]:**")
-            st.text_input(label="", value=f"{slope_bump_anti_camber_li * 1000:.4f}", key="result_display_bump_anti_camber_li") 
-                   
-        with bump_anti_camber_col2:
-            st.markdown("**Curve Fitting Right  (-25mm <-> +25mm ) [deg/m]:**")
-            st.text_input(label="", value=f"{slope_bump_anti_camber_re * 1000:.4f}", key="result_display_bump_anti_camber_re")
-
-            
-            
-
-
-def plot_graphs(df_bump_anti_offset, df_bump_anti):
-    
-    # Create the 1. figure with subplots for Steer
-    fig_bump_anti_wheel_rate = make_subplots(rows=1, cols=2,
-                              subplot_titles=('Bump_Anti-Phase Wheel Rate [N/mm]. Rear Left', 'Bump_Anti-Phase Wheel Rate [N/mm]. Rear Right'))
-    
-    # Create the 2. figure with subplots for Steer
-    fig_bump_anti_steer = make_subplots(rows=1, cols=2,
-                              subplot_titles=('Bump_Anti-Phase Steer [deg/mm]. Rear Left', 'Bump_Anti-Phase Steer [deg/mm]. Rear Right'))
-    
-    # Create the 3. figure with subplots for Camber
-    fig_bump_anti_camber = make_subplots(rows=1, cols=2,
-                               subplot_titles=('Bump_Anti-Phase Camber [deg/mm]. Rear Left', 'Bump_Anti-Phase Camber [deg/mm]. Rear Right'))
-    
-    
-    
-
-    # Filter data for linear regression
-    bump_anti_offset_mask_li = (df_bump_anti_offset['bump_anti_wheel_travel_li'] >= -25) & (df_bump_anti_offset['bump_anti_wheel_travel_li'] <= 25)
-    bump_anti_offset_mask_re = (df_bump_anti_offset['bump_anti_wheel_travel_re'] >= -25) & (df_bump_anti_offset['bump_anti_wheel_travel_re'] <= 25)
-    
-    # Filter data only for wheel rate linear regression
-    bump_anti_mask_li = (df_bump_anti['bump_anti_wheel_travel_li'] >= -25) & (df_bump_anti['bump_anti_wheel_travel_li'] <= 25)
-    bump_anti_mask_re = (df_bump_anti['bump_anti_wheel_travel_re'] >= -25) & (df_bump_anti['bump_anti_wheel_travel_re'] <= 25)    
-    
-    
-    
-    # Linear regression for Left wheel_rate
-    slope_bump_anti_wheel_rate_li, intercept_bump_anti_wheel_rate_li, _, _, _ = linregress(df_bump_anti[bump_anti_mask_li]['bump_anti_wheel_travel_li'], 
-                                                            df_bump_anti[bump_anti_mask_li]['bump_anti_vertical_force_li'])
-    # Linear regression for Right wheel_rate
-    slope_bump_anti_wheel_rate_re, intercept_bump_anti_wheel_rate_re, _, _, _ = linregress(df_bump_anti[bump_anti_mask_re]['bump_anti_wheel_travel_re'], 
-                                                            df_bump_anti[bump_anti_mask_re]['bump_anti_vertical_force_re'])
-    
-    # Linear regression for Left Steer
-    slope_bump_anti_steer_li, intercept_bump_anti_steer_li, _, _, _ = linregress(df_bump_anti_offset[bump_anti_offset_mask_li]['bump_anti_wheel_travel_li'], 
-                                                            df_bump_anti_offset[bump_anti_offset_mask_li]['bump_anti_toe_li'])
-    # Linear regression for Right Steer
-    slope_bump_anti_steer_re, intercept_bump_anti_steer_re, _, _, _ = linregress(df_bump_anti_offset[bump_anti_offset_mask_re]['bump_anti_wheel_travel_re'], 
-                                                            df_bump_anti_offset[bump_anti_offset_mask_re]['bump_anti_toe_re'])
-    
-    # Linear regression for Left Camber
-    slope_bump_anti_camber_li, intercept_bump_anti_camber_li, _, _, _ = linregress(df_bump_anti_offset[bump_anti_offset_mask_li]['bump_anti_wheel_travel_li'], 
-                                                              df_bump_anti_offset[bump_anti_offset_mask_li]['bump_anti_camber_li'])
-    # Linear regression for Right Camber
-    slope_bump_anti_camber_re, intercept_bump_anti_camber_re, _, _, _ = linregress(df_bump_anti_offset[bump_anti_offset_mask_re]['bump_anti_wheel_travel_re'], 
-                                                              df_bump_anti_offset[bump_anti_offset_mask_re]['bump_anti_camber_re'])
-    
-    
-    # Left wheel rate plot
-    fig_bump_anti_wheel_rate.add_trace(go.Scatter(x=df_bump_anti['bump_anti_wheel_travel_li'], 
-                                   y=df_bump_anti['bump_anti_vertical_force_li'],
-                                   mode='lines+markers', name='Bump Anti-Phase Wheel Rate Left'), 
-                        row=1, col=1)
-    # Regression line for Left Steer
-    fig_bump_anti_wheel_rate.add_trace(go.Scatter(x=np.linspace(-25, 25, 400), 
-                                   y=slope_bump_anti_wheel_rate_li * np.linspace(-25, 25, 400) + intercept_bump_anti_wheel_rate_li,
-                                   mode='lines', name=f"y={slope_bump_anti_wheel_rate_li:.4f}x + {intercept_bump_anti_wheel_rate_li:.4f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=1)
-    fig_bump_anti_wheel_rate.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_bump_anti_wheel_rate_li:.4f}x + {intercept_bump_anti_wheel_rate_li:.4f}",
-            xref="x1", yref="y1",
-            x=0, y=slope_bump_anti_wheel_rate_li * 0 + intercept_bump_anti_wheel_rate_li+2000,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
-
-    # Right wheel rate plot
-    fig_bump_anti_wheel_rate.add_trace(go.Scatter(x=df_bump_anti['bump_anti_wheel_travel_re'], 
-                                   y=df_bump_anti['bump_anti_vertical_force_re'],
-                                   mode='lines+markers', name='Bump Anti-Phase Wheel Rate Right'), 
-                        row=1, col=2)
-    # Regression line for Right Steer
-    fig_bump_anti_wheel_rate.add_trace(go.Scatter(x=np.linspace(-25, 25, 400), 
-                                   y=slope_bump_anti_wheel_rate_re * np.linspace(-25, 25, 400) + intercept_bump_anti_wheel_rate_re,
-                                   mode='lines', name=f"y={slope_bump_anti_wheel_rate_re:.4f}x + {intercept_bump_anti_wheel_rate_re:.4f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=2)
-    fig_bump_anti_wheel_rate.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_bump_anti_wheel_rate_re:.4f}x + {intercept_bump_anti_wheel_rate_re:.4f}",
-            xref="x2", yref="y2",
-            x=0, y=slope_bump_anti_wheel_rate_re * 0 + intercept_bump_anti_wheel_rate_re+2000,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )    
-    
-    # Left Steer plot
-    fig_bump_anti_steer.add_trace(go.Scatter(x=df_bump_anti_offset['bump_anti_wheel_travel_li'], 
-                                   y=df_bump_anti_offset['bump_anti_toe_li'],
-                                   mode='lines+markers', name='Bump Anti-Phase Steer Left', 
-                                   line=dict(
-                                        width=2,  # line width
-                                        color='rgba(0, 0, 255, 1)'  # line color
-                                        ),
-                                   marker=dict(
-                                        size=5,
-                                        color='white',
-                                        line=dict(
-                                        width=1,  # 设置外围线的宽度
-                                        color='rgba(0, 0, 0, 1)'  # 设置外围线的颜色
-                                        )
-                                   )    
-                                   ), 
-                        row=1, col=1)
-    # Regression line for Left Steer
-    fig_bump_anti_steer.add_trace(go.Scatter(x=np.linspace(-25, 25, 400), 
-                                   y=slope_bump_anti_steer_li * np.linspace(-25, 25, 400) + intercept_bump_anti_steer_li,
-                                   mode='lines', name=f"y={slope_bump_anti_steer_li:.4f}x + {intercept_bump_anti_steer_li:.4f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=1)
-    fig_bump_anti_steer.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_bump_anti_steer_li:.4f}x + {intercept_bump_anti_steer_li:.4f}",
-            xref="x1", yref="y1",
-            x=0, y=slope_bump_anti_steer_li * 0 + intercept_bump_anti_steer_li+0.5,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
-
-    # Right Steer plot
-    fig_bump_anti_steer.add_trace(go.Scatter(x=df_bump_anti_offset['bump_anti_wheel_travel_re'], 
-                                   y=df_bump_anti_offset['bump_anti_toe_re'],
-                                   mode='lines+markers', name='Bump Anti-Phase Steer Right', 
-                                   line=dict(
-                                        width=2,  # line width
-                                        color='rgba(0, 0, 255, 1)'  # line color
-                                        ),
-                                   marker=dict(
-                                        size=5,
-                                        color='white',
-                                        line=dict(
-                                        width=1,  # 设置外围线的宽度
-                                        color='rgba(0, 0, 0, 1)'  # 设置外围线的颜色
-                                        )
-                                   )    
-                                   ), 
-                        row=1, col=2)
-    # Regression line for Right Steer
-    fig_bump_anti_steer.add_trace(go.Scatter(x=np.linspace(-25, 25, 400), 
-                                   y=slope_bump_anti_steer_re * np.linspace(-25, 25, 400) + intercept_bump_anti_steer_re,
-                                   mode='lines', name=f"y={slope_bump_anti_steer_re:.4f}x + {intercept_bump_anti_steer_re:.4f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=2)
-    fig_bump_anti_steer.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_bump_anti_steer_re:.4f}x + {intercept_bump_anti_steer_re:.4f}",
-            xref="x2", yref="y2",
-            x=0, y=slope_bump_anti_steer_re * 0 + intercept_bump_anti_steer_re+0.5,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
-    
-    # Left Camber plot
-    fig_bump_anti_camber.add_trace(go.Scatter(x=df_bump_anti_offset['bump_anti_wheel_travel_li'], 
-                                   y=df_bump_anti_offset['bump_anti_camber_li'],
-                                   mode='lines+markers', name='Bump Anti-Phase Camber Left',
-                                   line=dict(
-                                        width=2,  # line width
-                                        color='rgba(0, 0, 255, 1)'  # line color
-                                        ),
-                                   marker=dict(
-                                        size=5,
-                                        color='white',
-                                        line=dict(
-                                        width=1,  # 设置外围线的宽度
-                                        color='rgba(0, 0, 0, 1)'  # 设置外围线的颜色
-                                        )
-                                   )    
-                                   ), 
-                        row=1, col=1)
-    # Regression line for Left Camber
-    fig_bump_anti_camber.add_trace(go.Scatter(x=np.linspace(-25, 25, 400), 
-                                   y=slope_bump_anti_camber_li * np.linspace(-25, 25, 400) + intercept_bump_anti_camber_li,
-                                   mode='lines', name=f"y={slope_bump_anti_camber_li:.4f}x + {intercept_bump_anti_camber_li:.4f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=1)
-    fig_bump_anti_camber.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_bump_anti_camber_li:.4f}x + {intercept_bump_anti_camber_li:.4f}",
-            xref="x1", yref="y1",
-            x=0, y=slope_bump_anti_camber_li * 0 + intercept_bump_anti_camber_li+0.5,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
+        # Charts are rendered until the last KPI section, the page may still wait for other
+        # files after it
+        timing.begin('render')
+        # One section per KPI: its figure and the fitted slopes of both sides, in the units
+        # targets are written in (knc.corridors)
+        bump_anti_units = corridors.corridor_units()
+        bump_anti_kpis = kpi.test_kpis('bump_anti')
+        for bump_anti_kpi_sides, bump_anti_fig, bump_anti_description in zip(zip(bump_anti_kpis[::2], bump_anti_kpis[1::2]), bump_anti_session_results['figures'], bump_anti_kpi_descriptions):
+            st.markdown('---')
+            if bump_anti_uploaded_file:
+                st.write(f"You uploaded: {bump_anti_uploaded_file.name}")
+            st.markdown('\n'.join(bump_anti_description))
+            st.plotly_chart(bump_anti_fig, theme=None)
 
-    # Right Camber plot
-    fig_bump_anti_camber.add_trace(go.Scatter(x=df_bump_anti_offset['bump_anti_wheel_travel_re'], 
-                                   y=df_bump_anti_offset['bump_anti_camber_re'],
-                                   mode='lines+markers', name='Bump Anti-Phase Camber Right',
-                                   line=dict(
-                                        width=2,  # 设置线的宽度
-                                        color='rgba(0, 0, 255, 1)'  # 设置线的颜色
-                                        ),
-                                   marker=dict(
-                                        size=5,
-                                        color='white',
-                                        line=dict(
-                                        width=1,  # 设置外围线的宽度
-                                        color='rgba(0, 0, 0, 1)'  # 设置外围线的颜色
-                                        )
-                                   )    
-                                   ), 
-                        row=1, col=2)
-    # Regression line for Right Camber
-    fig_bump_anti_camber.add_trace(go.Scatter(x=np.linspace(-25, 25, 400), 
-                                   y=slope_bump_anti_camber_re * np.linspace(-25, 25, 400) + intercept_bump_anti_camber_re,
-                                   mode='lines', name=f"y={slope_bump_anti_camber_re:.4f}x + {intercept_bump_anti_camber_re:.4f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=2)
-    fig_bump_anti_camber.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_bump_anti_camber_re:.4f}x + {intercept_bump_anti_camber_re:.4f}",
-            xref="x2", yref="y2",
-            x=0, y=slope_bump_anti_camber_re * 0 + intercept_bump_anti_camber_re+0.5,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
+            # Display the regression line equations
+            for bump_anti_column, bump_anti_kpi in zip(st.columns([1, 1, 1]), bump_anti_kpi_sides):
+                bump_anti_unit, bump_anti_factor = bump_anti_units[bump_anti_kpi['parameter']]
+                with bump_anti_column:
+                    st.markdown(f"**Curve Fitting {kpi.SIDE_NAMES[bump_anti_kpi['side']]}  ({kpi.window_label('bump_anti')}) [{bump_anti_unit}]:**")
+                    st.text_input(label="", value=f"{bump_anti_session_results['fits'][bump_anti_kpi['parameter']][0] * bump_anti_factor:.4f}", key=f"result_display_{bump_anti_kpi['parameter']}")
+        timing.end()
 
-    # Updating layout for titles, and legend for bump_anti Swheel rate plot
-    fig_bump_anti_wheel_rate.update_layout(title_text="Steer Offset Plots", width=2400, height=1500,
-                            xaxis_title="Rebound <<        RL wheel center vertical travel [mm]        >> Jounce",
-                            yaxis_title="extension <<        RL vertical load [N]        >> compression",
-                            xaxis2_title="Rebound <<        RR wheel center vertical travel [mm]        >> Jounce",
-                            yaxis2_title="extension <<        RR vertical load [N]        >> compression",
-                            showlegend=True)    
-    
-    
-    # Updating layout for titles, and legend for bump_anti Steer plot
-    fig_bump_anti_steer.update_layout(title_text="Steer Offset Plots", width=2400, height=1500,
-                            xaxis_title="Rebound <<        RL wheel center vertical travel [mm]        >> Jounce",
-                            yaxis_title="toe out <<        RL toe angle variation [deg]        >> toe in",
-                            xaxis2_title="Rebound <<        RR wheel center vertical travel [mm]        >> Jounce",
-                            yaxis2_title="toe out <<        RR toe angle variation [deg]        >> toe in",
-                            showlegend=True)
-    
-    # Updating layout for titles, and legend for bump_anti Camber plot
-    fig_bump_anti_camber.update_layout(title_text="Camber Offset Plots", width=2400, height=1500,
-                             xaxis_title="Rebound <<        RL wheel center vertical travel [mm]        >> Jounce",
-                             yaxis_title="top in <<        RL camber angle variation [deg]        >> top out",
-                             xaxis2_title="Rebound <<        RR wheel center vertical travel [mm]        >> Jounce",
-                             yaxis2_title="top in <<        RR camber angle variation [deg]        >> top out",
-                             showlegend=True)
-    
-    
-    
-    
-    
-    
-    # Update legend names for Steer plot
-    for trace in fig_bump_anti_steer.data:
-        if trace.name == 'Left Steer':
-            trace.name = 'Left'
-        elif trace.name == 'Right Steer':
-            trace.name = 'Right'
-
-    # Update legend names for Camber plot
-    for trace in fig_bump_anti_camber.data:
-        if trace.name == 'Left Camber':
-            trace.name = 'Left'
-        elif trace.name == 'Right Camber':
-            trace.name = 'Right'
-    
-    return (
-        fig_bump_anti_wheel_rate, fig_bump_anti_steer, fig_bump_anti_camber, 
-        slope_bump_anti_wheel_rate_li, slope_bump_anti_wheel_rate_re, 
-        slope_bump_anti_steer_li, slope_bump_anti_steer_re, 
-        slope_bump_anti_camber_li, slope_bump_anti_camber_re, 
-    )
-    
-    
-#    return fig_bump_anti_wheel_rate, fig_bump_anti_steer, fig_bump_anti_camber, fig_bump_anti_wheel_base_change, fig_bump_anti_track_change, slope_li, slope_re, slope_camber_li, slope_camber_re
 
 if __name__ == "__main__":
     main()
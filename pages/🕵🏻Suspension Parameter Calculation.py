@@ -1,12 +1,15 @@
 import streamlit as st
 import pandas as pd
-import re
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from scipy.stats import linregress
-import numpy as np
 from PIL import Image
 
+from knc import compare, corridors, kpi, plots, timing
+from knc.cache import cached_figures, figure_key
+from knc.export import export_data, export_file, export_formats, export_raw_frame
+from knc.extract import extract_analysis_tests
+from knc.lazy import LazyChannelFrame
+from knc.results import results_lookup, results_store
+from knc.worker import session_worker
+
 st.set_page_config(page_title="lat_antiphase", page_icon="📈", layout="wide")
 
 lat_antiphase_image=Image.open('logo_lat_antiphase_01.JPG')
@@ -14,8 +17,52 @@ st.image(lat_antiphase_image, caption='Version: Beta V0.2', use_column_width='al
 
 #程序中，所有的变量都以lat_antiphase_开头用以区分
 
+# Test definition (channels, transforms, fit window, KPIs) from the knc.kpi registry
+lat_antiphase_test = kpi.KPI_TESTS['lat_antiphase']
+lat_antiphase_columns = lat_antiphase_test['columns']
+
+# Description above each KPI figure, in kpi.test_kpis order
+lat_antiphase_kpi_descriptions = [
+    [
+        "* Wheel rate in roll defines the suspension stiffness for single wheel inputs and hence the ride behaviour over rougher road surfaces.",
+        "* Toral roll stiffness defines the body roll behaviour during cornering.",
+        "* Front to rear roll stiffness distribution affects the handling balance. This is most significant in the non-linear handling regime (higher levels of lateral acceleration.)",
+    ],
+    [
+        "* Roll steer influences lateral dynamics in term of response gain and response timing. Roll understeer at the front (toe-out during bump) reduces steering sensitivity, but reduces response delay.",
+        "* Roll understeer at the rear (toe-in during bump) reduces side-slip gain.",
+        "* Roll understeer is used to improve the linearity of response - the consistency of gain between inputs of different magnitudes.",
+        "* The amount of roll steer that occurs in a corner is controlled by the body roll stiffness.",
+    ],
+    [
+        "* Roll camber influences lateral dynamics by affecting tyre slip behaviour and generating camber thrust.",
+        "* The degree to which a suspension camber the wheel in opposition to the body roll is referred to as camber compensation.",
+        "* Full camber compensation means the wheel remains at its static level whilst the body rolls. Camber compensation is used to optimise tyre grip.",
+        "* Front to rear camber compensation ratio influences the handling balance.",
+    ],
+]
+
+# Style of the measured curves in the KPI figures (plots.kpi_figures)
+lat_antiphase_curve_style = dict(
+    line=dict(width=2, color='rgba(255, 165, 0, 1)'),
+    marker=dict(size=5, color='white', line=dict(width=1, color='rgba(0, 0, 0, 1)')),
+)
+
 def main():
-    st.title("K&C Test - Lateral Force (Anti-Phase)")
+    # Optional stage timings, shown in the sidebar and appended to the JSON log. The run
+    # is also closed when the page stops early (st.stop, a rerun, an error).
+    lat_antiphase_timing = st.sidebar.checkbox('Pipeline Timing', key='lat_antiphase_timing')
+    with timing.page_run('lat_antiphase', lat_antiphase_timing):
+        lat_antiphase_uploaded_file, lat_antiphase_worker = lat_antiphase_page()
+        if lat_antiphase_timing:
+            # the parse is timed on the worker (knc.worker), its stages come first
+            lat_antiphase_timings = (lat_antiphase_worker.take_timings() if lat_antiphase_worker else []) + timing.finish_run(file=lat_antiphase_uploaded_file.name if lat_antiphase_uploaded_file else None)
+            st.sidebar.markdown('---')
+            st.sidebar.title('Pipeline Timing:')
+            st.sidebar.table(pd.DataFrame(lat_antiphase_timings, columns=['stage', 'calls', 'seconds', 'peak_mb']).round(4).astype(str))
+
+def lat_antiphase_page():
+    st.title(f"K&C Test - {lat_antiphase_test['title']}")
     # Erklärung
     lat_antiphase_description_col1, lat_antiphase_description_col2 = st.columns([3, 1])
         
@@ -32,59 +79,104 @@ def main():
         st.image(lat_antiphase_image, caption='Adams/Car')
         
 
-    lat_antiphase_uploaded_file = st.file_uploader("Choose a .res file", type=[".res"])
-    
-
-    if lat_antiphase_uploaded_file:
-        lat_antiphase_content = lat_antiphase_uploaded_file.read().decode('utf-8')
-        lat_antiphase_blocks = lat_antiphase_extract_blocks(lat_antiphase_content)
-        
-        if lat_antiphase_blocks:
-            lat_antiphase_process_blocks(lat_antiphase_blocks, lat_antiphase_uploaded_file)
-        else:
-            st.write("No valid data blocks found in the file.")
-
-def lat_antiphase_extract_blocks(lat_antiphase_content):
-    lat_antiphase_pattern = r'<Step type="quasiStatic">([\s\S]*?)</Step>'
-    lat_antiphase_blocks = re.findall(lat_antiphase_pattern, lat_antiphase_content)
-    return lat_antiphase_blocks
-
-def lat_antiphase_process_blocks(lat_antiphase_blocks, lat_antiphase_uploaded_file):
-    # Extract values using the provided method
-    lat_antiphase_tire_force_y_li = [-1*float(lat_antiphase_block.split()[1097]) for lat_antiphase_block in lat_antiphase_blocks]
-    lat_antiphase_tire_force_y_re = [float(lat_antiphase_block.split()[1109]) for lat_antiphase_block in lat_antiphase_blocks]
-    #
-    lat_antiphase_toe_li = [float(lat_antiphase_block.split()[1025])*180/3.1415926 for lat_antiphase_block in lat_antiphase_blocks]
-    lat_antiphase_toe_re = [float(lat_antiphase_block.split()[1026])*180/3.1415926 for lat_antiphase_block in lat_antiphase_blocks]
-    #
-    lat_antiphase_camber_li = [float(lat_antiphase_block.split()[1027])*180/3.1415926 for lat_antiphase_block in lat_antiphase_blocks]
-    lat_antiphase_camber_re = [float(lat_antiphase_block.split()[1028])*180/3.1415926 for lat_antiphase_block in lat_antiphase_blocks]
-    #
-    lat_antiphase_wc_track_li = [float(lat_antiphase_block.split()[924]) for lat_antiphase_block in lat_antiphase_blocks]
-    lat_antiphase_wc_track_re = [-1*float(lat_antiphase_block.split()[925]) for lat_antiphase_block in lat_antiphase_blocks]
-
-    # Create DataFrame
-    df_lat_antiphase = pd.DataFrame({
-        'lat_antiphase_tire_force_y_li': lat_antiphase_tire_force_y_li,
-        'lat_antiphase_tire_force_y_re': lat_antiphase_tire_force_y_re,
-        'lat_antiphase_toe_li': lat_antiphase_toe_li,
-        'lat_antiphase_toe_re': lat_antiphase_toe_re,
-        'lat_antiphase_camber_li': lat_antiphase_camber_li,
-        'lat_antiphase_camber_re': lat_antiphase_camber_re,
-        'lat_antiphase_wc_track_li': lat_antiphase_wc_track_li,
-        'lat_antiphase_wc_track_re': lat_antiphase_wc_track_re,
-    })
-
-    # Find the row where lat_antiphase_tire_force_y_li is closest to 0
-    offset_row = df_lat_antiphase.iloc[(df_lat_antiphase['lat_antiphase_tire_force_y_li']).abs().idxmin()]
-    
-    # Subtract the values of this row from the entire DataFrame to create df_lat_antiphase_offset
-    df_lat_antiphase_offset = df_lat_antiphase.subtract(offset_row)
-
-    st.write(f"Number of available data blocks = {len(lat_antiphase_blocks)}")
+    lat_antiphase_uploaded_files = st.file_uploader("Choose .res files", type=[".res"], accept_multiple_files=True)
+    lat_antiphase_uploaded_file = None
+    lat_antiphase_worker = None
+
+    if lat_antiphase_uploaded_files:
+        # Every registered test is extracted in one pass per file and cached. Files not in the
+        # cache are parsed by a background worker (knc.worker), several in parallel, while the
+        # bar shows the bytes and steps done. A parse can be cancelled and started again.
+        lat_antiphase_worker = session_worker(st.session_state, 'lat_antiphase_parse_worker', lat_antiphase_uploaded_files)
+        lat_antiphase_progress = st.progress(0.0)
+        lat_antiphase_cancel = st.empty()
+        if lat_antiphase_worker.running() and lat_antiphase_cancel.button("Cancel Parsing", key='lat_antiphase_cancel_parsing'):
+            lat_antiphase_worker.cancel()
+        # Errors and the variant comparison need every file, they are shown up here once
+        # all files are parsed
+        lat_antiphase_status = st.container()
+
+        lat_antiphase_index = st.selectbox("Select file:", range(len(lat_antiphase_uploaded_files)), format_func=lambda i: lat_antiphase_uploaded_files[i].name)
+        lat_antiphase_uploaded_file = lat_antiphase_uploaded_files[lat_antiphase_index]
+
+        # The selected file is shown as soon as it is parsed, the others are parsed meanwhile
+        while lat_antiphase_worker.running() and not lat_antiphase_worker.parsed(lat_antiphase_index):
+            lat_antiphase_progress.progress(*lat_antiphase_worker.progress())
+            lat_antiphase_worker.wait()
+        if lat_antiphase_worker.parsed(lat_antiphase_index):
+            lat_antiphase_matrix = lat_antiphase_worker.test_matrix(lat_antiphase_index, 'lat_antiphase')
+
+            # Tests of the analyses of a full K&C run, a file without a lat_antiphase analysis gets a warning
+            lat_antiphase_found = extract_analysis_tests(lat_antiphase_worker.matrices[lat_antiphase_index])
+            if len(lat_antiphase_matrix):
+                lat_antiphase_process_blocks(lat_antiphase_matrix, lat_antiphase_worker.hashes[lat_antiphase_index], lat_antiphase_uploaded_file)
+            elif lat_antiphase_found is not None:
+                st.warning(f"No analysis in this file is named as a {lat_antiphase_test['title']} test "
+                           f"(analyses found: {', '.join(kpi.KPI_TESTS[lat_antiphase_found_test]['title'] for lat_antiphase_found_test in lat_antiphase_found) or 'none named as a K&C test'}).")
+            else:
+                st.write("No valid data blocks found in the file.")
+
+        while lat_antiphase_worker.running():
+            lat_antiphase_progress.progress(*lat_antiphase_worker.progress())
+            lat_antiphase_worker.wait()
+        lat_antiphase_progress.progress(*lat_antiphase_worker.progress())
+        lat_antiphase_cancel.empty()
+        with lat_antiphase_status:
+            # A failed or cancelled parse is reported and can be started again
+            if lat_antiphase_worker.error is not None or lat_antiphase_worker.cancelled():
+                if lat_antiphase_worker.error is not None:
+                    st.error(f"Parsing failed: {type(lat_antiphase_worker.error).__name__}: {lat_antiphase_worker.error}")
+                else:
+                    st.write("Parsing cancelled.")
+                if st.button("Parse Again", key='lat_antiphase_parse_again'):
+                    session_worker(st.session_state, 'lat_antiphase_parse_worker', lat_antiphase_uploaded_files, restart=True)
+                    st.rerun()
+                st.stop()
+            # the test's steps of every file are cut out once and kept by the worker
+            lat_antiphase_matrices = [lat_antiphase_worker.test_matrix(lat_antiphase_index, 'lat_antiphase') for lat_antiphase_index in range(len(lat_antiphase_uploaded_files))]
+
+            # Overlay all uploaded variants, deltas against a chosen baseline
+            if len(lat_antiphase_uploaded_files) > 1 and st.checkbox("Compare Variants", key='lat_antiphase_compare'):
+                lat_antiphase_compare_variants(lat_antiphase_uploaded_files, lat_antiphase_matrices)
+
+    return lat_antiphase_uploaded_file, lat_antiphase_worker
+
+def lat_antiphase_compare_variants(lat_antiphase_uploaded_files, lat_antiphase_matrices):
+    lat_antiphase_names = [lat_antiphase_file.name for lat_antiphase_file in lat_antiphase_uploaded_files]
+    lat_antiphase_baseline = st.selectbox("Baseline:", range(len(lat_antiphase_names)), format_func=lambda i: lat_antiphase_names[i], key='lat_antiphase_baseline')
+
+    # Every run resampled onto a common grid, KPI and curve deltas as array operations (knc.compare)
+    lat_antiphase_comparison = compare.compare_runs('lat_antiphase', lat_antiphase_matrices, lat_antiphase_names, lat_antiphase_baseline)
+    if lat_antiphase_comparison['skipped']:
+        st.write(f"No valid data blocks found in: {', '.join(lat_antiphase_comparison['skipped'])}")
+    if len(lat_antiphase_comparison['names']) < 2:
+        return None
+
+    st.write('### KPI Comparison')
+    st.table(lat_antiphase_comparison['kpis'].round(4).astype(str))
+    st.write('### KPI Delta to Baseline')
+    st.table(lat_antiphase_comparison['kpi_deltas'].round(4).astype(str))
+
+    # One figure per KPI, left and right side, all runs in one trace per plot
+    lat_antiphase_kpis = kpi.test_kpis('lat_antiphase')
+    for lat_antiphase_kpi_li, lat_antiphase_kpi_re in zip(lat_antiphase_kpis[::2], lat_antiphase_kpis[1::2]):
+        lat_antiphase_fig_compare = plots.compare_figure(lat_antiphase_comparison, [lat_antiphase_kpi_li['parameter'], lat_antiphase_kpi_re['parameter']], f"{lat_antiphase_kpi_li['parameter'][:-3]}: [{lat_antiphase_kpi_li['unit']}]")
+        st.plotly_chart(lat_antiphase_fig_compare, theme=None)
+    st.markdown('---')
+
+    return None
+
+def lat_antiphase_process_blocks(lat_antiphase_matrix, lat_antiphase_hash, lat_antiphase_uploaded_file):
+    # Columns are only computed when they are displayed or plotted
+    df_lat_antiphase = LazyChannelFrame(lat_antiphase_matrix, lat_antiphase_columns)
+
+    # Subtract the row where lat_antiphase_tire_force_y_li is closest to 0 to create df_lat_antiphase_offset
+    df_lat_antiphase_offset = df_lat_antiphase.offset(lat_antiphase_test['offset_column'])
+
+    st.write(f"Number of available data blocks = {len(lat_antiphase_matrix)}")
     
     # Display columns in multiselect
-    selected_columns = st.multiselect("Select columns:", df_lat_antiphase_offset.columns.tolist(), default=df_lat_antiphase_offset.columns.tolist())
+    selected_columns = st.multiselect("Select columns:", df_lat_antiphase_offset.columns, default=df_lat_antiphase_offset.columns)
 
     # Display selected columns from df_lat_antiphase_offset
     if selected_columns:
@@ -92,35 +184,27 @@ def lat_antiphase_process_blocks(lat_antiphase_blocks, lat_antiphase_uploaded_fi
         st.dataframe(df_lat_antiphase[selected_columns], width= 2400, height= 300)
     
     # Plotting
+    # Fits, KPI table and figures of the plotted data are kept in the session (knc.results),
+    # reruns from other widgets and the exports reuse them until other data is selected
+    lat_antiphase_figure_key = figure_key(lat_antiphase_hash, 'lat_antiphase', lat_antiphase_test['window'], plots.figure_style())
     if st.button("Plot Graphs (lat_antiphase-Phase Test)"):
+        # All KPIs of the test in one pass of the shared engine
+        lat_antiphase_fits = kpi.test_fits('lat_antiphase', df_lat_antiphase_offset)
+        timing.begin('figure build')
+        # Figures are memoized on the file, the test, the fit window and the plot style (knc.cache)
+        lat_antiphase_figure_list = cached_figures(lat_antiphase_figure_key, lambda: plots.kpi_figures('lat_antiphase', df_lat_antiphase_offset, None, lat_antiphase_fits, **lat_antiphase_curve_style))
+        timing.end()
+        results_store(st.session_state, 'lat_antiphase_session_results', lat_antiphase_figure_key, {
+            'fits': lat_antiphase_fits,
+            'results': pd.DataFrame(kpi.test_results('lat_antiphase', lat_antiphase_fits)),
+            'figures': lat_antiphase_figure_list,
+        })
+    lat_antiphase_session_results = results_lookup(st.session_state, 'lat_antiphase_session_results', lat_antiphase_figure_key)
+    if lat_antiphase_session_results is not None:
         
         #定义要在按下后输出的内容
-        (
-            fig_lat_antiphase_compliance, fig_lat_antiphase_steer, fig_lat_antiphase_camber,  
-            slope_lat_antiphase_compliance_li, slope_lat_antiphase_compliance_re, 
-            slope_lat_antiphase_steer_li, slope_lat_antiphase_steer_re, 
-            slope_lat_antiphase_camber_li, slope_lat_antiphase_camber_re
-        ) = plot_graphs(df_lat_antiphase_offset)
-        
-        # fig_steer, fig_camber, slope_li, slope_re, slope_camber_li, slope_camber_re = plot_graphs(df_lat_antiphase_offset)
-        
-        fig_lat_antiphase_compliance.update_layout(title_text="Lateral_Anti-Phase Wheel Center Compliance: [mm/N]", title_font=dict(size=24, family="Arial Bold"), width=1600, height=800)
-        fig_lat_antiphase_steer.update_layout(title_text="Lateral_Anti-Phase Steer: [deg/N]", title_font=dict(size=24, family="Arial Bold"), width=1600, height=800)
-        fig_lat_antiphase_camber.update_layout(title_text="Lateral_Anti-Phase Camber: [deg/N]", title_font=dict(size=24, family="Arial Bold"), width=1600, height=800)
-        
-        # Create DataFrame for results
-        lat_antiphase_results = pd.DataFrame({
-            'Parameter': [
-                'lat_antiphase_compliance_li', 'lat_antiphase_compliance_re',
-                'lat_antiphase_Toe_Change_li', 'lat_antiphase_Toe_Change_re', 
-                'lat_antiphase_Camber_Change_li', 'lat_antiphase_Camber_Change_re'
-                ],
-            'Slope': [
-                slope_lat_antiphase_compliance_li, slope_lat_antiphase_compliance_re,
-                slope_lat_antiphase_steer_li, slope_lat_antiphase_steer_re, 
-                slope_lat_antiphase_camber_li, slope_lat_antiphase_camber_re
-                ]
-        })
+        # KPI table of the session results
+        lat_antiphase_results = lat_antiphase_session_results['results']
 
         # Display the DataFrame in Streamlit
         #st.table(lat_antiphase_results.T.astype(str))
@@ -130,475 +214,41 @@ def lat_antiphase_process_blocks(lat_antiphase_blocks, lat_antiphase_uploaded_fi
         st.sidebar.title('Key Results Overview:')
         st.sidebar.markdown('---')
         st.sidebar.table(lat_antiphase_results.iloc[::2].round(5).astype(str))
-        if st.sidebar.button('Save CSV'):
-            lat_antiphase_results.iloc[::2].to_csv('lat_antiphase_results_odd_rows.csv', index=False)
-            st.sidebar.write('File saved as lat_antiphase_results_odd_rows.csv')
-        
-        # Update layout for fig_lat_antiphase_compliance
-        fig_lat_antiphase_compliance.update_layout(
-            xaxis_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis_title_font=dict(size=18, family='Arial Bold'),
-            xaxis_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis_tickfont=dict(size=18, family='Arial Bold'),
-            legend_font=dict(size=18, family='Arial Bold')
-        )
-        # Do the same for the second xaxis and yaxis (for the right subplot)
-        fig_lat_antiphase_compliance.update_layout(
-            xaxis2_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis2_title_font=dict(size=18, family='Arial Bold'),
-            xaxis2_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis2_tickfont=dict(size=18, family='Arial Bold')
-        )
-        
-        # Update layout for fig_lat_antiphase_steer
-        fig_lat_antiphase_steer.update_layout(
-            xaxis_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis_title_font=dict(size=18, family='Arial Bold'),
-            xaxis_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis_tickfont=dict(size=18, family='Arial Bold'),
-            legend_font=dict(size=18, family='Arial Bold')
-        )
-        # Do the same for the second xaxis and yaxis (for the right subplot)
-        fig_lat_antiphase_steer.update_layout(
-            xaxis2_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis2_title_font=dict(size=18, family='Arial Bold'),
-            xaxis2_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis2_tickfont=dict(size=18, family='Arial Bold')
-        )
+        # Downloads are built from the cached arrays when clicked, nothing is written on the server (knc.export)
+        # Excel is not offered for channel frames longer than a worksheet
+        lat_antiphase_export_format = st.sidebar.selectbox('Download format:', export_formats(len(lat_antiphase_matrix)), key='lat_antiphase_export_format')
+        lat_antiphase_downloads = {
+            'KPI Results': ('lat_antiphase_results', lambda: lat_antiphase_results),
+            'Offset Channels': ('lat_antiphase_channels_offset', df_lat_antiphase_offset.to_frame),
+            'Raw Channel Matrix': ('lat_antiphase_channels_raw', lambda: export_raw_frame(lat_antiphase_matrix, lat_antiphase_columns)),
+        }
+        for lat_antiphase_download, (lat_antiphase_download_name, lat_antiphase_download_frame) in lat_antiphase_downloads.items():
+            lat_antiphase_file_name, lat_antiphase_mime = export_file(lat_antiphase_download_name, lat_antiphase_export_format)
+            st.sidebar.download_button(f'Download {lat_antiphase_download}', export_data(lat_antiphase_download_frame, lat_antiphase_export_format),
+                                       file_name=lat_antiphase_file_name, mime=lat_antiphase_mime, on_click='ignore', key=f'lat_antiphase_download_{lat_antiphase_download_name}')
+        
+        # Charts are rendered until the last KPI section, the page may still wait for other
+        # files after it
+        timing.begin('render')
+        # One section per KPI: its figure and the fitted slopes of both sides, in the units
+        # targets are written in (knc.corridors)
+        lat_antiphase_units = corridors.corridor_units()
+        lat_antiphase_kpis = kpi.test_kpis('lat_antiphase')
+        for lat_antiphase_kpi_sides, lat_antiphase_fig, lat_antiphase_description in zip(zip(lat_antiphase_kpis[::2], lat_antiphase_kpis[1::2]), lat_antiphase_session_results['figures'], lat_antiphase_kpi_descriptions):
+            st.markdown('---')
+            if lat_antiphase_uploaded_file:
+                st.write(f"You uploaded: {lat_antiphase_uploaded_file.name}")
+            st.markdown('\n'.join(lat_antiphase_description))
+            st.plotly_chart(lat_antiphase_fig, theme=None)
+
+            # Display the regression line equations
+            for lat_antiphase_column, lat_antiphase_kpi in zip(st.columns([1, 1, 1]), lat_antiphase_kpi_sides):
+                lat_antiphase_unit, lat_antiphase_factor = lat_antiphase_units[lat_antiphase_kpi['parameter']]
+                with lat_antiphase_column:
+                    st.markdown(f"**Curve Fitting {kpi.SIDE_NAMES[lat_antiphase_kpi['side']]}  ({kpi.window_label('lat_antiphase')}) [{lat_antiphase_unit}]:**")
+                    st.text_input(label="", value=f"{lat_antiphase_session_results['fits'][lat_antiphase_kpi['parameter']][0] * lat_antiphase_factor:.5f}", key=f"result_display_{lat_antiphase_kpi['parameter']}")
+        timing.end()
 
-        # Update layout for fig_lat_antiphase_camber
-        fig_lat_antiphase_camber.update_layout(
-            xaxis_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis_title_font=dict(size=18, family='Arial Bold'),
-            xaxis_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis_tickfont=dict(size=18, family='Arial Bold'),
-            legend_font=dict(size=18, family='Arial Bold')
-        )
-        # Do the same for the second xaxis and yaxis (for the right subplot)
-        fig_lat_antiphase_camber.update_layout(
-            xaxis2_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis2_title_font=dict(size=18, family='Arial Bold'),
-            xaxis2_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis2_tickfont=dict(size=18, family='Arial Bold')
-        )
-        
-        
-        # Update background color for fig_lat_antiphase_compliance
-        fig_lat_antiphase_compliance.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            xaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            xaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray')
-        )
-
-        # Update background color for fig_lat_antiphase_steer
-        fig_lat_antiphase_steer.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            xaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            xaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray')
-        )
-
-        # Update background color for fig_lat_antiphase_camber
-        fig_lat_antiphase_camber.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            xaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            xaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray')
-        )
-        
-        st.markdown('---')
-        
-        if lat_antiphase_uploaded_file:
-            st.write(f"You uploaded: {lat_antiphase_uploaded_file.name}")
-            
-        st.markdown("* Wheel rate in roll defines the suspension stiffness for single wheel inputs and hence the ride behaviour over rougher road surfaces.")
-        st.markdown("* Toral roll stiffness defines the body roll behaviour during cornering.") 
-        st.markdown("* Front to rear roll stiffness distribution affects the handling balance. This is most significant in the non-linear handling regime (higher levels of lateral acceleration.)")     
-        
-        st.plotly_chart(fig_lat_antiphase_compliance)
-        
-        # Display the regression line equations
-        lat_antiphase_compliance_col1, lat_antiphase_compliance_col2, lat_antiphase_compliance_col3 = st.columns([1, 1, 1])
-        
-        with lat_antiphase_compliance_col1:
-            st.markdown("**Curve Fitting Left  (-500 N <-> +500 N ) [mm/kN]:**")
-            st.text_input(label="", value=f"{slope_lat_antiphase_compliance_li*1000:.5f}", key="result_display_lat_antiphase_compliance_li") 
-                   
-        with lat_antiphase_compliance_col2:
-            st.markdown("**Curve Fitting Right  (-500 N <-> +500 Nm ) [mm/kN]:**")
-            st.text_input(label="", value=f"{slope_lat_antiphase_compliance_re*1000:.5f}", key="result_display_lat_antiphase_compliance_re")
-            
-        
-        
-        st.markdown('---')
-        if lat_antiphase_uploaded_file:
-            st.write(f"You uploaded: {lat_antiphase_uploaded_file.name}")
-            
-        st.markdown("* Roll steer influences lateral dynamics in term of response gain and response timing. Roll understeer at the front (toe-out during bump) reduces steering sensitivity, but reduces response delay.")
-        st.markdown("* Roll understeer at the rear (toe-in during bump) reduces side-slip gain.")
-        st.markdown("* Roll understeer is used to improve the linearity of response - the consistency of gain between inputs of different magnitudes.")  
-        st.markdown("* The amount of roll steer that occurs in a corner is controlled by the body roll stiffness.")
-        
-        st.plotly_chart(fig_lat_antiphase_steer)
-        
-        # Display the regression line equations
-        lat_antiphase_steer_col1, lat_antiphase_steer_col2, lat_antiphase_steer_col3 = st.columns([1, 1, 1])
-        
-        with lat_antiphase_steer_col1:
-            st.markdown("**Curve Fitting Left  (-500 N <-> +500 N ) [deg/kN]:**")
-            st.text_input(label="", value=f"{slope_lat_antiphase_steer_li * 1000:.5f}", key="result_display_lat_antiphase_steer_li") 
-                   
-        with lat_antiphase_steer_col2:
-            st.markdown("**Curve Fitting Right  (-500 N <-> +500 N ) [deg/kN]:**")
-            st.text_input(label="", value=f"{slope_lat_antiphase_steer_re * 1000:.5f}", key="result_display_lat_antiphase_steer_re")
-            
-        
-        
-        st.markdown('---')
-        if lat_antiphase_uploaded_file:
-            st.write(f"You uploaded: {lat_antiphase_uploaded_file.name}")
-            
-        st.markdown("* Roll camber influences lateral dynamics by affecting tyre slip behaviour and generating camber thrust.")
-        st.markdown("* The degree to which a suspension camber the wheel in opposition to the body roll is referred to as camber compensation.")
-        st.markdown("* Full camber compensation means the wheel remains at its static level whilst the body rolls. Camber compensation is used to optimise tyre grip.")
-        st.markdown("* Front to rear camber compensation ratio influences the handling balance.")
-        
-        st.plotly_chart(fig_lat_antiphase_camber)
-        # Display the regression line equations
-        lat_antiphase_camber_col1, lat_antiphase_camber_col2, lat_antiphase_camber_col3 = st.columns([1, 1, 1])
-        
-        with lat_antiphase_camber_col1:
-            st.markdown("**Curve Fitting Left  (-500 N <-> +500 N ) [deg/kN]:**")
-            st.text_input(label="", value=f"{slope_lat_antiphase_camber_li * 1000:.5f}", key="result_display_lat_antiphase_camber_li") 
-                   
-        with lat_antiphase_camber_col2:
-            st.markdown("**Curve Fitting Right  (-500 N <-> +500 N ) [deg/kN]:**")
-            st.text_input(label="", value=f"{slope_lat_antiphase_camber_re * 1000:.5f}", key="result_display_lat_antiphase_camber_re")
-
-            
-            
-
-
-def plot_graphs(df_lat_antiphase_offset):
-    
-    # Create the 1. figure with subplots for Steer
-    fig_lat_antiphase_compliance = make_subplots(rows=1, cols=2,
-                              subplot_titles=('Lateral_Anti-Phase Wheel Center Compliance [mm/N]. Rear Left', 'Lateral_Anti-Phase Wheel Center Compliance [N/mm]. Rear Right'))
-    
-    # Create the 2. figure with subplots for Steer
-    fig_lat_antiphase_steer = make_subplots(rows=1, cols=2,
-                              subplot_titles=('Lateral_Anti-Phase Steer [deg/N]. Rear Left', 'Lateral_Anti-Phase Steer [deg/N]. Rear Right'))
-    
-    # Create the 3. figure with subplots for Camber
-    fig_lat_antiphase_camber = make_subplots(rows=1, cols=2,
-                               subplot_titles=('Lateral_Anti-Phase Camber [deg/N]. Rear Left', 'Lateral_Anti-Phase Camber [deg/N]. Rear Right'))
-    
-    
-    
-
-    # Filter data for linear regression
-    lat_antiphase_offset_mask_li = (df_lat_antiphase_offset['lat_antiphase_tire_force_y_li'] >= -500) & (df_lat_antiphase_offset['lat_antiphase_tire_force_y_li'] <= 500)
-    lat_antiphase_offset_mask_re = (df_lat_antiphase_offset['lat_antiphase_tire_force_y_re'] >= -500) & (df_lat_antiphase_offset['lat_antiphase_tire_force_y_re'] <= 500)
-    
-    # Filter data only for wheel rate linear regression
-    # lat_antiphase_mask_li = (df_lat_antiphase['lat_antiphase_tire_force_y_li'] >= -25) & (df_lat_antiphase['lat_antiphase_tire_force_y_li'] <= 25)
-    # lat_antiphase_mask_re = (df_lat_antiphase['lat_antiphase_tire_force_y_re'] >= -25) & (df_lat_antiphase['lat_antiphase_tire_force_y_re'] <= 25)    
-    
-    
-    
-    # Linear regression for Left compliance
-    slope_lat_antiphase_compliance_li, intercept_lat_antiphase_compliance_li, _, _, _ = linregress(df_lat_antiphase_offset[lat_antiphase_offset_mask_li]['lat_antiphase_tire_force_y_li'], 
-                                                            df_lat_antiphase_offset[lat_antiphase_offset_mask_li]['lat_antiphase_wc_track_li'])
-    # Linear regression for Right compliance
-    slope_lat_antiphase_compliance_re, intercept_lat_antiphase_compliance_re, _, _, _ = linregress(df_lat_antiphase_offset[lat_antiphase_offset_mask_re]['lat_antiphase_tire_force_y_re'], 
-                                                            df_lat_antiphase_offset[lat_antiphase_offset_mask_re]['lat_antiphase_wc_track_re'])
-    
-    # Linear regression for Left Steer
-    slope_lat_antiphase_steer_li, intercept_lat_antiphase_steer_li, _, _, _ = linregress(df_lat_antiphase_offset[lat_antiphase_offset_mask_li]['lat_antiphase_tire_force_y_li'], 
-                                                            df_lat_antiphase_offset[lat_antiphase_offset_mask_li]['lat_antiphase_toe_li'])
-    # Linear regression for Right Steer
-    slope_lat_antiphase_steer_re, intercept_lat_antiphase_steer_re, _, _, _ = linregress(df_lat_antiphase_offset[lat_antiphase_offset_mask_re]['lat_antiphase_tire_force_y_re'], 
-                                                            df_lat_antiphase_offset[lat_antiphase_offset_mask_re]['lat_antiphase_toe_re'])
-    
-    # Linear regression for Left Camber
-    slope_lat_antiphase_camber_li, intercept_lat_antiphase_camber_li, _, _, _ = linregress(df_lat_antiphase_offset[lat_antiphase_offset_mask_li]['lat_antiphase_tire_force_y_li'], 
-                                                              df_lat_antiphase_offset[lat_antiphase_offset_mask_li]['lat_antiphase_camber_li'])
-    # Linear regression for Right Camber
-    slope_lat_antiphase_camber_re, intercept_lat_antiphase_camber_re, _, _, _ = linregress(df_lat_antiphase_offset[lat_antiphase_offset_mask_re]['lat_antiphase_tire_force_y_re'], 
-                                                              df_lat_antiphase_offset[lat_antiphase_offset_mask_re]['lat_antiphase_camber_re'])
-    
-    
-    # Left compliance plot
-    # 由于数据点太多，所以每隔10个显示一个点，所以进行提取
-    fig_lat_antiphase_compliance.add_trace(go.Scatter(x=df_lat_antiphase_offset['lat_antiphase_tire_force_y_li'][::10], 
-                                   y=df_lat_antiphase_offset['lat_antiphase_wc_track_li'][::10],
-                                   mode='lines+markers', name='Lateral_Anti-Phase @WC Comp. Left',
-                                   line=dict(
-                                        width=2,  # line width
-                                        color='rgba(255, 165, 0, 1)'  # line color
-                                        ),
-                                   marker=dict(
-                                        size=5,
-                                        color='white',
-                                        line=dict(
-                                        width=1,  # 设置外围线的宽度
-                                        color='rgba(0, 0, 0, 1)'  # 设置外围线的颜色
-                                        )
-                                   )    
-                                   ), 
-                        row=1, col=1) 
-    # Regression line for Left Steer
-    fig_lat_antiphase_compliance.add_trace(go.Scatter(x=np.linspace(-500, 500, 400), 
-                                   y=slope_lat_antiphase_compliance_li * np.linspace(-500, 500, 400) + intercept_lat_antiphase_compliance_li,
-                                   mode='lines', name=f"y={slope_lat_antiphase_compliance_li:.5f}x + {intercept_lat_antiphase_compliance_li:.5f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=1)
-    fig_lat_antiphase_compliance.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_lat_antiphase_compliance_li:.5f}x + {intercept_lat_antiphase_compliance_li:.5f}",
-            xref="x1", yref="y1",
-            x=0, y=slope_lat_antiphase_compliance_li * 0 + intercept_lat_antiphase_compliance_li+0.5,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
-
-    # Right compliance plot
-    # 由于数据点太多，所以每隔10个显示一个点，所以进行提取
-    fig_lat_antiphase_compliance.add_trace(go.Scatter(x=df_lat_antiphase_offset['lat_antiphase_tire_force_y_re'][::10], 
-                                   y=df_lat_antiphase_offset['lat_antiphase_wc_track_re'][::10],
-                                   mode='lines+markers', name='Lateral_Anti-Phase @WC Comp. Right',
-                                   line=dict(
-                                        width=2,  # line width
-                                        color='rgba(255, 165, 0, 1)'  # line color
-                                        ),
-                                   marker=dict(
-                                        size=5,
-                                        color='white',
-                                        line=dict(
-                                        width=1,  # 设置外围线的宽度
-                                        color='rgba(0, 0, 0, 1)'  # 设置外围线的颜色
-                                        )
-                                   )    
-                                   ), 
-                        row=1, col=2) 
-    # Regression line for Right Steer
-    fig_lat_antiphase_compliance.add_trace(go.Scatter(x=np.linspace(-500, 500, 400), 
-                                   y=slope_lat_antiphase_compliance_re * np.linspace(-500, 500, 400) + intercept_lat_antiphase_compliance_re,
-                                   mode='lines', name=f"y={slope_lat_antiphase_compliance_re:.5f}x + {intercept_lat_antiphase_compliance_re:.5f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=2)
-    fig_lat_antiphase_compliance.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_lat_antiphase_compliance_re:.5f}x + {intercept_lat_antiphase_compliance_re:.5f}",
-            xref="x2", yref="y2",
-            x=0, y=slope_lat_antiphase_compliance_re * 0 + intercept_lat_antiphase_compliance_re+0.5,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )    
-    
-    # Left Steer plot
-    # 由于数据点太多，所以每隔10个显示一个点，所以进行提取
-    
-    fig_lat_antiphase_steer.add_trace(go.Scatter(x=df_lat_antiphase_offset['lat_antiphase_tire_force_y_li'][::10], 
-                                   y=df_lat_antiphase_offset['lat_antiphase_toe_li'][::10],
-                                   mode='lines+markers', name='Lateral_Anti-Phase Steer Left', 
-                                   line=dict(
-                                        width=2,  # line width
-                                        color='rgba(255, 165, 0, 1)'  # line color
-                                        ),
-                                   marker=dict(
-                                        size=5,
-                                        color='white',
-                                        line=dict(
-                                        width=1,  # 设置外围线的宽度
-                                        color='rgba(0, 0, 0, 1)'  # 设置外围线的颜色
-                                        )
-                                   )    
-                                   ), 
-                        row=1, col=1)
-    # Regression line for Left Steer
-    fig_lat_antiphase_steer.add_trace(go.Scatter(x=np.linspace(-500, 500, 400), 
-                                   y=slope_lat_antiphase_steer_li * np.linspace(-500, 500, 400) + intercept_lat_antiphase_steer_li,
-                                   mode='lines', name=f"y={slope_lat_antiphase_steer_li:.5f}x + {intercept_lat_antiphase_steer_li:.5f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=1)
-    fig_lat_antiphase_steer.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_lat_antiphase_steer_li:.5f}x + {intercept_lat_antiphase_steer_li:.5f}",
-            xref="x1", yref="y1",
-            x=0, y=slope_lat_antiphase_steer_li * 0 + intercept_lat_antiphase_steer_li+0.1,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
-
-    # Right Steer plot
-    # 由于数据点太多，所以每隔10个显示一个点，所以进行提取
-    fig_lat_antiphase_steer.add_trace(go.Scatter(x=df_lat_antiphase_offset['lat_antiphase_tire_force_y_re'][::10], 
-                                   y=df_lat_antiphase_offset['lat_antiphase_toe_re'][::10],
-                                   mode='lines+markers', name='Lateral_Anti-Phase Steer Right', 
-                                   line=dict(
-                                        width=2,  # line width
-                                        color='rgba(255, 165, 0, 1)'  # line color
-                                        ),
-                                   marker=dict(
-                                        size=5,
-                                        color='white',
-                                        line=dict(
-                                        width=1,  # 设置外围线的宽度
-                                        color='rgba(0, 0, 0, 1)'  # 设置外围线的颜色
-                                        )
-                                   )    
-                                   ), 
-                        row=1, col=2)
-    # Regression line for Right Steer
-    fig_lat_antiphase_steer.add_trace(go.Scatter(x=np.linspace(-500, 500, 400), 
-                                   y=slope_lat_antiphase_steer_re * np.linspace(-500, 500, 400) + intercept_lat_antiphase_steer_re,
-                                   mode='lines', name=f"y={slope_lat_antiphase_steer_re:.5f}x + {intercept_lat_antiphase_steer_re:.5f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=2)
-    fig_lat_antiphase_steer.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_lat_antiphase_steer_re:.5f}x + {intercept_lat_antiphase_steer_re:.5f}",
-            xref="x2", yref="y2",
-            x=0, y=slope_lat_antiphase_steer_re * 0 + intercept_lat_antiphase_steer_re+0.1,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
-    
-    # Left Camber plot
-    # 由于数据点太多，所以每隔10个显示一个点，所以进行提取
-    fig_lat_antiphase_camber.add_trace(go.Scatter(x=df_lat_antiphase_offset['lat_antiphase_tire_force_y_li'][::10], 
-                                   y=df_lat_antiphase_offset['lat_antiphase_camber_li'][::10],
-                                   mode='lines+markers', name='Lateral_Anti-Phase Camber Left',
-                                   line=dict(
-                                        width=2,  # line width
-                                        color='rgba(255, 165, 0, 1)'  # line color
-                                        ),
-                                   marker=dict(
-                                        size=5,
-                                        color='white',
-                                        line=dict(
-                                        width=1,  # 设置外围线的宽度
-                                        color='rgba(0, 0, 0, 1)'  # 设置外围线的颜色
-                                        )
-                                   )    
-                                   ), 
-                        row=1, col=1)
-    # Regression line for Left Camber
-    fig_lat_antiphase_camber.add_trace(go.Scatter(x=np.linspace(-500, 500, 400), 
-                                   y=slope_lat_antiphase_camber_li * np.linspace(-500, 500, 400) + intercept_lat_antiphase_camber_li,
-                                   mode='lines', name=f"y={slope_lat_antiphase_camber_li:.5f}x + {intercept_lat_antiphase_camber_li:.5f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=1)
-    fig_lat_antiphase_camber.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_lat_antiphase_camber_li:.5f}x + {intercept_lat_antiphase_camber_li:.5f}",
-            xref="x1", yref="y1",
-            x=0, y=slope_lat_antiphase_camber_li * 0 + intercept_lat_antiphase_camber_li+0.5,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
-
-    # Right Camber plot
-    # 由于数据点太多，所以每隔10个显示一个点，所以进行提取
-    fig_lat_antiphase_camber.add_trace(go.Scatter(x=df_lat_antiphase_offset['lat_antiphase_tire_force_y_re'][::10], 
-                                   y=df_lat_antiphase_offset['lat_antiphase_camber_re'][::10],
-                                   mode='lines+markers', name='Lateral_Anti-Phase Camber Right',
-                                   line=dict(
-                                        width=2,  # 设置线的宽度
-                                        color='rgba(255, 165, 0, 1)'  # 设置线的颜色
-                                        ),
-                                   marker=dict(
-                                        size=5,
-                                        color='white',
-                                        line=dict(
-                                        width=1,  # 设置外围线的宽度
-                                        color='rgba(0, 0, 0, 1)'  # 设置外围线的颜色
-                                        )
-                                   )    
-                                   ), 
-                        row=1, col=2)
-    # Regression line for Right Camber
-    fig_lat_antiphase_camber.add_trace(go.Scatter(x=np.linspace(-500, 500, 400), 
-                                   y=slope_lat_antiphase_camber_re * np.linspace(-500, 500, 400) + intercept_lat_antiphase_camber_re,
-                                   mode='lines', name=f"y={slope_lat_antiphase_camber_re:.5f}x + {intercept_lat_antiphase_camber_re:.5f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=2)
-    fig_lat_antiphase_camber.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_lat_antiphase_camber_re:.5f}x + {intercept_lat_antiphase_camber_re:.5f}",
-            xref="x2", yref="y2",
-            x=0, y=slope_lat_antiphase_camber_re * 0 + intercept_lat_antiphase_camber_re+0.5,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
-
-    # Updating layout for titles, and legend for lat_antiphase Swheel rate plot
-    fig_lat_antiphase_compliance.update_layout(title_text="Compliance Offset Plots", width=2400, height=1500,
-                            xaxis_title="Load outward <<        RL lateral force [N]        >> Load inward",
-                            yaxis_title="Outward <<        RL lateral displacement @WC [mm]        >> Inward",
-                            xaxis2_title="Load outward <<        RL lateral force [N]        >> Load inward",
-                            yaxis2_title="Outward <<        RL lateral displacement @WC [mm]        >> Inward",
-                            showlegend=True)    
-    
-    
-    # Updating layout for titles, and legend for lat_antiphase Steer plot
-    fig_lat_antiphase_steer.update_layout(title_text="Steer Offset Plots", width=2400, height=1500,
-                            xaxis_title="Load outward <<        RL lateral force [N]        >> Load inward",
-                            yaxis_title="toe out <<        RL toe angle variation [deg]        >> toe in",
-                            xaxis2_title="Load outward <<        RL lateral force [N]        >> Load inward",
-                            yaxis2_title="toe out <<        RR toe angle variation [deg]        >> toe in",
-                            showlegend=True)
-    
-    # Updating layout for titles, and legend for lat_antiphase Camber plot
-    fig_lat_antiphase_camber.update_layout(title_text="Camber Offset Plots", width=2400, height=1500,
-                             xaxis_title="Load outward <<        RL lateral force [N]        >> Load inward",
-                             yaxis_title="top in <<        RL camber angle variation [deg]        >> top out",
-                             xaxis2_title="Load outward <<        RL lateral force [N]        >> Load inward",
-                             yaxis2_title="top in <<        RR camber angle variation [deg]        >> top out",
-                             showlegend=True)
-    
-    
-    
-    
-    
-    
-    # Update legend names for Steer plot
-    for trace in fig_lat_antiphase_steer.data:
-        if trace.name == 'Left Steer':
-            trace.name = 'Left'
-        elif trace.name == 'Right Steer':
-            trace.name = 'Right'
-
-    # Update legend names for Camber plot
-    for trace in fig_lat_antiphase_camber.data:
-        if trace.name == 'Left Camber':
-            trace.name = 'Left'
-        elif trace.name == 'Right Camber':
-            trace.name = 'Right'
-    
-    return (
-        fig_lat_antiphase_compliance, fig_lat_antiphase_steer, fig_lat_antiphase_camber, 
-        slope_lat_antiphase_compliance_li, slope_lat_antiphase_compliance_re, 
-        slope_lat_antiphase_steer_li, slope_lat_antiphase_steer_re, 
-        slope_lat_antiphase_camber_li, slope_lat_antiphase_camber_re, 
-    )
-    
-    
-#    return fig_lat_antiphase_compliance, fig_lat_antiphase_steer, fig_lat_antiphase_camber, fig_lat_antiphase_wheel_base_change, fig_lat_antiphase_track_change, slope_li, slope_re, slope_camber_li, slope_camber_re
 
 if __name__ == "__main__":
     main()
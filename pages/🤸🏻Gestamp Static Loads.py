@@ -1,12 +1,15 @@
 import streamlit as st
 import pandas as pd
-import re
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from scipy.stats import linregress
-import numpy as np
 from PIL import Image
 
+from knc import compare, corridors, kpi, plots, timing
+from knc.cache import cached_figures, figure_key
+from knc.export import export_data, export_file, export_formats, export_raw_frame
+from knc.extract import extract_analysis_tests
+from knc.lazy import LazyChannelFrame
+from knc.results import results_lookup, results_store
+from knc.worker import session_worker
+
 st.set_page_config(page_title="Bump", page_icon="📈", layout="wide")
 
 bump_image=Image.open('logo_bump_01.JPG')
@@ -14,8 +17,25 @@ st.image(bump_image, caption='Version: Beta V0.2', use_column_width='always')
 
 #程序中，所有的变量都以bump_开头用以区分
 
+# Test definition (channels, transforms, fit window, KPIs) from the knc.kpi registry
+bump_test = kpi.KPI_TESTS['bump']
+bump_columns = bump_test['columns']
+
 def main():
-    st.title("K&C Test - Body Bounce")
+    # Optional stage timings, shown in the sidebar and appended to the JSON log. The run
+    # is also closed when the page stops early (st.stop, a rerun, an error).
+    bump_timing = st.sidebar.checkbox('Pipeline Timing', key='bump_timing')
+    with timing.page_run('bump', bump_timing):
+        bump_uploaded_file, bump_worker = bump_page()
+        if bump_timing:
+            # the parse is timed on the worker (knc.worker), its stages come first
+            bump_timings = (bump_worker.take_timings() if bump_worker else []) + timing.finish_run(file=bump_uploaded_file.name if bump_uploaded_file else None)
+            st.sidebar.markdown('---')
+            st.sidebar.title('Pipeline Timing:')
+            st.sidebar.table(pd.DataFrame(bump_timings, columns=['stage', 'calls', 'seconds', 'peak_mb']).round(4).astype(str))
+
+def bump_page():
+    st.title(f"K&C Test - {bump_test['title']}")
     # Erklärung
     bump_description_col1, bump_description_col2 = st.columns([3, 1])
         
@@ -31,111 +51,131 @@ def main():
         st.image(bump_image, caption='Adams/Car')
         
 
-    bump_uploaded_file = st.file_uploader("Choose a .res file", type=[".res"])
-
-    if bump_uploaded_file:
-        bump_content = bump_uploaded_file.read().decode('utf-8')
-        bump_blocks = bump_extract_blocks(bump_content)
-        
-        if bump_blocks:
-            bump_process_blocks(bump_blocks)
-        else:
-            st.write("No valid data blocks found in the file.")
-
-def bump_extract_blocks(bump_content):
-    bump_pattern = r'<Step type="quasiStatic">([\s\S]*?)</Step>'
-    bump_blocks = re.findall(bump_pattern, bump_content)
-    return bump_blocks
-
-def bump_process_blocks(bump_blocks):
-    # Extract values using the provided method
-    bump_wheel_travel_li = [float(bump_block.split()[918]) for bump_block in bump_blocks]
-    bump_wheel_travel_re = [float(bump_block.split()[919]) for bump_block in bump_blocks]
-    #
-    bump_toe_li = [float(bump_block.split()[1025])*180/3.1415926 for bump_block in bump_blocks]
-    bump_toe_re = [float(bump_block.split()[1026])*180/3.1415926 for bump_block in bump_blocks]
-    #
-    bump_camber_li = [float(bump_block.split()[1027])*180/3.1415926 for bump_block in bump_blocks]
-    bump_camber_re = [float(bump_block.split()[1028])*180/3.1415926 for bump_block in bump_blocks]
-    #
-    bump_vertical_force_li = [float(bump_block.split()[934]) for bump_block in bump_blocks]
-    bump_vertical_force_re = [float(bump_block.split()[935]) for bump_block in bump_blocks]
-    # 
-    bump_wheel_base_li = [float(bump_block.split()[922]) for bump_block in bump_blocks]
-    bump_wheel_base_re = [float(bump_block.split()[923]) for bump_block in bump_blocks]
-    # 
-    bump_tire_cp_y_li = [float(bump_block.split()[1057]) for bump_block in bump_blocks]
-    bump_tire_cp_y_re = [float(bump_block.split()[1062]) for bump_block in bump_blocks]
-
-    # Create DataFrame
-    df_bump = pd.DataFrame({
-        'bump_wheel_travel_li': bump_wheel_travel_li,
-        'bump_wheel_travel_re': bump_wheel_travel_re,
-        'bump_toe_li': bump_toe_li,
-        'bump_toe_re': bump_toe_re,
-        'bump_camber_li': bump_camber_li,
-        'bump_camber_re': bump_camber_re,
-        'bump_vertical_force_li': bump_vertical_force_li,
-        'bump_vertical_force_re': bump_vertical_force_re,
-        'bump_wheel_base_li': bump_wheel_base_li,
-        'bump_wheel_base_re': bump_wheel_base_re,
-        'bump_tire_cp_y_li': bump_tire_cp_y_li,
-        'bump_tire_cp_y_re': bump_tire_cp_y_re
-    })
-
-    # Find the row where bump_wheel_travel_li is closest to 0
-    offset_row = df_bump.iloc[(df_bump['bump_wheel_travel_li']).abs().idxmin()]
-    
-    # Subtract the values of this row from the entire DataFrame to create df_bump_offset
-    df_bump_offset = df_bump.subtract(offset_row)
-
-    st.write(f"Number of available data blocks = {len(bump_blocks)}")
+    bump_uploaded_files = st.file_uploader("Choose .res files", type=[".res"], accept_multiple_files=True)
+    bump_uploaded_file = None
+    bump_worker = None
+
+    if bump_uploaded_files:
+        # Every registered test is extracted in one pass per file and cached. Files not in the
+        # cache are parsed by a background worker (knc.worker), several in parallel, while the
+        # bar shows the bytes and steps done. A parse can be cancelled and started again.
+        bump_worker = session_worker(st.session_state, 'bump_parse_worker', bump_uploaded_files)
+        bump_progress = st.progress(0.0)
+        bump_cancel = st.empty()
+        if bump_worker.running() and bump_cancel.button("Cancel Parsing", key='bump_cancel_parsing'):
+            bump_worker.cancel()
+        # Errors and the variant comparison need every file, they are shown up here once
+        # all files are parsed
+        bump_status = st.container()
+
+        bump_index = st.selectbox("Select file:", range(len(bump_uploaded_files)), format_func=lambda i: bump_uploaded_files[i].name)
+        bump_uploaded_file = bump_uploaded_files[bump_index]
+
+        # The selected file is shown as soon as it is parsed, the others are parsed meanwhile
+        while bump_worker.running() and not bump_worker.parsed(bump_index):
+            bump_progress.progress(*bump_worker.progress())
+            bump_worker.wait()
+        if bump_worker.parsed(bump_index):
+            bump_matrix = bump_worker.test_matrix(bump_index, 'bump')
+
+            # Tests of the analyses of a full K&C run, a file without a bump analysis gets a warning
+            bump_found = extract_analysis_tests(bump_worker.matrices[bump_index])
+            if len(bump_matrix):
+                bump_process_blocks(bump_matrix, bump_worker.hashes[bump_index])
+            elif bump_found is not None:
+                st.warning(f"No analysis in this file is named as a {bump_test['title']} test "
+                           f"(analyses found: {', '.join(kpi.KPI_TESTS[bump_found_test]['title'] for bump_found_test in bump_found) or 'none named as a K&C test'}).")
+            else:
+                st.write("No valid data blocks found in the file.")
+
+        while bump_worker.running():
+            bump_progress.progress(*bump_worker.progress())
+            bump_worker.wait()
+        bump_progress.progress(*bump_worker.progress())
+        bump_cancel.empty()
+        with bump_status:
+            # A failed or cancelled parse is reported and can be started again
+            if bump_worker.error is not None or bump_worker.cancelled():
+                if bump_worker.error is not None:
+                    st.error(f"Parsing failed: {type(bump_worker.error).__name__}: {bump_worker.error}")
+                else:
+                    st.write("Parsing cancelled.")
+                if st.button("Parse Again", key='bump_parse_again'):
+                    session_worker(st.session_state, 'bump_parse_worker', bump_uploaded_files, restart=True)
+                    st.rerun()
+                st.stop()
+            # the test's steps of every file are cut out once and kept by the worker
+            bump_matrices = [bump_worker.test_matrix(bump_index, 'bump') for bump_index in range(len(bump_uploaded_files))]
+
+            # Overlay all uploaded variants, deltas against a chosen baseline
+            if len(bump_uploaded_files) > 1 and st.checkbox("Compare Variants", key='bump_compare'):
+                bump_compare_variants(bump_uploaded_files, bump_matrices)
+
+    return bump_uploaded_file, bump_worker
+
+def bump_compare_variants(bump_uploaded_files, bump_matrices):
+    bump_names = [bump_file.name for bump_file in bump_uploaded_files]
+    bump_baseline = st.selectbox("Baseline:", range(len(bump_names)), format_func=lambda i: bump_names[i], key='bump_baseline')
+
+    # Every run resampled onto a common grid, KPI and curve deltas as array operations (knc.compare)
+    bump_comparison = compare.compare_runs('bump', bump_matrices, bump_names, bump_baseline)
+    if bump_comparison['skipped']:
+        st.write(f"No valid data blocks found in: {', '.join(bump_comparison['skipped'])}")
+    if len(bump_comparison['names']) < 2:
+        return None
+
+    st.write('### KPI Comparison')
+    st.table(bump_comparison['kpis'].round(4).astype(str))
+    st.write('### KPI Delta to Baseline')
+    st.table(bump_comparison['kpi_deltas'].round(4).astype(str))
+
+    # One figure per KPI, left and right side, all runs in one trace per plot
+    bump_kpis = kpi.test_kpis('bump')
+    for bump_kpi_li, bump_kpi_re in zip(bump_kpis[::2], bump_kpis[1::2]):
+        bump_fig_compare = plots.compare_figure(bump_comparison, [bump_kpi_li['parameter'], bump_kpi_re['parameter']], f"{bump_kpi_li['parameter'][:-3]}: [{bump_kpi_li['unit']}]")
+        st.plotly_chart(bump_fig_compare, theme=None)
+    st.markdown('---')
+
+    return None
+
+def bump_process_blocks(bump_matrix, bump_hash):
+    # Columns are only computed when they are displayed or plotted
+    df_bump = LazyChannelFrame(bump_matrix, bump_columns)
+
+    # Subtract the row where bump_wheel_travel_li is closest to 0 to create df_bump_offset
+    df_bump_offset = df_bump.offset(bump_test['offset_column'])
+
+    st.write(f"Number of available data blocks = {len(bump_matrix)}")
     
     # Display columns in multiselect
-    selected_columns = st.multiselect("Select columns:", df_bump_offset.columns.tolist(), default=df_bump_offset.columns.tolist())
+    selected_columns = st.multiselect("Select columns:", df_bump_offset.columns, default=df_bump_offset.columns)
 
     # Display selected columns from df_bump_offset
     if selected_columns:
         st.dataframe(df_bump_offset[selected_columns], width= 2400, height= 300)
     
     # Plotting
+    # Fits, KPI table and figures of the plotted data are kept in the session (knc.results),
+    # reruns from other widgets and the exports reuse them until other data is selected
+    bump_figure_key = figure_key(bump_hash, 'bump', bump_test['window'], plots.figure_style())
     if st.button("Plot Graphs (Bump Test)"):
+        # All KPIs of the test in one pass of the shared engine
+        bump_fits = kpi.test_fits('bump', df_bump_offset, df_bump)
+        timing.begin('figure build')
+        # Figures are memoized on the file, the test, the fit window and the plot style (knc.cache)
+        bump_figure_list = cached_figures(bump_figure_key, lambda: plots.kpi_figures('bump', df_bump_offset, df_bump, bump_fits))
+        timing.end()
+        results_store(st.session_state, 'bump_session_results', bump_figure_key, {
+            'fits': bump_fits,
+            'results': pd.DataFrame(kpi.test_results('bump', bump_fits)),
+            'figures': bump_figure_list,
+        })
+    bump_session_results = results_lookup(st.session_state, 'bump_session_results', bump_figure_key)
+    if bump_session_results is not None:
         
         #定义要在按下后输出的内容
-        (
-            fig_bump_wheel_rate, fig_bump_steer, fig_bump_camber, fig_bump_wheel_base_change, fig_bump_track_change, 
-            slope_bump_wheel_rate_li, slope_bump_wheel_rate_re, 
-            slope_bump_steer_li, slope_bump_steer_re, 
-            slope_bump_camber_li, slope_bump_camber_re, 
-            slope_bump_wheel_base_change_li, slope_bump_wheel_base_change_re,
-            slope_bump_track_change_li, slope_bump_track_change_re
-        ) = plot_graphs(df_bump_offset, df_bump)
-        
-        # fig_steer, fig_camber, slope_li, slope_re, slope_camber_li, slope_camber_re = plot_graphs(df_bump_offset)
-        
-        fig_bump_wheel_rate.update_layout(title_text="Bump Wheel Rate: [N/mm]", title_font=dict(size=24, family="Arial Bold"), width=1600, height=800)
-        fig_bump_steer.update_layout(title_text="Bump Steer: [deg/mm]", title_font=dict(size=24, family="Arial Bold"), width=1600, height=800)
-        fig_bump_camber.update_layout(title_text="Bump Camber: [deg/mm]", title_font=dict(size=24, family="Arial Bold"), width=1600, height=800)
-        fig_bump_wheel_base_change.update_layout(title_text="Wheel Recession: [mm/mm]", title_font=dict(size=24, family="Arial Bold"), width=1600, height=800)
-        fig_bump_track_change.update_layout(title_text="Track Change: [mm/mm]", title_font=dict(size=24, family="Arial Bold"), width=1600, height=800)
-        
-        # Create DataFrame for results
-        bump_results = pd.DataFrame({
-            'Parameter': [
-                'bump_Wheel_Rate_li', 'bump_Wheel_Rate_re',
-                'bump_Toe_Change_li', 'bump_Toe_Change_re', 
-                'bump_Camber_Change_li', 'bump_Camber_Change_re',
-                'bump_Wheel_Base_change_li', 'bump_Wheel_Base_Change_re',
-                'bump_Track_Change_li', 'bump_Track_Change_re'
-                ],
-            'Slope': [
-                slope_bump_wheel_rate_li, slope_bump_wheel_rate_re,
-                slope_bump_steer_li, slope_bump_steer_re, 
-                slope_bump_camber_li, slope_bump_camber_re, 
-                slope_bump_wheel_base_change_li, slope_bump_wheel_base_change_re,
-                slope_bump_track_change_li, slope_bump_track_change_re
-                ]
-        })
+        # KPI table of the session results
+        bump_results = bump_session_results['results']
 
         # Display the DataFrame in Streamlit
         #st.table(bump_results.T.astype(str))
@@ -145,545 +185,38 @@ def bump_process_blocks(bump_blocks):
         st.sidebar.title('Key Results Overview:')
         st.sidebar.markdown('---')
         st.sidebar.table(bump_results.iloc[::2].round(4).astype(str))
-        if st.sidebar.button('Save CSV'):
-            bump_results.iloc[::2].to_csv('bump_results_odd_rows.csv', index=False)
-            st.sidebar.write('File saved as bump_results_odd_rows.csv')
-        
-        # Update layout for fig_bump_wheel_rate
-        fig_bump_wheel_rate.update_layout(
-            xaxis_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis_title_font=dict(size=18, family='Arial Bold'),
-            xaxis_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis_tickfont=dict(size=18, family='Arial Bold'),
-            legend_font=dict(size=18, family='Arial Bold')
-        )
-        # Do the same for the second xaxis and yaxis (for the right subplot)
-        fig_bump_wheel_rate.update_layout(
-            xaxis2_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis2_title_font=dict(size=18, family='Arial Bold'),
-            xaxis2_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis2_tickfont=dict(size=18, family='Arial Bold')
-        )
-        
-        # Update layout for fig_bump_steer
-        fig_bump_steer.update_layout(
-            xaxis_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis_title_font=dict(size=18, family='Arial Bold'),
-            xaxis_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis_tickfont=dict(size=18, family='Arial Bold'),
-            legend_font=dict(size=18, family='Arial Bold')
-        )
-        # Do the same for the second xaxis and yaxis (for the right subplot)
-        fig_bump_steer.update_layout(
-            xaxis2_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis2_title_font=dict(size=18, family='Arial Bold'),
-            xaxis2_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis2_tickfont=dict(size=18, family='Arial Bold')
-        )
-
-        # Update layout for fig_bump_camber
-        fig_bump_camber.update_layout(
-            xaxis_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis_title_font=dict(size=18, family='Arial Bold'),
-            xaxis_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis_tickfont=dict(size=18, family='Arial Bold'),
-            legend_font=dict(size=18, family='Arial Bold')
-        )
-        # Do the same for the second xaxis and yaxis (for the right subplot)
-        fig_bump_camber.update_layout(
-            xaxis2_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis2_title_font=dict(size=18, family='Arial Bold'),
-            xaxis2_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis2_tickfont=dict(size=18, family='Arial Bold')
-        )
-        
-         # Update layout for fig_bump_wheel_base_change
-        fig_bump_wheel_base_change.update_layout(
-            xaxis_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis_title_font=dict(size=18, family='Arial Bold'),
-            xaxis_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis_tickfont=dict(size=18, family='Arial Bold'),
-            legend_font=dict(size=18, family='Arial Bold')
-        )
-        # Do the same for the second xaxis and yaxis (for the right subplot)
-        fig_bump_wheel_base_change.update_layout(
-            xaxis2_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis2_title_font=dict(size=18, family='Arial Bold'),
-            xaxis2_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis2_tickfont=dict(size=18, family='Arial Bold')
-        )
-        
-         # Update layout for fig_bump_track_change
-        fig_bump_track_change.update_layout(
-            xaxis_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis_title_font=dict(size=18, family='Arial Bold'),
-            xaxis_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis_tickfont=dict(size=18, family='Arial Bold'),
-            legend_font=dict(size=18, family='Arial Bold')
-        )
-        # Do the same for the second xaxis and yaxis (for the right subplot)
-        fig_bump_track_change.update_layout(
-            xaxis2_title_font=dict(size=18, family='Arial Bold'), 
-            yaxis2_title_font=dict(size=18, family='Arial Bold'),
-            xaxis2_tickfont=dict(size=18, family='Arial Bold'),
-            yaxis2_tickfont=dict(size=18, family='Arial Bold')
-        )
-        
-        # Update background color for fig_bump_wheel_rate
-        fig_bump_wheel_rate.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            xaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            xaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray')
-        )
-
-        # Update background color for fig_bump_steer
-        fig_bump_steer.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            xaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            xaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray')
-        )
-
-        # Update background color for fig_bump_camber
-        fig_bump_camber.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            xaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            xaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray')
-        )
-        
-        # Update background color for fig_wheel_base_change
-        fig_bump_wheel_base_change.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            xaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            xaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray')
-        )
-        
-        # Update background color for fig_bump_track_change
-        fig_bump_track_change.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            xaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            xaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray'),
-            yaxis2=dict(gridcolor='lightgray',zerolinecolor='lightgray')
-        )
-        st.markdown('---')
-        st.plotly_chart(fig_bump_wheel_rate)
-        
-        # Display the regression line equations
-        bump_wheel_rate_col1, bump_wheel_rate_col2, bump_wheel_rate_col3 = st.columns([1, 1, 1])
-        
-        with bump_wheel_rate_col1:
-            st.markdown("**Curve Fitting Left  (-10mm <-> +10mm ) [N/mm]:**")
-            st.text_input(label="", value=f"{slope_bump_wheel_rate_li:.4f}", key="result_display_bump_wheel_rate_li") 
-                   
-        with bump_wheel_rate_col2:
-            st.markdown("**Curve Fitting Right  (-10mm <-> +10mm ) [N/mm]:**")
-            st.text_input(label="", value=f"{slope_bump_wheel_rate_re:.4f}", key="result_display_bump_wheel_rate_re")
-            
-        
-        
-        st.markdown('---')
-        st.plotly_chart(fig_bump_steer)
-        
-        # Display the regression line equations
-        bump_steer_col1, bump_steer_col2, bump_steer_col3 = st.columns([1, 1, 1])
-        
-        with bump_steer_col1:
-            st.markdown("**Curve Fitting Left  (-10mm <-> +10mm ) [deg/m]:**")
-            st.text_input(label="", value=f"{slope_bump_steer_li * 1000:.4f}", key="result_display_bump_steer_li") 
-                   
-        with bump_steer_col2:
-            st.markdown("**Curve Fitting Right  (-10mm <-> +10mm ) [deg/m]:**")
-            st.text_input(label="", value=f"{slope_bump_steer_re * 1000:.4f}", key="result_display_bump_steer_re")
-            
-        
-        
-        st.markdown('---')
-        st.plotly_chart(fig_bump_camber)
-        # Display the regression line equations
-        bump_camber_col1, bump_camber_col2, bump_camber_col3 = st.columns([1, 1, 1])
-        
-        with bump_camber_col1:
-            st.markdown("**Curve Fitting Left  (-10mm <-> +10mm ) [deg/m]:**")
-            st.text_input(label="", value=f"{slope_bump_camber_li * 1000:.4f}", key="result_display_bump_camber_li") 
-                   
-        with bump_camber_col2:
-            st.markdown("**Curve Fitting Right  (-10mm <-> +10mm ) [deg/m]:**")
-            st.text_input(label="", value=f"{slope_bump_camber_re * 1000:.4f}", key="result_display_bump_camber_re")
-            
-            
-        
-        st.markdown('---')
-        st.plotly_chart(fig_bump_wheel_base_change)
-        # Display the regression line equations
-        bump_wheel_base_change_col1, bump_wheel_base_change_col2, bump_wheel_base_change_col3 = st.columns([1, 1, 1])
-        
-        with bump_wheel_base_change_col1:
-            st.markdown("**Curve Fitting Left  (-10mm <-> +10mm ) [mm/m]:**")
-            st.text_input(label="", value=f"{slope_bump_wheel_base_change_li * 1000:.4f}", key="result_display_bump_wheel_base_change_li") 
-                   
-        with bump_wheel_base_change_col2:
-            st.markdown("**Curve Fitting Right  (-10mm <-> +10mm ) [mm/m]:**")
-            st.text_input(label="", value=f"{slope_bump_wheel_base_change_re * 1000:.4f}", key="result_display_bump_wheel_base_change_re")
-            
-            
-        
-        st.markdown('---')
-        st.plotly_chart(fig_bump_track_change)
-        # Display the regression line equations
-        bump_track_change_col1, bump_track_change_col2, bump_track_change_col3 = st.columns([1, 1, 1])
-        
-        with bump_track_change_col1:
-            st.markdown("**Curve Fitting Left  (-10mm <-> +10mm ) [mm/m]:**")
-            st.text_input(label="", value=f"{slope_bump_track_change_li * 1000:.4f}", key="result_display_bump_wtrack_change_li") 
-                   
-        with bump_track_change_col2:
-            st.markdown("**Curve Fitting Right  (-10mm <-> +10mm ) [mm/m]:**")
-            st.text_input(label="", value=f"{slope_bump_track_change_re * 1000:.4f}", key="result_display_bump_track_change_re")
-            
-            
+        # Downloads are built from the cached arrays when clicked, nothing is written on the server (knc.export)
+        # Excel is not offered for channel frames longer than a worksheet
+        bump_export_format = st.sidebar.selectbox('Download format:', export_formats(len(bump_matrix)), key='bump_export_format')
+        bump_downloads = {
+            'KPI Results': ('bump_results', lambda: bump_results),
+            'Offset Channels': ('bump_channels_offset', df_bump_offset.to_frame),
+            'Raw Channel Matrix': ('bump_channels_raw', lambda: export_raw_frame(bump_matrix, bump_columns)),
+        }
+        for bump_download, (bump_download_name, bump_download_frame) in bump_downloads.items():
+            bump_file_name, bump_mime = export_file(bump_download_name, bump_export_format)
+            st.sidebar.download_button(f'Download {bump_download}', export_data(bump_download_frame, bump_export_format),
+                                       file_name=bump_file_name, mime=bump_mime, on_click='ignore', key=f'bump_download_{bump_download_name}')
+        
+        # Charts are rendered until the last KPI section, the page may still wait for other
+        # files after it
+        timing.begin('render')
+        # One section per KPI: its figure and the fitted slopes of both sides, in the units
+        # targets are written in (knc.corridors)
+        bump_units = corridors.corridor_units()
+        bump_kpis = kpi.test_kpis('bump')
+        for bump_kpi_sides, bump_fig in zip(zip(bump_kpis[::2], bump_kpis[1::2]), bump_session_results['figures']):
+            st.markdown('---')
+            st.plotly_chart(bump_fig, theme=None)
+
+            # Display the regression line equations
+            for bump_column, bump_kpi in zip(st.columns([1, 1, 1]), bump_kpi_sides):
+                bump_unit, bump_factor = bump_units[bump_kpi['parameter']]
+                with bump_column:
+                    st.markdown(f"**Curve Fitting {kpi.SIDE_NAMES[bump_kpi['side']]}  ({kpi.window_label('bump')}) [{bump_unit}]:**")
+                    st.text_input(label="", value=f"{bump_session_results['fits'][bump_kpi['parameter']][0] * bump_factor:.4f}", key=f"result_display_{bump_kpi['parameter']}")
+        timing.end()
 
 
-def plot_graphs(df_bump_offset, df_bump):
-    
-    # Create the 1. figure with subplots for Steer
-    fig_bump_wheel_rate = make_subplots(rows=1, cols=2,
-                              subplot_titles=('Bump Wheel Rate [N/mm]. Rear Left', 'Bump Wheel Rate [N/mm]. Rear Right'))
-    
-    # Create the 2. figure with subplots for Steer
-    fig_bump_steer = make_subplots(rows=1, cols=2,
-                              subplot_titles=('Bump Steer [deg/mm]. Rear Left', 'Bump Steer [deg/mm]. Rear Right'))
-    
-    # Create the 3. figure with subplots for Camber
-    fig_bump_camber = make_subplots(rows=1, cols=2,
-                               subplot_titles=('Bump Camber [deg/mm]. Rear Left', 'Bump Camber [deg/mm]. Rear Right'))
-    
-    # Create the 4. figure with subplots for Steer
-    fig_bump_wheel_base_change = make_subplots(rows=1, cols=2,
-                              subplot_titles=('Wheel Center X Displacement [mm/mm]. Rear Left', 'Wheel Center X Displacement [mm/mm]. Rear Right'))
-    
-    # Create the 5. figure with subplots for Steer
-    fig_bump_track_change = make_subplots(rows=1, cols=2,
-                              subplot_titles=('Contact Patch Y Displacement [mm/mm]. Rear Left', 'Contact Patch Y Displacement [mm/mm]. Rear Right'))
-    
-    
-    
-
-    # Filter data for linear regression
-    bump_offset_mask_li = (df_bump_offset['bump_wheel_travel_li'] >= -10) & (df_bump_offset['bump_wheel_travel_li'] <= 10)
-    bump_offset_mask_re = (df_bump_offset['bump_wheel_travel_re'] >= -10) & (df_bump_offset['bump_wheel_travel_re'] <= 10)
-    
-    # Filter data only for wheel rate linear regression
-    bump_mask_li = (df_bump['bump_wheel_travel_li'] >= -10) & (df_bump['bump_wheel_travel_li'] <= 10)
-    bump_mask_re = (df_bump['bump_wheel_travel_re'] >= -10) & (df_bump['bump_wheel_travel_re'] <= 10)    
-    
-    
-    
-    # Linear regression for Left wheel_rate
-    slope_bump_wheel_rate_li, intercept_bump_wheel_rate_li, _, _, _ = linregress(df_bump[bump_mask_li]['bump_wheel_travel_li'], 
-                                                            df_bump[bump_mask_li]['bump_vertical_force_li'])
-    # Linear regression for Right wheel_rate
-    slope_bump_wheel_rate_re, intercept_bump_wheel_rate_re, _, _, _ = linregress(df_bump[bump_mask_re]['bump_wheel_travel_re'], 
-                                                            df_bump[bump_mask_re]['bump_vertical_force_re'])
-    
-    # Linear regression for Left Steer
-    slope_bump_steer_li, intercept_bump_steer_li, _, _, _ = linregress(df_bump_offset[bump_offset_mask_li]['bump_wheel_travel_li'], 
-                                                            df_bump_offset[bump_offset_mask_li]['bump_toe_li'])
-    # Linear regression for Right Steer
-    slope_bump_steer_re, intercept_bump_steer_re, _, _, _ = linregress(df_bump_offset[bump_offset_mask_re]['bump_wheel_travel_re'], 
-                                                            df_bump_offset[bump_offset_mask_re]['bump_toe_re'])
-    
-    # Linear regression for Left Camber
-    slope_bump_camber_li, intercept_bump_camber_li, _, _, _ = linregress(df_bump_offset[bump_offset_mask_li]['bump_wheel_travel_li'], 
-                                                              df_bump_offset[bump_offset_mask_li]['bump_camber_li'])
-    # Linear regression for Right Camber
-    slope_bump_camber_re, intercept_bump_camber_re, _, _, _ = linregress(df_bump_offset[bump_offset_mask_re]['bump_wheel_travel_re'], 
-                                                              df_bump_offset[bump_offset_mask_re]['bump_camber_re'])
-    
-    # Linear regression for Left wheel base change
-    slope_bump_wheel_base_change_li, intercept_bump_wheel_base_change_li, _, _, _ = linregress(df_bump_offset[bump_offset_mask_li]['bump_wheel_travel_li'], 
-                                                              df_bump_offset[bump_offset_mask_li]['bump_wheel_base_li'])
-    # Linear regression for Right wheel base change
-    slope_bump_wheel_base_change_re, intercept_bump_wheel_base_change_re, _, _, _ = linregress(df_bump_offset[bump_offset_mask_re]['bump_wheel_travel_re'], 
-                                                              df_bump_offset[bump_offset_mask_re]['bump_wheel_base_re'])
-    
-    # Linear regression for Left track change
-    slope_bump_track_change_li, intercept_bump_track_change_li, _, _, _ = linregress(df_bump_offset[bump_offset_mask_li]['bump_wheel_travel_li'], 
-                                                              -1*df_bump_offset[bump_offset_mask_li]['bump_tire_cp_y_li'])
-    # Linear regression for Right track change
-    slope_bump_track_change_re, intercept_bump_track_change_re, _, _, _ = linregress(df_bump_offset[bump_offset_mask_re]['bump_wheel_travel_re'], 
-                                                              df_bump_offset[bump_offset_mask_re]['bump_tire_cp_y_re'])
-    
-    # Left wheel rate plot
-    fig_bump_wheel_rate.add_trace(go.Scatter(x=df_bump['bump_wheel_travel_li'], 
-                                   y=df_bump['bump_vertical_force_li'],
-                                   mode='lines+markers', name='Bump Wheel Rate Left'), 
-                        row=1, col=1)
-    # Regression line for Left Steer
-    fig_bump_wheel_rate.add_trace(go.Scatter(x=np.linspace(-10, 10, 400), 
-                                   y=slope_bump_wheel_rate_li * np.linspace(-10, 10, 400) + intercept_bump_wheel_rate_li,
-                                   mode='lines', name=f"y={slope_bump_wheel_rate_li:.4f}x + {intercept_bump_wheel_rate_li:.4f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=1)
-    fig_bump_wheel_rate.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_bump_wheel_rate_li:.4f}x + {intercept_bump_wheel_rate_li:.4f}",
-            xref="x1", yref="y1",
-            x=0, y=slope_bump_wheel_rate_li * 0 + intercept_bump_wheel_rate_li+2000,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
-
-    # Right wheel rate plot
-    fig_bump_wheel_rate.add_trace(go.Scatter(x=df_bump['bump_wheel_travel_re'], 
-                                   y=df_bump['bump_vertical_force_re'],
-                                   mode='lines+markers', name='Bump Wheel Rate Right'), 
-                        row=1, col=2)
-    # Regression line for Right Steer
-    fig_bump_wheel_rate.add_trace(go.Scatter(x=np.linspace(-10, 10, 400), 
-                                   y=slope_bump_wheel_rate_re * np.linspace(-10, 10, 400) + intercept_bump_wheel_rate_re,
-                                   mode='lines', name=f"y={slope_bump_wheel_rate_re:.4f}x + {intercept_bump_wheel_rate_re:.4f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=2)
-    fig_bump_wheel_rate.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_bump_wheel_rate_re:.4f}x + {intercept_bump_wheel_rate_re:.4f}",
-            xref="x2", yref="y2",
-            x=0, y=slope_bump_wheel_rate_re * 0 + intercept_bump_wheel_rate_re+2000,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )    
-    
-    # Left Steer plot
-    fig_bump_steer.add_trace(go.Scatter(x=df_bump_offset['bump_wheel_travel_li'], 
-                                   y=df_bump_offset['bump_toe_li'],
-                                   mode='lines+markers', name='Bump Steer Left'), 
-                        row=1, col=1)
-    # Regression line for Left Steer
-    fig_bump_steer.add_trace(go.Scatter(x=np.linspace(-10, 10, 400), 
-                                   y=slope_bump_steer_li * np.linspace(-10, 10, 400) + intercept_bump_steer_li,
-                                   mode='lines', name=f"y={slope_bump_steer_li:.4f}x + {intercept_bump_steer_li:.4f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=1)
-    fig_bump_steer.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_bump_steer_li:.4f}x + {intercept_bump_steer_li:.4f}",
-            xref="x1", yref="y1",
-            x=0, y=slope_bump_steer_li * 0 + intercept_bump_steer_li+0.5,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
-
-    # Right Steer plot
-    fig_bump_steer.add_trace(go.Scatter(x=df_bump_offset['bump_wheel_travel_re'], 
-                                   y=df_bump_offset['bump_toe_re'],
-                                   mode='lines+markers', name='Bump Steer Right'), 
-                        row=1, col=2)
-    # Regression line for Right Steer
-    fig_bump_steer.add_trace(go.Scatter(x=np.linspace(-10, 10, 400), 
-                                   y=slope_bump_steer_re * np.linspace(-10, 10, 400) + intercept_bump_steer_re,
-                                   mode='lines', name=f"y={slope_bump_steer_re:.4f}x + {intercept_bump_steer_re:.4f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=2)
-    fig_bump_steer.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_bump_steer_re:.4f}x + {intercept_bump_steer_re:.4f}",
-            xref="x2", yref="y2",
-            x=0, y=slope_bump_steer_re * 0 + intercept_bump_steer_re+0.5,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
-    
-    # Left Camber plot
-    fig_bump_camber.add_trace(go.Scatter(x=df_bump_offset['bump_wheel_travel_li'], 
-                                   y=df_bump_offset['bump_camber_li'],
-                                   mode='lines+markers', name='Bump Camber Left'), 
-                        row=1, col=1)
-    # Regression line for Left Camber
-    fig_bump_camber.add_trace(go.Scatter(x=np.linspace(-10, 10, 400), 
-                                   y=slope_bump_camber_li * np.linspace(-10, 10, 400) + intercept_bump_camber_li,
-                                   mode='lines', name=f"y={slope_bump_camber_li:.4f}x + {intercept_bump_camber_li:.4f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=1)
-    fig_bump_camber.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_bump_camber_li:.4f}x + {intercept_bump_camber_li:.4f}",
-            xref="x1", yref="y1",
-            x=0, y=slope_bump_camber_li * 0 + intercept_bump_camber_li+0.5,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
-
-    # Right Camber plot
-    fig_bump_camber.add_trace(go.Scatter(x=df_bump_offset['bump_wheel_travel_re'], 
-                                   y=df_bump_offset['bump_camber_re'],
-                                   mode='lines+markers', name='Bump Camber Right'), 
-                        row=1, col=2)
-    # Regression line for Right Camber
-    fig_bump_camber.add_trace(go.Scatter(x=np.linspace(-10, 10, 400), 
-                                   y=slope_bump_camber_re * np.linspace(-10, 10, 400) + intercept_bump_camber_re,
-                                   mode='lines', name=f"y={slope_bump_camber_re:.4f}x + {intercept_bump_camber_re:.4f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=2)
-    fig_bump_camber.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_bump_camber_re:.4f}x + {intercept_bump_camber_re:.4f}",
-            xref="x2", yref="y2",
-            x=0, y=slope_bump_camber_re * 0 + intercept_bump_camber_re+0.5,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
-
-    # Left wheel base change plot
-    fig_bump_wheel_base_change.add_trace(go.Scatter(x=df_bump_offset['bump_wheel_travel_li'], 
-                                   y=df_bump_offset['bump_wheel_base_li'],
-                                   mode='lines+markers', name='Bump wheel_base_change Left'), 
-                        row=1, col=1)
-    # Regression line for Left wheel_base_change
-    fig_bump_wheel_base_change.add_trace(go.Scatter(x=np.linspace(-10, 10, 400), 
-                                   y=slope_bump_wheel_base_change_li * np.linspace(-10, 10, 400) + intercept_bump_wheel_base_change_li,
-                                   mode='lines', name=f"y={slope_bump_wheel_base_change_li:.4f}x + {intercept_bump_wheel_base_change_li:.4f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=1)
-    fig_bump_wheel_base_change.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_bump_wheel_base_change_li:.4f}x + {intercept_bump_wheel_base_change_li:.4f}",
-            xref="x1", yref="y1",
-            x=0, y=slope_bump_wheel_base_change_li * 0 + intercept_bump_wheel_base_change_li+0.5,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
-
-    # Right wheel base change plot
-    fig_bump_wheel_base_change.add_trace(go.Scatter(x=df_bump_offset['bump_wheel_travel_re'], 
-                                   y=df_bump_offset['bump_wheel_base_re'],
-                                   mode='lines+markers', name='Bump wheel_base_change Right'), 
-                        row=1, col=2)
-    # Regression line for Right wheel_base_change
-    fig_bump_wheel_base_change.add_trace(go.Scatter(x=np.linspace(-10, 10, 400), 
-                                   y=slope_bump_wheel_base_change_re * np.linspace(-10, 10, 400) + intercept_bump_wheel_base_change_re,
-                                   mode='lines', name=f"y={slope_bump_wheel_base_change_re:.4f}x + {intercept_bump_wheel_base_change_re:.4f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=2)
-    fig_bump_wheel_base_change.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_bump_wheel_base_change_re:.4f}x + {intercept_bump_wheel_base_change_re:.4f}",
-            xref="x2", yref="y2",
-            x=0, y=slope_bump_wheel_base_change_re * 0 + intercept_bump_wheel_base_change_re+0.5,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
-    
-    # Left track change plot
-    fig_bump_track_change.add_trace(go.Scatter(x=df_bump_offset['bump_wheel_travel_li'], 
-                                   y=-1*df_bump_offset['bump_tire_cp_y_li'],
-                                   mode='lines+markers', name='Bump track_change Left'), 
-                        row=1, col=1)
-    # Regression line for Left track_change
-    fig_bump_track_change.add_trace(go.Scatter(x=np.linspace(-10, 10, 400), 
-                                   y=slope_bump_track_change_li * np.linspace(-10, 10, 400) + intercept_bump_track_change_li,
-                                   mode='lines', name=f"y={slope_bump_track_change_li:.4f}x + {intercept_bump_track_change_li:.4f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=1)
-    fig_bump_track_change.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_bump_track_change_li:.4f}x + {intercept_bump_track_change_li:.4f}",
-            xref="x1", yref="y1",
-            x=0, y=slope_bump_track_change_li * 0 + intercept_bump_track_change_li+0.5,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
-
-    # Right track change plot
-    fig_bump_track_change.add_trace(go.Scatter(x=df_bump_offset['bump_wheel_travel_re'], 
-                                   y=df_bump_offset['bump_tire_cp_y_re'],
-                                   mode='lines+markers', name='Bump track_change Right'), 
-                        row=1, col=2)
-    # Regression line for Right track_change
-    fig_bump_track_change.add_trace(go.Scatter(x=np.linspace(-10, 10, 400), 
-                                   y=slope_bump_track_change_re * np.linspace(-10, 10, 400) + intercept_bump_track_change_re,
-                                   mode='lines', name=f"y={slope_bump_track_change_re:.4f}x + {intercept_bump_track_change_re:.4f}",
-                                   line=dict(color='red', width=3)), 
-                        row=1, col=2)
-    fig_bump_track_change.add_annotation(
-        go.layout.Annotation(
-            text=f"y = {slope_bump_track_change_re:.4f}x + {intercept_bump_track_change_re:.4f}",
-            xref="x2", yref="y2",
-            x=0, y=slope_bump_track_change_re * 0 + intercept_bump_track_change_re+0.5,  # Adjusting the y position a little above the regression line
-            showarrow=False,
-            font=dict(size=20, color='red')
-        )
-    )
-    
-    
-    
-    # Updating layout for titles, and legend for bump Steer plot
-    fig_bump_steer.update_layout(title_text="Steer Offset Plots", width=2400, height=1500,
-                            xaxis_title="Rebound <<        RL wheel center vertical travel [mm]        >> Jounce",
-                            yaxis_title="toe out <<        RL toe angle variation [deg]        >> toe in",
-                            xaxis2_title="Rebound <<        RR wheel center vertical travel [mm]        >> Jounce",
-                            yaxis2_title="toe out <<        RR toe angle variation [deg]        >> toe in",
-                            showlegend=True)
-    
-    # Updating layout for titles, and legend for bump Camber plot
-    fig_bump_camber.update_layout(title_text="Camber Offset Plots", width=2400, height=1500,
-                             xaxis_title="Rebound <<        RL wheel center vertical travel [mm]        >> Jounce",
-                             yaxis_title="top in <<        RL toe angle variation [deg]        >> top out",
-                             xaxis2_title="Rebound <<        RR wheel center vertical travel [mm]        >> Jounce",
-                             yaxis2_title="top in <<        RR toe angle variation [deg]        >> top out",
-                             showlegend=True)
-    
-    
-    
-    
-    
-    
-    # Update legend names for Steer plot
-    for trace in fig_bump_steer.data:
-        if trace.name == 'Left Steer':
-            trace.name = 'Left'
-        elif trace.name == 'Right Steer':
-            trace.name = 'Right'
-
-    # Update legend names for Camber plot
-    for trace in fig_bump_camber.data:
-        if trace.name == 'Left Camber':
-            trace.name = 'Left'
-        elif trace.name == 'Right Camber':
-            trace.name = 'Right'
-    
-    return (
-        fig_bump_wheel_rate, fig_bump_steer, fig_bump_camber, fig_bump_wheel_base_change, fig_bump_track_change, 
-        slope_bump_wheel_rate_li, slope_bump_wheel_rate_re, 
-        slope_bump_steer_li, slope_bump_steer_re, 
-        slope_bump_camber_li, slope_bump_camber_re, 
-        slope_bump_wheel_base_change_li, slope_bump_wheel_base_change_re,
-        slope_bump_track_change_li, slope_bump_track_change_re
-    )
-    
-    
-#    return fig_bump_wheel_rate, fig_bump_steer, fig_bump_camber, fig_bump_wheel_base_change, fig_bump_track_change, slope_li, slope_re, slope_camber_li, slope_camber_re
-
 if __name__ == "__main__":
     main()
@@ -0,0 +1,45 @@
+import numpy as np
+
+from knc.compare import compare_branches, compare_path, compare_resample
+
+
+def hysteresis_loop(n=101, offset=1.0):
+    # 0 -> +10 -> -10 -> 0, the response is x + offset on the way up and x - offset on the way down
+    x = np.concatenate([np.linspace(0, 10, n), np.linspace(10, -10, 2 * n - 1)[1:], np.linspace(-10, 0, n)[1:]])
+    rising = np.concatenate([np.ones(n, bool), np.zeros(2 * n - 2, bool), np.ones(n - 1, bool)])
+    return x, np.where(rising, x + offset, x - offset)
+
+
+def test_branches_of_a_load_unload_loop():
+    x, _ = hysteresis_loop()
+    assert compare_branches(x) == [(0, 100, 1), (100, 300, -1), (300, 400, 1)]
+
+
+def test_branches_of_flat_steps():
+    assert compare_branches(np.array([0.0, 0.0, 1.0, 1.0, 0.5])) == [(0, 3, 1), (3, 4, -1)]
+    assert compare_branches(np.zeros(3)) == []
+
+
+def test_resample_keeps_load_and_unload_apart():
+    x, y = hysteresis_loop()
+    grid = np.linspace(-5, 5, 11)
+    resampled = compare_resample(x, y[:, None], grid)
+    assert resampled.shape == (1, 22)
+    np.testing.assert_allclose(compare_path(grid), np.concatenate([grid, grid[::-1]]))
+    np.testing.assert_allclose(resampled[0, :11], grid + 1)
+    np.testing.assert_allclose(resampled[0, 11:], grid[::-1] - 1)
+
+
+def test_resample_deltas_of_two_loops():
+    grid = np.linspace(-5, 5, 11)
+    x, y = hysteresis_loop(offset=1.0)
+    x2, y2 = hysteresis_loop(n=151, offset=2.0)
+    deltas = compare_resample(x2, y2[:, None], grid) - compare_resample(x, y[:, None], grid)
+    np.testing.assert_allclose(deltas[0, :11], 1.0)
+    np.testing.assert_allclose(deltas[0, 11:], -1.0)
+
+
+def test_resample_of_a_monotonic_sweep():
+    resampled = compare_resample(np.linspace(0, 1, 5), np.arange(5.0)[:, None], np.linspace(0, 1, 3))
+    np.testing.assert_allclose(resampled[0, :3], [0, 2, 4])
+    assert np.isnan(resampled[0, 3:]).all()
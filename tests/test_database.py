@@ -0,0 +1,39 @@
+import threading
+
+import numpy as np
+
+from knc import database, kpi
+
+
+def bump_matrix(seed):
+    rng = np.random.default_rng(seed)
+    x = np.linspace(-20, 20, 200)
+    return np.column_stack([x * (i + 1) + rng.normal(size=len(x)) * 0.1 for i in range(len(kpi.KPI_TESTS['bump']['columns']))])
+
+
+def test_run_without_finite_kpis_is_not_aggregated_again(tmp_path, monkeypatch):
+    path = str(tmp_path / 'runs.sqlite')
+    connection = database.database_connect(path)
+    with np.errstate(all='ignore'):
+        database.database_store_run(connection, 'bump', np.zeros((50, len(kpi.KPI_TESTS['bump']['columns']))), 'flat.res', 'flat')
+    rebuilds = []
+    monkeypatch.setattr(database, 'database_rebuild_aggregates', rebuilds.append)
+    database.database_connect(path)
+    assert rebuilds == []
+
+
+def test_concurrent_stores_are_all_aggregated(tmp_path):
+    path = str(tmp_path / 'runs.sqlite')
+    database.database_connect(path)
+
+    def store(i):
+        database.database_store_run(database.database_connect(path), 'bump', bump_matrix(i), f'{i}.res', f'hash{i}', 'V1', 'Rear')
+
+    threads = [threading.Thread(target=store, args=(i,)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    connection = database.database_connect(path)
+    assert database.database_aggregate(connection, 'bump', ['V1'], ['Rear'])[1][0] == 10
+    assert database.database_aggregate(connection, 'bump', ['V2'])[1][0] == 0
@@ -0,0 +1,16 @@
+import pytest
+
+from knc.kpi import detect_test
+
+
+@pytest.mark.parametrize('name, test', [
+    ('K&C_lat_antiphase_01.res', 'lat_antiphase'),
+    ('roll-01.res', 'bump_anti'),
+    ('Body_Bounce', 'bump'),
+    ('bump01.res', 'bump'),
+    ('platform_bump.res', 'bump'),
+    ('lateral_compliance', None),
+    ('misc.res', None),
+])
+def test_detect_test_matches_words(name, test):
+    assert detect_test(name) == test
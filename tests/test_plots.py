@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from knc import kpi, plots
+from knc.lazy import LazyChannelFrame
+
+
+@pytest.mark.parametrize('test', list(kpi.KPI_TESTS))
+def test_kpi_figures_follow_the_registry(test):
+    x = np.linspace(-2, 2, 201) * kpi.KPI_TESTS[test]['window']
+    matrix = np.column_stack([x * (i + 1) for i in range(len(kpi.KPI_TESTS[test]['columns']))])
+    frame = LazyChannelFrame(matrix, kpi.KPI_TESTS[test]['columns'])
+    frame_offset = frame.offset(kpi.KPI_TESTS[test]['offset_column'])
+    figures = plots.kpi_figures(test, frame_offset, frame, kpi.test_fits(test, frame_offset, frame))
+
+    test_kpis = kpi.test_kpis(test)
+    assert len(figures) == len(test_kpis) // 2
+    for fig, test_kpi in zip(figures, test_kpis[::2]):
+        assert fig.layout.title.text == f"{test_kpi['name']}: [{test_kpi['unit']}]"
+        assert fig.layout.yaxis.title.text == test_kpi['y_label']
+        # curve and regression line of each side
+        assert len(fig.data) == 4